@@ -0,0 +1,80 @@
+"""Latência da agregação dos desafios dos vizinhos: lista + ``np.unique`` x votos ponderados (scatter-add).
+
+Monta um ``IndiceDesafios`` sintético (listas de desafios recomendados por usuário) e, para
+cada k, sorteia k vizinhos com similaridades decrescentes e mede:
+
+- ``unique``: concatena as listas dos vizinhos e fica com os 5 primeiros ids únicos (antigo
+  ``coletar_desafios``; ignora a similaridade);
+- ``votos``: ``agregar_votos`` + seleção do top 5 por score (``pipeline.selecionar``).
+
+    python -m benchmarks.agregacao --usuarios 100000 --desafios 500 --k 3 10 100 1000
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.endpoint.indice_desafios import IndiceDesafios, agregar_votos
+from src.endpoint.pipeline import pesos_similaridade, selecionar
+
+
+def indice_sintetico(n_usuarios, n_desafios, semente=0):
+    rng = np.random.default_rng(semente)
+    tamanhos = rng.integers(1, 8, n_usuarios)
+    offsets = np.zeros(n_usuarios + 1, dtype=np.int64)
+    np.cumsum(tamanhos, out=offsets[1:])
+    popularidade = rng.zipf(1.3, n_desafios).astype(np.float64)
+    valores = rng.choice(np.arange(1, n_desafios + 1), int(offsets[-1]), p=popularidade / popularidade.sum())
+    return IndiceDesafios(offsets, valores)
+
+
+def catalogo_sintetico(indice, n_desafios):
+    ids = np.arange(1, n_desafios + 1)
+    posicao = np.full(n_desafios + 1, -1, dtype=np.int64)
+    posicao[ids] = np.arange(n_desafios)
+    popularidade = np.bincount(posicao[indice.valores], minlength=n_desafios).astype(np.float32)
+    return SimpleNamespace(ids=ids, posicao=posicao, ordem_popularidade=np.argsort(-popularidade, kind='stable'))
+
+
+def mediana_us(funcao, repeticoes):
+    funcao()  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos)) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=100_000)
+    parser.add_argument('--desafios', type=int, default=500)
+    parser.add_argument('--k', type=int, nargs='+', default=[3, 10, 100, 1000])
+    parser.add_argument('--repeticoes', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    indice = indice_sintetico(args.usuarios, args.desafios)
+    catalogo = catalogo_sintetico(indice, args.desafios)
+    rng = np.random.default_rng(1)
+
+    print(f"{args.usuarios} usuários, {args.desafios} desafios; mediana por consulta (1 entrada)")
+    for k in args.k:
+        idx_tops = rng.choice(args.usuarios, (1, k), replace=False)
+        scores_tops = np.sort(rng.uniform(0.5, 1.0, (1, k)))[:, ::-1]
+
+        def unique():
+            return np.unique(indice.coletar(idx_tops[0]))[:5].tolist()
+
+        def votos():
+            total = agregar_votos(indice, idx_tops, pesos_similaridade(scores_tops), catalogo.posicao,
+                                  len(catalogo.ids))
+            return selecionar(catalogo, np.where(total > 0, total, -np.inf), 5)
+
+        print(f"  k={k:5d}  unique {mediana_us(unique, args.repeticoes):8.1f} µs   "
+              f"votos {mediana_us(votos, args.repeticoes):8.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
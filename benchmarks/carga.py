@@ -0,0 +1,396 @@
+"""Teste de carga da API: latência (p50/p95/p99) e vazão por cenário e concorrência.
+
+Cenários: ``recomendar`` e ``avaliar`` (JSON), ``recomendar-form`` e ``avaliar-form``
+(formulários HTML) e ``replay`` (reenvia as recomendações de registro_recomendacoes.csv
+na ordem original). Cada execução é salva em benchmarks/resultados/ com o commit
+atual e comparada com a execução anterior, destacando regressões.
+
+    # contra uma API já em execução
+    python -m benchmarks.carga --url http://127.0.0.1:8000 --concorrencia 1 8 32
+
+    # sobe a API localmente com um dataset sintético (registros gravados em diretório temporário)
+    python -m benchmarks.dataset_sintetico --usuarios 100000 --desafios 500
+    python -m benchmarks.carga --servidor --dados benchmarks/dados/100000-500
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from benchmarks.dataset_sintetico import sortear_perfis, tipos_hexad
+from src.endpoint.formulario import convert_interface_to_amnesia_format
+
+base_dir = Path(__file__).resolve().parents[1]
+resultados_dir = Path(__file__).resolve().parent / 'resultados'
+
+cenarios = ['recomendar', 'avaliar', 'recomendar-form', 'avaliar-form', 'replay']
+
+# Colunas do registro de recomendações (mesma ordem de recomendador.campos_recomendacao)
+campos_registro = [
+    'id', 'Data_Hora', 'usuario', 'age', 'body_type', 'fitness_goal',
+    'experience_level', 'Recomendacao_Desafios', 'Numero_Desafios'
+]
+
+# Nome do score HEXAD na API para cada coluna do dataset
+scores_hexad = {
+    'Philanthropist': 'score_philanthropist', 'Socialiser': 'score_socialiser', 'Achiever': 'score_achiever',
+    'Player': 'score_player', 'Free Spirit': 'score_free_spirit', 'Disruptor': 'score_disruptor',
+}
+
+
+# === Requisições ===
+
+def gerar_usuarios(n, semente=0):
+    """Entradas de /recomendar com as distribuições do dataset sintético"""
+    rng = np.random.default_rng(semente)
+    perfis, _ = sortear_perfis(rng, n)
+    alturas = np.round(rng.normal(168, 9, size=n))
+    pesos = np.round(rng.normal(72, 14, size=n).clip(40, 150))
+    usuarios = []
+    for i in range(n):
+        usuario = {
+            'usuario': f'carga-{i}',
+            'senha': 'carga',
+            'age': int(perfis['age'][i]),
+            'height': float(alturas[i]),
+            'weight': float(pesos[i]),
+            'body_type': str(perfis['body_type'][i]),
+            'goal': str(perfis['fitness_goal'][i]),
+            'training_days': int(perfis['training_days'][i]),
+            'training_time': int(perfis['training_time'][i]),
+            'experience_level': str(perfis['experience_level'][i]),
+        }
+        for coluna in tipos_hexad:
+            usuario[scores_hexad[coluna]] = float(perfis[coluna][i])
+        usuarios.append(usuario)
+    return usuarios
+
+
+def gerar_avaliacao(usuario, i):
+    return {
+        'usuario': usuario['usuario'], 'senha': usuario['senha'],
+        'success': i % 11, 'streak': i % 7, 'progress_pct': float(i % 101), 'rating': 1 + i % 5, 'time': 30 + i % 60,
+    }
+
+
+def ler_registro(caminho):
+    """Recomendações registradas, em ordem, como entradas de /recomendar e instante original.
+
+    O registro guarda apenas parte do perfil; os demais campos usam os valores padrão da
+    interface. Linhas no formato antigo (outro número de colunas) são ignoradas.
+    """
+    padrao = convert_interface_to_amnesia_format({})
+    eventos = []
+    with open(caminho, 'r', encoding='utf-8', newline='') as f:
+        for linha in csv.reader(f):
+            if len(linha) != len(campos_registro) or linha[0] == 'id':
+                continue
+            registro = dict(zip(campos_registro, linha))
+            try:
+                instante = datetime.datetime.fromisoformat(registro['Data_Hora']).timestamp()
+                idade = int(float(registro['age']))
+            except ValueError:
+                continue
+            usuario = dict(padrao, usuario=registro['usuario'], senha='replay', age=idade)
+            for campo, coluna in (('body_type', 'body_type'), ('goal', 'fitness_goal'),
+                                  ('experience_level', 'experience_level')):
+                if registro[coluna]:
+                    usuario[campo] = registro[coluna]
+            eventos.append((instante, usuario))
+    return eventos
+
+
+def montar_requisicoes(cenario, n, usuarios, eventos):
+    """Lista de (rota, kwargs do requests.post, atraso em s desde o início ou None)"""
+    if cenario == 'replay':
+        if not eventos:
+            return []
+        eventos = list(itertools.islice(itertools.cycle(eventos), n))
+        return [('/recomendar', {'json': usuario}, instante) for instante, usuario in eventos]
+
+    requisicoes = []
+    for i in range(n):
+        usuario = usuarios[i % len(usuarios)]
+        if cenario == 'recomendar':
+            requisicoes.append(('/recomendar', {'json': usuario}, None))
+        elif cenario == 'recomendar-form':
+            requisicoes.append(('/recomendar-form', {'data': usuario}, None))
+        elif cenario == 'avaliar':
+            requisicoes.append(('/avaliar', {'json': gerar_avaliacao(usuario, i)}, None))
+        else:
+            requisicoes.append(('/avaliar-form', {'data': gerar_avaliacao(usuario, i)}, None))
+    return requisicoes
+
+
+def agendar_replay(requisicoes, ritmo):
+    """Converte os instantes originais em atrasos relativos, acelerados por ``ritmo`` (0 = sem espera)"""
+    if not requisicoes or ritmo <= 0:
+        return [(rota, kwargs, None) for rota, kwargs, _ in requisicoes]
+    agendadas = []
+    inicio = anterior = requisicoes[0][2]
+    deslocamento = 0.0
+    for rota, kwargs, instante in requisicoes:
+        if instante < anterior:  # o registro recomeçou (ciclo): continua a partir do último atraso
+            deslocamento += anterior - inicio
+            inicio = instante
+        anterior = instante
+        agendadas.append((rota, kwargs, (deslocamento + instante - inicio) / ritmo))
+    return agendadas
+
+
+# === Execução ===
+
+def executar_carga(url, requisicoes, concorrencia, timeout=30.0):
+    """Dispara as requisições com ``concorrencia`` clientes; retorna latências (s), status e duração"""
+    latencias = np.full(len(requisicoes), np.nan)
+    status = np.zeros(len(requisicoes), dtype=np.int32)
+    proxima = itertools.count()
+    lock = threading.Lock()
+
+    def cliente():
+        sessao = requests.Session()
+        while True:
+            with lock:
+                i = next(proxima)
+            if i >= len(requisicoes):
+                return
+            rota, kwargs, atraso = requisicoes[i]
+            if atraso is not None:
+                espera = inicio + atraso - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+            t = time.perf_counter()
+            try:
+                resposta = sessao.post(url + rota, timeout=timeout, allow_redirects=False, **kwargs)
+                status[i] = resposta.status_code
+            except requests.RequestException:
+                status[i] = 0
+            latencias[i] = time.perf_counter() - t
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        for _ in range(concorrencia):
+            pool.submit(cliente)
+    return latencias, status, time.perf_counter() - inicio
+
+
+def resumir(latencias, status, duracao):
+    ok = (status >= 200) & (status < 400)
+    ms = latencias[ok] * 1000
+    resumo = {
+        'requisicoes': int(len(status)),
+        'erros': int((~ok).sum()),
+        'status': {str(s): int(c) for s, c in zip(*np.unique(status, return_counts=True))},
+        'duracao_s': round(duracao, 3),
+        'vazao_rps': round(len(status) / duracao, 1) if duracao else None,
+    }
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        resumo.update(p50_ms=round(p50, 3), p95_ms=round(p95, 3), p99_ms=round(p99, 3),
+                      media_ms=round(float(ms.mean()), 3), max_ms=round(float(ms.max()), 3))
+    return resumo
+
+
+def preparar_avaliacoes(url, usuarios, concorrencia):
+    """Garante uma recomendação registrada para cada usuário antes dos cenários de avaliação"""
+    requisicoes = [('/recomendar/batch', {'json': usuarios[i:i + 100]}, None) for i in range(0, len(usuarios), 100)]
+    executar_carga(url, requisicoes, concorrencia)
+
+
+# === Servidor local ===
+
+def ambiente_dados(dados, **extras):
+    """Variáveis de ambiente que apontam a API para o dataset em ``dados`` (e seus artefatos)"""
+    env = dict(os.environ, **extras)
+    if dados is not None:
+        dados = Path(dados)
+        env.update(
+            SQUAD_DADOS_PATH=str(dados / 'recommendation_dataset.csv'),
+            SQUAD_CHALLENGES_PATH=str(dados / 'challenges.json'),
+            SQUAD_SNAPSHOT_DIR=str(dados / 'snapshot'),
+            SQUAD_INDICE_PATH=str(dados / 'indice_vizinhos.npz'),
+            SQUAD_ALS_PATH=str(dados / 'als.npz'),
+            SQUAD_COOCORRENCIA_PATH=str(dados / 'coocorrencia.npz'),
+        )
+    return env
+
+
+class ServidorLocal:
+    """Sobe ``uvicorn src.main:app`` em um subprocesso, opcionalmente com outro dataset"""
+
+    def __init__(self, porta, dados=None, workers=1):
+        self.porta = porta
+        self.url = f'http://127.0.0.1:{porta}'
+        self.dados = Path(dados) if dados else None
+        self.workers = workers
+        self._temporario = tempfile.TemporaryDirectory(prefix='squad-carga-')
+        self._processo = None
+
+    def __enter__(self):
+        env = ambiente_dados(self.dados, SQUAD_REGISTROS_DIR=self._temporario.name)
+        comando = [sys.executable, '-m', 'uvicorn', 'src.main:app', '--host', '127.0.0.1',
+                   '--port', str(self.porta), '--workers', str(self.workers), '--log-level', 'warning']
+        self._processo = subprocess.Popen(comando, cwd=base_dir, env=env)
+        limite = time.monotonic() + 600  # datasets grandes podem levar minutos para compilar
+        while time.monotonic() < limite:
+            if self._processo.poll() is not None:
+                raise RuntimeError(f"Servidor encerrou com código {self._processo.returncode}")
+            try:
+                if requests.get(self.url + '/health', timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("Servidor não respondeu ao /health a tempo")
+
+    @property
+    def pid(self):
+        return self._processo.pid
+
+    def __exit__(self, *exc):
+        if self._processo is not None and self._processo.poll() is None:
+            self._processo.terminate()
+            try:
+                self._processo.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._processo.kill()
+        self._temporario.cleanup()
+
+
+# === Resultados ===
+
+def commit_atual():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=base_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=base_dir,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-modificado' if alterado else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def salvar_resultado(resultado, diretorio=resultados_dir):
+    diretorio.mkdir(parents=True, exist_ok=True)
+    caminho = diretorio / f"carga-{resultado['data']:%Y%m%d-%H%M%S}-{resultado['commit']}.json"
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2, default=str)
+    return caminho
+
+
+def resultado_anterior(diretorio=resultados_dir, excluir=None):
+    arquivos = sorted(p for p in diretorio.glob('carga-*.json') if p != excluir)
+    return arquivos[-1] if arquivos else None
+
+
+def comparar(atual, anterior, tolerancia):
+    """Variação de p50/p95/p99 e vazão por (cenário, concorrência); retorna as regressões"""
+    referencias = {(r['cenario'], r['concorrencia']): r for r in anterior['resultados']}
+    regressoes = []
+    for r in atual['resultados']:
+        ref = referencias.get((r['cenario'], r['concorrencia']))
+        if ref is None:
+            continue
+        partes = []
+        for metrica, pior_se_maior in (('p50_ms', True), ('p95_ms', True), ('p99_ms', True), ('vazao_rps', False)):
+            if not r.get(metrica) or not ref.get(metrica):
+                continue
+            variacao = r[metrica] / ref[metrica] - 1
+            regrediu = variacao > tolerancia if pior_se_maior else variacao < -tolerancia
+            partes.append(f"{metrica} {variacao:+.1%}{' REGRESSÃO' if regrediu else ''}")
+            if regrediu:
+                regressoes.append((r['cenario'], r['concorrencia'], metrica, variacao))
+        print(f"  {r['cenario']:16s} c={r['concorrencia']:<4d} " + ', '.join(partes))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--servidor', action='store_true', help="sobe a API localmente (uvicorn) para o teste")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help="workers do uvicorn com --servidor")
+    parser.add_argument('--dados', help="diretório com recommendation_dataset.csv e challenges.json (com --servidor)")
+    parser.add_argument('--cenarios', nargs='+', choices=cenarios, default=['recomendar', 'avaliar', 'replay'])
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requisicoes', type=int, default=500, help="por cenário e nível de concorrência")
+    parser.add_argument('--usuarios-distintos', type=int, default=1000,
+                        help="perfis distintos enviados (controla a taxa de acerto do cache)")
+    parser.add_argument('--registro', default=str(base_dir / 'registro_recomendacoes.csv'))
+    parser.add_argument('--ritmo', type=float, default=0.0,
+                        help="replay: acelera os intervalos originais N vezes; 0 envia sem espera")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="variação tolerada antes de apontar regressão")
+    parser.add_argument('--comparar-com', help="resultado de referência (padrão: o mais recente em benchmarks/resultados)")
+    parser.add_argument('--nao-salvar', action='store_true')
+    parser.add_argument('--falhar-em-regressao', action='store_true')
+    args = parser.parse_args(argv)
+
+    usuarios = gerar_usuarios(args.usuarios_distintos, args.semente)
+    eventos = ler_registro(args.registro) if 'replay' in args.cenarios and os.path.exists(args.registro) else []
+
+    servidor = ServidorLocal(args.porta, args.dados, args.workers) if args.servidor else None
+    url = servidor.__enter__().url if servidor else args.url.rstrip('/')
+    resultados = []
+    try:
+        if {'avaliar', 'avaliar-form'} & set(args.cenarios):
+            preparar_avaliacoes(url, usuarios, max(args.concorrencia))
+        for cenario in args.cenarios:
+            requisicoes = montar_requisicoes(cenario, args.requisicoes, usuarios, eventos)
+            if cenario == 'replay':
+                requisicoes = agendar_replay(requisicoes, args.ritmo)
+            if not requisicoes:
+                print(f"{cenario}: nenhuma requisição (registro vazio ou inexistente)")
+                continue
+            for concorrencia in args.concorrencia:
+                executar_carga(url, requisicoes[:concorrencia], concorrencia)  # aquecimento das conexões
+                resumo = resumir(*executar_carga(url, requisicoes, concorrencia))
+                resultados.append({'cenario': cenario, 'concorrencia': concorrencia, **resumo})
+                print(f"{cenario:16s} c={concorrencia:<4d} {resumo['vazao_rps']:9.1f} req/s  "
+                      f"p50 {resumo.get('p50_ms', float('nan')):8.2f} ms  p95 {resumo.get('p95_ms', float('nan')):8.2f} ms  "
+                      f"p99 {resumo.get('p99_ms', float('nan')):8.2f} ms  erros {resumo['erros']}")
+    finally:
+        if servidor:
+            servidor.__exit__()
+
+    resultado = {
+        'data': datetime.datetime.now(),
+        'commit': commit_atual(),
+        'url': url,
+        'dados': args.dados,
+        'parametros': {'requisicoes': args.requisicoes, 'usuarios_distintos': args.usuarios_distintos,
+                       'ritmo': args.ritmo, 'workers': args.workers},
+        'resultados': resultados,
+    }
+    caminho = None if args.nao_salvar else salvar_resultado(resultado)
+    if caminho:
+        print(f"Resultado salvo em {caminho}")
+
+    referencia = Path(args.comparar_com) if args.comparar_com else resultado_anterior(excluir=caminho)
+    regressoes = []
+    if referencia and referencia.exists():
+        with open(referencia, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"Comparação com {referencia.name} (commit {anterior.get('commit')}):")
+        if anterior.get('dados') != resultado['dados'] or anterior.get('parametros') != resultado['parametros']:
+            print("  atenção: dataset ou parâmetros diferentes da referência")
+        regressoes = comparar(resultado, anterior, args.tolerancia)
+    if regressoes and args.falhar_em_regressao:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
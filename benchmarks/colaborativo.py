@@ -0,0 +1,65 @@
+"""Tempo de treino do ALS implícito (por número de threads) e latência do fold-in.
+
+Gera uma matriz usuário x desafio sintética (cada usuário com alguns desafios
+concluídos, escolhidos com popularidade desigual) e mede uma iteração completa do
+treino (usuários + desafios) com 1 e N threads e o fold-in de lotes de usuários novos.
+
+    python -m benchmarks.colaborativo --usuarios 500000 --desafios 24 --threads 1 4 8
+"""
+import argparse
+import time
+
+import numpy as np
+from scipy import sparse
+
+from src.endpoint.filtragem_colaborativa import FATORES, MotorColaborativo, treinar_als
+
+
+def matriz_sintetica(n_usuarios, n_desafios, por_usuario=4, semente=0):
+    rng = np.random.default_rng(semente)
+    popularidade = rng.zipf(1.5, n_desafios).astype(np.float64)
+    popularidade /= popularidade.sum()
+    quantidades = rng.integers(1, 2 * por_usuario, n_usuarios)
+    linhas = np.repeat(np.arange(n_usuarios), quantidades)
+    colunas = rng.choice(n_desafios, len(linhas), p=popularidade)
+    valores = rng.uniform(0.2, 1.0, len(linhas)).astype(np.float32)
+    matriz = sparse.csr_matrix((valores, (linhas, colunas)), shape=(n_usuarios, n_desafios))
+    matriz.sum_duplicates()
+    return matriz
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=500_000)
+    parser.add_argument('--desafios', type=int, default=24)
+    parser.add_argument('--fatores', type=int, default=FATORES)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 100, 1000])
+    args = parser.parse_args(argv)
+
+    matriz = matriz_sintetica(args.usuarios, args.desafios)
+    print(f"{args.usuarios} usuários x {args.desafios} desafios, {matriz.nnz} interações, {args.fatores} fatores")
+
+    itens = None
+    for threads in args.threads:
+        inicio = time.perf_counter()
+        _, itens = treinar_als(matriz, args.fatores, iteracoes=1, threads=threads)
+        print(f"  iteração do treino com {threads:2d} threads: {time.perf_counter() - inicio:7.2f}s")
+
+    motor = MotorColaborativo(np.arange(args.desafios), itens, np.asarray(matriz.sum(axis=0)).ravel(),
+                              {'regularizacao': 0.1, 'alfa': 10.0})
+    rng = np.random.default_rng(1)
+    print("fold-in + top 5 (mediana de 20 execuções)")
+    for n in args.lotes:
+        interacoes = [{int(j): 1.0 for j in rng.choice(args.desafios, 3, replace=False)} for _ in range(n)]
+        tempos = []
+        for _ in range(20):
+            inicio = time.perf_counter()
+            motor.recomendar(interacoes, 5)
+            tempos.append(time.perf_counter() - inicio)
+        tempo = float(np.median(tempos))
+        print(f"  {n:6d} usuários  {tempo * 1000:8.3f} ms  ({tempo / n * 1e6:8.2f} µs/usuário)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Gera recommendation_dataset.csv e challenges.json sintéticos para testes de carga.
+
+As distribuições (objetivo, nível, tipo corporal, idade, dias/tempo de treino e
+scores HEXAD) seguem o dataset original; cada usuário tem um tipo HEXAD dominante
+e recebe desafios desse tipo, como no dataset real. O CSV é escrito em blocos,
+então 10M de usuários não precisam caber em memória.
+
+    python -m benchmarks.dataset_sintetico --usuarios 100000 --desafios 500
+    python -m benchmarks.dataset_sintetico --usuarios 10000000 --desafios 50000 --saida /dados/10m
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+diretorio_padrao = Path(__file__).resolve().parent / 'dados'
+
+colunas = [
+    'client_id', 'fitness_goal', 'training_days', 'training_time', 'experience_level', 'body_type', 'age',
+    'recommended_challenges', 'completed_challenges', 'mean_rating',
+    'Philanthropist', 'Socialiser', 'Achiever', 'Player', 'Free Spirit', 'Disruptor',
+]
+
+# === Distribuições (observadas no dataset original) ===
+objetivos = {'Hipertrofia': 0.59, 'Emagrecimento': 0.34, 'Força': 0.07}
+niveis = {'Intermediário': 0.38, 'Iniciante': 0.36, 'Avançado': 0.26}
+tipos_corporais = {'Feminino': 0.87, 'Masculino': 0.13}
+dias_treino = {1: 0.04, 2: 0.07, 3: 0.16, 4: 0.18, 5: 0.37, 6: 0.18}
+tempos_treino = {30: 0.05, 40: 0.10, 45: 0.10, 50: 0.15, 60: 0.25, 75: 0.10, 90: 0.15, 120: 0.10}
+
+# Tipo HEXAD dominante do usuário e participação de cada tipo no catálogo de desafios
+tipos_hexad = ['Philanthropist', 'Socialiser', 'Achiever', 'Player', 'Free Spirit', 'Disruptor']
+dominancia_hexad = [0.15, 0.12, 0.35, 0.12, 0.20, 0.06]
+catalogo_hexad = [2 / 24, 5 / 24, 6 / 24, 7 / 24, 2 / 24, 2 / 24]
+media_hexad = [4.65, 4.42, 6.24, 3.51, 4.41, 3.54]
+
+descricoes = {
+    'Philanthropist': ['Help a beginner complete their first {n} workouts.', 'Share {n} training tips with the community.'],
+    'Socialiser': ['Complete {n} workouts with a friend.', 'Join {n} group training sessions.'],
+    'Achiever': ['Complete all weekly goals for {n} weeks.', 'Beat your personal record in {n} different exercises.'],
+    'Player': ['Complete {n} workouts to unlock a badge!', 'Finish {n} sessions for a reward chest.'],
+    'Free Spirit': ['Try {n} different workout categories.', 'Create your own routine and follow it for {n} sessions.'],
+    'Disruptor': ['Suggest {n} new exercises for the app.', 'Complete {n} workouts in an unusual order.'],
+}
+
+
+def _sortear(rng, distribuicao, n):
+    valores = list(distribuicao)
+    return np.asarray(valores)[rng.choice(len(valores), size=n, p=list(distribuicao.values()))]
+
+
+def gerar_desafios(n_desafios, rng):
+    """Catálogo com todos os tipos HEXAD presentes (quando n_desafios >= 6)"""
+    tipos = np.concatenate([
+        np.arange(min(n_desafios, len(tipos_hexad))),
+        rng.choice(len(tipos_hexad), size=max(n_desafios - len(tipos_hexad), 0), p=catalogo_hexad),
+    ])
+    desafios = []
+    for challenge_id, tipo in enumerate(tipos, start=1):
+        tipo = tipos_hexad[tipo]
+        sessoes = int(rng.integers(2, 21))
+        modelo = descricoes[tipo][challenge_id % len(descricoes[tipo])]
+        desafios.append({
+            'challenge_id': challenge_id,
+            'type': tipo,
+            'description': modelo.format(n=sessoes),
+            'duration': int(rng.choice([7, 14, 21, 30])),
+            'target_sessions': sessoes,
+        })
+    return desafios
+
+
+def sortear_perfis(rng, n):
+    """Colunas de perfil (sem desafios) de ``n`` usuários, mais o índice do tipo HEXAD dominante"""
+    dominante = rng.choice(len(tipos_hexad), size=n, p=dominancia_hexad)
+    scores = rng.normal(media_hexad, 0.8, size=(n, len(tipos_hexad)))
+    scores[np.arange(n), dominante] += 1.5
+    scores = np.clip(np.round(scores * 2) / 2, 1.0, 7.0)
+    perfis = {
+        'fitness_goal': _sortear(rng, objetivos, n),
+        'training_days': _sortear(rng, dias_treino, n),
+        'training_time': _sortear(rng, tempos_treino, n),
+        'experience_level': _sortear(rng, niveis, n),
+        'body_type': _sortear(rng, tipos_corporais, n),
+        'age': np.clip(np.round(rng.normal(33.4, 11.2, size=n)), 14, 70).astype(int),
+    }
+    for i, tipo in enumerate(tipos_hexad):
+        perfis[tipo] = scores[:, i]
+    return perfis, dominante
+
+
+def _formatar_listas(ids, tamanhos):
+    return ['[' + ', '.join(map(str, sorted(set(linha[:t])))) + ']' for linha, t in zip(ids.tolist(), tamanhos.tolist())]
+
+
+def gerar_bloco(rng, inicio, n, ids_por_tipo, total_desafios):
+    perfis, dominante = sortear_perfis(rng, n)
+
+    # Recomendados: 2 a 6 desafios do tipo dominante; concluídos: 0 a 3 desafios quaisquer
+    tamanhos_tipo = np.array([len(ids) for ids in ids_por_tipo])[dominante]
+    posicoes = (rng.random((n, 6)) * tamanhos_tipo[:, None]).astype(np.int64)
+    recomendados = np.empty((n, 6), dtype=np.int64)
+    for tipo, ids in enumerate(ids_por_tipo):
+        linhas = dominante == tipo
+        if linhas.any():
+            recomendados[linhas] = ids[posicoes[linhas]]
+    concluidos = rng.integers(1, total_desafios + 1, size=(n, 3))
+    n_concluidos = rng.choice(4, size=n, p=[0.12, 0.45, 0.30, 0.13])
+
+    avaliacao = np.clip(np.round(rng.normal(3.2, 0.9, size=n) * 4) / 4, 1.0, 5.0)
+    avaliacao[n_concluidos == 0] = np.nan
+
+    bloco = pd.DataFrame({
+        'client_id': np.arange(inicio + 1, inicio + n + 1),
+        **perfis,
+        'recommended_challenges': _formatar_listas(recomendados, rng.integers(2, 7, size=n)),
+        'completed_challenges': _formatar_listas(concluidos, n_concluidos),
+        'mean_rating': avaliacao,
+    })
+    return bloco[colunas]
+
+
+def gerar_dataset(n_usuarios, n_desafios, saida=diretorio_padrao, semente=0, tamanho_bloco=100_000):
+    """Grava ``saida/recommendation_dataset.csv`` e ``saida/challenges.json``; retorna os caminhos"""
+    saida = Path(saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semente)
+
+    desafios = gerar_desafios(n_desafios, rng)
+    challenges_path = saida / 'challenges.json'
+    with open(challenges_path, 'w', encoding='utf-8') as f:
+        json.dump(desafios, f, ensure_ascii=False, indent=2)
+
+    tipos = np.array([tipos_hexad.index(d['type']) for d in desafios])
+    ids = np.array([d['challenge_id'] for d in desafios])
+    # Tipo sem desafios (catálogo com menos de 6) recomenda do catálogo inteiro
+    ids_por_tipo = [ids[tipos == t] if (tipos == t).any() else ids for t in range(len(tipos_hexad))]
+
+    dados_path = saida / 'recommendation_dataset.csv'
+    with open(dados_path, 'w', encoding='utf-8', newline='') as f:
+        for inicio in range(0, n_usuarios, tamanho_bloco):
+            bloco = gerar_bloco(rng, inicio, min(tamanho_bloco, n_usuarios - inicio), ids_por_tipo, len(desafios))
+            bloco.to_csv(f, header=inicio == 0, index=False)
+    return dados_path, challenges_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--desafios', type=int, default=25)
+    parser.add_argument('--saida', default=None, help="padrão: benchmarks/dados/<usuarios>-<desafios>")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--tamanho-bloco', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    saida = args.saida or diretorio_padrao / f'{args.usuarios}-{args.desafios}'
+    inicio = time.perf_counter()
+    dados_path, challenges_path = gerar_dataset(args.usuarios, args.desafios, saida, args.semente, args.tamanho_bloco)
+    print(f"{args.usuarios} usuários em {dados_path}")
+    print(f"{args.desafios} desafios em {challenges_path} ({time.perf_counter() - inicio:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Amostras por segundo do dataset de treino: ``InteractionDataset`` (iloc por amostra) x ``DatasetInteracoes``.
+
+Gera interações sintéticas com as colunas do two-tower (19 features de usuário, 6 + 384
+de desafio, rótulo ``label``) e percorre uma época em lotes. O dataset antigo é o do
+notebook (features do desafio buscadas por ``item_id``), montando o lote como o
+``default_collate`` e sem a conversão final em tensor, que os dois caminhos pagam.
+
+    python -m benchmarks.dataset_treino --interacoes 200000 --lote 64
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.motores import colunas_usuario
+from src.endpoint.dataset_interacoes import DatasetInteracoes
+
+
+class InteractionDatasetNotebook:
+    """Cópia do ``InteractionDataset`` do notebook two-tower, sem torch"""
+
+    def __init__(self, dataframe, user_feature_cols, item_features, label_col='label'):
+        self.dataframe = dataframe.reset_index(drop=True)
+        self.user_feature_cols = user_feature_cols
+        self.item_features = item_features
+        self.label_col = label_col
+
+    def __len__(self):
+        return len(self.dataframe)
+
+    def __getitem__(self, idx):
+        row = self.dataframe.iloc[idx]
+        user_features_np = row[self.user_feature_cols].values.astype(np.float32)
+        item_features_np = self.item_features.reindex([row['item_id']]).values[0].astype(np.float32)
+        if np.isnan(user_features_np).any():
+            user_features_np = np.nan_to_num(user_features_np)
+        if np.isnan(item_features_np).any():
+            item_features_np = np.nan_to_num(item_features_np)
+        return user_features_np, item_features_np, np.array([row[self.label_col]], dtype=np.float32)
+
+
+def gerar_interacoes(n_interacoes, n_desafios=24, semente=0):
+    rng = np.random.default_rng(semente)
+    interacoes = pd.DataFrame(rng.normal(size=(n_interacoes, len(colunas_usuario))), columns=colunas_usuario)
+    interacoes['item_id'] = rng.integers(1, n_desafios + 1, n_interacoes)
+    interacoes['label'] = rng.uniform(size=n_interacoes)
+    tipos = [f'desafio_{i}' for i in range(6)]
+    desafios = pd.DataFrame(np.eye(6, dtype=bool)[rng.integers(0, 6, n_desafios)], columns=tipos,
+                            index=pd.Index(np.arange(1, n_desafios + 1), name='item_id'))
+    embeddings = pd.DataFrame(rng.normal(size=(n_desafios, 384)).astype(np.float32), index=desafios.index,
+                              columns=[f'desc_emb_{i}' for i in range(384)])
+    return interacoes, desafios.join(embeddings)
+
+
+def percorrer_notebook(dataset, tamanho_lote, limite):
+    ordem = np.random.default_rng(0).permutation(len(dataset))[:limite]
+    for inicio in range(0, len(ordem), tamanho_lote):
+        amostras = [dataset[int(i)] for i in ordem[inicio:inicio + tamanho_lote]]
+        _ = [np.stack(coluna) for coluna in zip(*amostras)]
+    return len(ordem)
+
+
+def percorrer(dataset, tamanho_lote):
+    for _ in dataset.lotes(tamanho_lote, embaralhar=True, semente=0):
+        pass
+    return len(dataset)
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    amostras = funcao()
+    return amostras / (time.perf_counter() - inicio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interacoes', type=int, default=200_000)
+    parser.add_argument('--lote', type=int, default=64)
+    parser.add_argument('--amostras-notebook', type=int, default=5000,
+                        help="amostras percorridas no dataset antigo (uma época inteira levaria minutos)")
+    args = parser.parse_args(argv)
+
+    interacoes, desafios = gerar_interacoes(args.interacoes)
+    antigo = InteractionDatasetNotebook(interacoes, colunas_usuario, desafios)
+
+    inicio = time.perf_counter()
+    novo = DatasetInteracoes.de_dataframe(interacoes, colunas_usuario, desafios, 'label')
+    conversao = time.perf_counter() - inicio
+
+    print(f"{args.interacoes} interações, lote {args.lote} (conversão para arrays: {conversao:.2f}s)")
+    resultados = {
+        'InteractionDataset (iloc)': medir(lambda: percorrer_notebook(antigo, args.lote, args.amostras_notebook)),
+        'DatasetInteracoes': medir(lambda: percorrer(novo, args.lote)),
+    }
+    with tempfile.TemporaryDirectory() as diretorio:
+        mapeado = DatasetInteracoes.de_dataframe(interacoes, colunas_usuario, desafios, 'label', diretorio=diretorio)
+        resultados['DatasetInteracoes (memmap)'] = medir(lambda: percorrer(mapeado, args.lote))
+        del mapeado
+
+    base = resultados['InteractionDataset (iloc)']
+    for nome, taxa in resultados.items():
+        print(f"  {nome:28s} {taxa:12,.0f} amostras/s  ({taxa / base:7.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
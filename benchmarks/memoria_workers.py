@@ -0,0 +1,83 @@
+"""Memória por worker da API com 1, 2, 4... workers (``uvicorn --workers N``).
+
+Compila o snapshot do dataset uma vez (``modelo preparar``), sobe a API com N workers,
+envia requisições a /recomendar para que todos toquem a matriz de features inteira e lê
+``/proc/<pid>/smaps_rollup`` de cada worker:
+
+- ``rss``: inclui as páginas do snapshot mapeado, contadas em todos os workers;
+- ``pss``: as páginas compartilhadas divididas entre os workers (a soma é a memória real);
+- ``privada``: memória anônima de cada worker; deve ficar estável com N.
+
+    python -m benchmarks.dataset_sintetico --usuarios 1000000 --desafios 500
+    python -m benchmarks.memoria_workers --dados benchmarks/dados/1000000-500 --workers 1 2 4
+"""
+import argparse
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from benchmarks.carga import ServidorLocal, ambiente_dados, base_dir, gerar_usuarios
+from src.endpoint.memoria import memoria_processo, processos_filhos
+
+MIB = 1024 * 1024
+colunas = ['rss', 'pss', 'privada', 'compartilhada']
+
+
+def pids_workers(servidor):
+    """Workers do uvicorn (processos filhos iniciados com spawn); com 1 worker, o próprio servidor"""
+    workers = []
+    for pid in processos_filhos(servidor.pid):
+        try:
+            linha_comando = Path(f'/proc/{pid}/cmdline').read_bytes()
+        except OSError:
+            continue
+        if b'spawn_main' in linha_comando:
+            workers.append(pid)
+    return workers or [servidor.pid]
+
+
+def aquecer(url, n_requisicoes, concorrencia):
+    usuarios = gerar_usuarios(n_requisicoes)
+    with requests.Session() as sessao, ThreadPoolExecutor(concorrencia) as executor:
+        respostas = list(executor.map(lambda u: sessao.post(url + '/recomendar', json=u, timeout=60), usuarios))
+    falhas = sum(not r.ok for r in respostas)
+    if falhas:
+        raise RuntimeError(f"{falhas} requisições de aquecimento falharam")
+
+
+def formatar(valores):
+    return '  '.join(f"{valores.get(c, 0) / MIB:10.1f}" for c in colunas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dados', required=True, help="diretório gerado por benchmarks.dataset_sintetico")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requisicoes', type=int, default=50, help="requisições de aquecimento por worker")
+    parser.add_argument('--porta', type=int, default=8766)
+    args = parser.parse_args(argv)
+
+    dados = Path(args.dados)
+    subprocess.run([sys.executable, '-m', 'src.endpoint.modelo', 'preparar'], cwd=base_dir,
+                   env=ambiente_dados(dados), check=True)
+    tamanho_snapshot = sum(f.stat().st_size for f in (dados / 'snapshot').rglob('*.npy'))
+    print(f"Snapshot em disco: {tamanho_snapshot / MIB:.1f} MiB")
+
+    cabecalho = '  '.join(f"{c:>10}" for c in colunas)
+    for n in args.workers:
+        with ServidorLocal(args.porta, dados, workers=n) as servidor:
+            aquecer(servidor.url, args.requisicoes * n, concorrencia=2 * n)
+            memorias = {pid: memoria_processo(pid) for pid in pids_workers(servidor)}
+        total = {c: sum(m.get(c, 0) for m in memorias.values()) for c in colunas}
+        print(f"\n{n} worker(s), MiB   {cabecalho}")
+        for pid, memoria in memorias.items():
+            print(f"  pid {pid:<10}   {formatar(memoria)}")
+        print(f"  {'total':<14}   {formatar(total)}")
+        print(f"  privada média por worker: {total['privada'] / len(memorias) / MIB:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
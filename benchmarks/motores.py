@@ -0,0 +1,117 @@
+"""Latência por requisição dos motores de /recomendar: filtro por conteúdo x two-tower.
+
+Mede apenas o cálculo dos desafios (sem registro nem serialização), uma entrada por
+vez, com o cache de recomendações desligado. Sem um modelo exportado pelo notebook,
+``--sintetico`` grava um two-tower com pesos aleatórios e as dimensões do notebook
+(mesmo custo de inferência, recomendações sem sentido).
+
+    python -m benchmarks.motores --repeticoes 2000
+    python -m benchmarks.motores --sintetico /tmp/two_tower.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.carga import gerar_usuarios
+from src.endpoint.historico_usuarios import features_historico
+from src.endpoint.modelo import obter_estado
+from src.endpoint.recomendador import TOP_DESAFIOS, TOP_K_VIZINHOS, _desafios_conteudo, cache_recomendacoes, \
+    gerar_id, obter_historico_usuarios
+from src.endpoint.redes_numpy import exportar_pesos, inferir_arquitetura
+from src.endpoint.two_tower import MotorTwoTower, two_tower_path
+
+# Colunas e camadas do TwoTowerRecommender do notebook
+colunas_usuario = [
+    'media_treinos_semanais', 'tendencia_num_treinos', 'duracao_media_treinos', 'ano_nascimento',
+    'num_convites_enviados', 'num_convites_recebidos', 'foi_indicado', 'sexo_-1', 'sexo_0', 'sexo_1',
+    'aluno_philanthropist', 'aluno_socialiser', 'aluno_achiever', 'aluno_player', 'aluno_free_spirit',
+    'aluno_disruptor',
+] + features_historico
+camadas_usuario = [128, 64]
+camadas_item = [32]
+DIMENSAO_ITEM = 6 + 384  # one-hot do tipo de desafio + embedding da descrição
+DIMENSAO_EMBEDDING = 128
+
+
+def torre_sintetica(rng, prefixo, entrada, ocultas, camada_saida='output_embedding', dimensao_saida=DIMENSAO_EMBEDDING):
+    """state_dict aleatório de uma rede fc{i} -> bn{i} -> ReLU ... -> ``camada_saida``, como as dos notebooks"""
+    pesos = {}
+    for i, saida in enumerate(ocultas, start=1):
+        pesos[f'{prefixo}fc{i}.weight'] = rng.normal(0, entrada ** -0.5, (saida, entrada))
+        pesos[f'{prefixo}fc{i}.bias'] = np.zeros(saida)
+        pesos[f'{prefixo}bn{i}.weight'] = rng.uniform(0.5, 1.5, saida)
+        pesos[f'{prefixo}bn{i}.bias'] = rng.normal(0, 0.1, saida)
+        pesos[f'{prefixo}bn{i}.running_mean'] = rng.normal(0, 0.1, saida)
+        pesos[f'{prefixo}bn{i}.running_var'] = rng.uniform(0.5, 1.5, saida)
+        entrada = saida
+    pesos[f'{prefixo}{camada_saida}.weight'] = rng.normal(0, entrada ** -0.5, (dimensao_saida, entrada))
+    pesos[f'{prefixo}{camada_saida}.bias'] = np.zeros(dimensao_saida)
+    return pesos
+
+
+def exportar_sintetico(caminho, ids_desafios, semente=0):
+    """Two-tower com pesos aleatórios no formato de ``exportar_two_tower``"""
+    rng = np.random.default_rng(semente)
+    state_dict = {**torre_sintetica(rng, 'user_tower.', len(colunas_usuario), camadas_usuario),
+                  **torre_sintetica(rng, 'item_tower.', DIMENSAO_ITEM, camadas_item)}
+    numericas = colunas_usuario[:6]  # o notebook escalona apenas as colunas numéricas do aluno
+    metadados = {
+        'modelo': 'two_tower', 'sintetico': True,
+        'user_feature_cols': colunas_usuario, 'numeric_cols': numericas, 'item_feature_cols': None,
+        'arquitetura': {prefixo: inferir_arquitetura(set(state_dict), prefixo)
+                        for prefixo in ('user_tower.', 'item_tower.')},
+    }
+    ids = np.asarray(list(ids_desafios), dtype=np.int64)
+    return exportar_pesos(
+        caminho, state_dict, metadados,
+        scaler_media=rng.normal(0, 1, len(numericas)), scaler_escala=rng.uniform(0.5, 2, len(numericas)),
+        item_ids=ids, item_features=rng.normal(0, 1, (len(ids), DIMENSAO_ITEM)),
+    )
+
+
+def medir(funcao, entradas):
+    """Latências (µs) de cada chamada"""
+    tempos = np.empty(len(entradas))
+    for i, entrada in enumerate(entradas):
+        inicio = time.perf_counter()
+        funcao(entrada)
+        tempos[i] = time.perf_counter() - inicio
+    return tempos * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=2000)
+    parser.add_argument('--modelo', default=str(two_tower_path), help="arquivo exportado do two-tower")
+    parser.add_argument('--sintetico', metavar='CAMINHO', help="grava e usa um two-tower com pesos aleatórios")
+    args = parser.parse_args(argv)
+
+    estado = obter_estado()
+    historico_usuarios = obter_historico_usuarios()
+    caminho = args.modelo
+    if args.sintetico:
+        caminho = exportar_sintetico(args.sintetico, estado.challenges_data.keys())
+    motor = MotorTwoTower(caminho, estado.challenges_data.keys())
+    cache_recomendacoes.capacidade = 0  # perfis repetidos não devem favorecer o filtro por conteúdo
+
+    usuarios = gerar_usuarios(args.repeticoes)
+    for usuario in usuarios[:50]:  # aquecimento
+        _desafios_conteudo(estado, [usuario], TOP_K_VIZINHOS)
+        motor.recomendar([usuario], [historico_usuarios.obter(gerar_id(usuario['usuario'], usuario['senha']))])
+
+    casos = {
+        'conteudo': lambda u: _desafios_conteudo(estado, [u], TOP_K_VIZINHOS),
+        'two_tower': lambda u: motor.recomendar(
+            [u], [historico_usuarios.obter(gerar_id(u['usuario'], u['senha']))], TOP_DESAFIOS),
+    }
+    print(f"{len(estado.X_normalizado):d} usuários, {len(motor.item_ids):d} desafios no two-tower, "
+          f"{args.repeticoes} requisições")
+    for nome, funcao in casos.items():
+        tempos = medir(funcao, usuarios)
+        p50, p95, p99 = np.percentile(tempos, [50, 95, 99])
+        print(f"  {nome:10s} p50 {p50:8.1f} µs  p95 {p95:8.1f} µs  p99 {p99:8.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Participação da serialização JSON na latência de /recomendar.
+
+Compara o caminho padrão do FastAPI (jsonable_encoder + JSONResponse) com os
+fragmentos pré-serializados do catálogo (RespostaJSONRapida). Não grava registros.
+
+    python -m benchmarks.serializacao --repeticoes 5000 --desafios 5 50
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.endpoint.modelo import obter_estado
+from src.endpoint.recomendador import TOP_K_VIZINHOS, coletar_desafios, get_challenge_details
+from src.endpoint.serializacao import orjson, serializar_recomendacao
+
+ENTRADA = {
+    'usuario': 'benchmark', 'senha': 'benchmark', 'age': 30, 'height': 170, 'weight': 70,
+    'body_type': 'Feminino', 'goal': 'Hipertrofia', 'training_days': 4, 'training_time': 60,
+    'experience_level': 'Iniciante', 'score_philanthropist': 5, 'score_socialiser': 4,
+    'score_achiever': 6, 'score_player': 3, 'score_free_spirit': 2, 'score_disruptor': 1,
+}
+
+
+def medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6  # µs por chamada
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5000)
+    parser.add_argument('--desafios', type=int, nargs='+', default=[5, 50])
+    args = parser.parse_args(argv)
+
+    estado = obter_estado()
+
+    def calcular():
+        entradas = estado.preparar_entradas([ENTRADA])
+        idx_tops, scores_tops = estado.indice_vizinhos.buscar(entradas, TOP_K_VIZINHOS)
+        return coletar_desafios(estado, idx_tops, scores_tops)
+
+    with contextlib.redirect_stdout(io.StringIO()):  # coletar_desafios ainda imprime DEBUG
+        calculo_us = medir(calcular, args.repeticoes)
+
+    print(f"orjson: {'sim' if orjson is not None else 'não (json da biblioteca padrão)'}")
+    print(f"cálculo da recomendação: {calculo_us:8.1f} µs")
+    ids = list(estado.detalhes_desafios)
+    for n in args.desafios:
+        desafios = (ids * (n // len(ids) + 1))[:n]
+        resultado = {
+            'id': '0' * 64,
+            'desafios': get_challenge_details(desafios, estado),
+            'total_desafios': n,
+            'versao_modelo': estado.versao,
+        }
+        padrao_us = medir(lambda: JSONResponse(jsonable_encoder(resultado)), args.repeticoes)
+        rapido_us = medir(lambda: serializar_recomendacao(resultado, estado), args.repeticoes)
+        for nome, tempo in (('padrão FastAPI', padrao_us), ('fragmentos prontos', rapido_us)):
+            parcela = tempo / (calculo_us + tempo) * 100
+            print(f"{n:3d} desafios | {nome:18s}: {tempo:8.1f} µs ({parcela:4.1f}% da latência)")
+
+
+if __name__ == '__main__':
+    main()
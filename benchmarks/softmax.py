@@ -0,0 +1,112 @@
+"""Precisão e latência do modelo softmax em NumPy.
+
+Compara as probabilidades por tipo com a rede original calculada em
+float64 a partir do ``state_dict`` (Linear -> BatchNorm -> ReLU, sem dobrar nem dividir
+a primeira camada) e mede o tempo de ``prever_tipos`` para lotes de vários tamanhos.
+Sem um modelo exportado pelo notebook, ``--sintetico`` grava um ``RecSys`` com pesos
+aleatórios e as dimensões do notebook.
+
+    python -m benchmarks.softmax --sintetico /tmp/softmax.npz --lotes 1 100 1000 5000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.carga import gerar_usuarios
+from benchmarks.motores import DIMENSAO_ITEM, colunas_usuario, torre_sintetica
+from src.endpoint.historico_usuarios import padroes_historico
+from src.endpoint.modelo import obter_estado
+from src.endpoint.modelo_softmax import MotorSoftmax, softmax_path
+from src.endpoint.redes_numpy import carregar_pesos, exportar_pesos, inferir_arquitetura
+
+rotulos = ['desafio_achiever', 'desafio_disruptor', 'desafio_free_spirit', 'desafio_philanthropist',
+           'desafio_player', 'desafio_socialiser']
+DIMENSAO_EMBEDDING_DESCRICAO = DIMENSAO_ITEM - 6  # o softmax recebe só o embedding da descrição
+
+
+def exportar_sintetico(caminho, ids_desafios, semente=0):
+    """``RecSys`` com pesos aleatórios no formato de ``exportar_softmax``"""
+    rng = np.random.default_rng(semente)
+    entrada = len(colunas_usuario) + DIMENSAO_EMBEDDING_DESCRICAO
+    state_dict = torre_sintetica(rng, '', entrada, [128, 64], camada_saida='output', dimensao_saida=len(rotulos))
+    numericas = colunas_usuario[:6]
+    metadados = {
+        'modelo': 'softmax', 'sintetico': True,
+        'user_feature_cols': colunas_usuario, 'numeric_cols': numericas, 'labels': rotulos,
+        'arquitetura': inferir_arquitetura(set(state_dict), '', saida='output'),
+    }
+    ids = np.asarray(list(ids_desafios), dtype=np.int64)
+    return exportar_pesos(
+        caminho, state_dict, metadados,
+        scaler_media=rng.normal(0, 1, len(numericas)), scaler_escala=rng.uniform(0.5, 2, len(numericas)),
+        item_ids=ids, item_features=rng.normal(0, 0.05, (len(ids), DIMENSAO_EMBEDDING_DESCRICAO)),
+    )
+
+
+def referencia(caminho, x):
+    """Probabilidade média por tipo calculada como no torch (modo eval), em float64"""
+    pesos, extras, metadados = carregar_pesos(caminho)
+    itens = extras['item_features'].astype(np.float64)
+    entrada = np.concatenate([
+        np.repeat(x.astype(np.float64), len(itens), axis=0),
+        np.tile(itens, (len(x), 1)),
+    ], axis=1)
+    h = entrada
+    for linear, bn, relu in metadados['arquitetura']:
+        h = h @ pesos[f'{linear}.weight'].T + pesos[f'{linear}.bias']
+        if bn is not None:
+            h = (h - pesos[f'{bn}.running_mean']) / np.sqrt(pesos[f'{bn}.running_var'] + 1e-5) \
+                * pesos[f'{bn}.weight'] + pesos[f'{bn}.bias']
+        if relu:
+            h = np.maximum(h, 0)
+    probabilidades = 1 / (1 + np.exp(-h))
+    return probabilidades.reshape(len(x), len(itens), -1).mean(axis=1)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modelo', default=str(softmax_path), help="arquivo exportado do softmax")
+    parser.add_argument('--sintetico', metavar='CAMINHO', help="grava e usa um RecSys com pesos aleatórios")
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 100, 1000, 5000])
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    estado = obter_estado()
+    caminho = args.modelo
+    if args.sintetico:
+        caminho = exportar_sintetico(args.sintetico, estado.challenges_data.keys())
+    motor = MotorSoftmax(caminho, estado.challenges_data)
+
+    usuarios = gerar_usuarios(max(args.lotes + [2000]))
+    x = motor.montar_features(usuarios, [padroes_historico] * len(usuarios))
+    esperado = referencia(caminho, x[:2000])
+    top1 = esperado.argmax(axis=1)
+    top2 = np.sort(np.argsort(-esperado, axis=1)[:, :2], axis=1)
+
+    print(f"{len(motor.item_ids)} desafios; precisão contra a rede original em float64 (2000 usuários)")
+    previsto = motor.prever_tipos(x[:2000])
+    erro = np.abs(previsto - esperado)
+    acerto1 = np.mean(previsto.argmax(axis=1) == top1)
+    acerto2 = np.mean(np.all(np.sort(np.argsort(-previsto, axis=1)[:, :2], axis=1) == top2, axis=1))
+    pesos = sum(c.peso.nbytes for rede in (motor.camada_usuario, motor.restante) for c in rede.camadas)
+    print(f"  erro máx {erro.max():.2e}  erro médio {erro.mean():.2e}  "
+          f"top-1 igual {acerto1:6.1%}  top-2 igual {acerto2:6.1%}  pesos {pesos / 1024:6.1f} KB")
+
+    print("latência de prever_tipos (mediana)")
+    for n in args.lotes:
+        tempo = medir(lambda: motor.prever_tipos(x[:n]), args.repeticoes)
+        print(f"  {n:6d} usuários  {tempo * 1000:8.2f} ms ({n / tempo:10,.0f} usuários/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CacheLRU:
+    """Cache limitado com despejo LRU e expiração por TTL, seguro entre threads"""
+
+    def __init__(self, capacidade=10_000, ttl=300.0):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.despejos = 0
+        self.expirados = 0
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            valor, expira_em = item
+            if expira_em is not None and agora >= expira_em:
+                del self._itens[chave]
+                self.expirados += 1
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def guardar(self, chave, valor):
+        if self.capacidade <= 0:
+            return
+        expira_em = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.despejos += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+    @property
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                'tamanho': len(self._itens),
+                'capacidade': self.capacidade,
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': self.hits / consultas if consultas else None,
+                'despejos': self.despejos,
+                'expirados': self.expirados,
+            }
+
+
+class CacheRecomendacoes(CacheLRU):
+    """Cache de desafios recomendados, indexado pelo vetor de features codificado.
+
+    Com ``casas_decimais`` definido, o vetor normalizado é arredondado antes de
+    compor a chave, de forma que perfis quase idênticos compartilham a entrada.
+    """
+
+    def __init__(self, capacidade=10_000, ttl=300.0, casas_decimais=None):
+        super().__init__(capacidade, ttl)
+        self.casas_decimais = casas_decimais
+
+    @property
+    def ativo(self):
+        return self.capacidade > 0
+
+    def chave(self, vetor, k, versao):
+        if self.casas_decimais is not None:
+            vetor = np.round(vetor, self.casas_decimais) + 0.0  # +0.0 unifica -0.0 e 0.0
+        return versao, k, np.ascontiguousarray(vetor, dtype=np.float32).tobytes()
+
+
+def criar_cache_recomendacoes():
+    """Cache configurado pelas variáveis SQUAD_CACHE_*; tamanho 0 desativa"""
+    casas = os.getenv('SQUAD_CACHE_CASAS_DECIMAIS', '')
+    return CacheRecomendacoes(
+        capacidade=int(os.getenv('SQUAD_CACHE_TAMANHO', '10000')),
+        ttl=float(os.getenv('SQUAD_CACHE_TTL', '300')),
+        casas_decimais=int(casas) if casas else None,
+    )
@@ -0,0 +1,126 @@
+"""Cache em disco dos embeddings das descrições dos desafios (usado no treino dos notebooks).
+
+Cada texto distinto é codificado uma única vez por modelo: os vetores ficam em um
+arquivo float32 mapeado em memória (``vetores.f32``) e ``chaves.npy`` guarda o sha256
+do texto de cada linha. Uma nova execução só codifica textos ainda não vistos.
+As interações referenciam os vetores pelo id do desafio (``por_desafio``) em vez
+de repetir as 384 colunas em cada linha.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+base_dir = Path(__file__).resolve().parents[2]
+cache_embeddings_dir = Path(os.getenv('SQUAD_CACHE_EMBEDDINGS', base_dir / 'src' / 'dataframe' / 'embeddings'))
+
+MODELO_PADRAO = 'all-MiniLM-L6-v2'
+
+
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).digest()
+
+
+class CacheEmbeddings:
+    """Vetores por (modelo, sha256 do texto); ``codificador`` substitui o SentenceTransformer"""
+
+    def __init__(self, diretorio=cache_embeddings_dir, modelo=MODELO_PADRAO, codificador=None, tamanho_lote=64):
+        self.modelo = modelo
+        self.diretorio = Path(diretorio) / re.sub(r'[^\w.-]+', '_', modelo)
+        self.tamanho_lote = tamanho_lote
+        self._codificador = codificador
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def __len__(self):
+        return len(self._linhas)
+
+    @property
+    def vetores(self):
+        """Todos os vetores do cache (memmap somente leitura), na ordem de inserção"""
+        return self._vetores
+
+    # === Persistência ===
+
+    def _carregar(self):
+        self._linhas = {}
+        self._vetores = None
+        self.dimensao = None
+        arquivo_chaves = self.diretorio / 'chaves.npy'
+        if not arquivo_chaves.exists():
+            return
+        metadados = json.loads((self.diretorio / 'metadados.json').read_text())
+        if metadados['modelo'] != self.modelo:
+            raise ValueError(f"Cache em {self.diretorio} pertence ao modelo {metadados['modelo']}")
+        chaves = np.load(arquivo_chaves)
+        self.dimensao = metadados['dimensao']
+        self._linhas = {chave.tobytes(): linha for linha, chave in enumerate(chaves)}
+        self._mapear()
+
+    def _mapear(self):
+        if self._linhas:
+            self._vetores = np.memmap(self.diretorio / 'vetores.f32', dtype=np.float32, mode='r',
+                                      shape=(len(self._linhas), self.dimensao))
+
+    def _acrescentar(self, chaves, vetores):
+        """Grava os vetores antes do índice: um índice gravado só referencia linhas que existem"""
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        if self.dimensao is None:
+            self.dimensao = vetores.shape[1]
+            metadados = {'modelo': self.modelo, 'dimensao': self.dimensao}
+            (self.diretorio / 'metadados.json').write_text(json.dumps(metadados))
+        arquivo_vetores = self.diretorio / 'vetores.f32'
+        with open(arquivo_vetores, 'r+b' if arquivo_vetores.exists() else 'wb') as f:
+            f.seek(len(self._linhas) * self.dimensao * 4)  # descarta sobras de uma gravação interrompida
+            f.write(np.ascontiguousarray(vetores, dtype=np.float32).tobytes())
+            f.truncate()
+        for chave in chaves:
+            self._linhas[chave] = len(self._linhas)
+
+        todas = np.frombuffer(b''.join(self._linhas), dtype=np.uint8).reshape(-1, 32)
+        temporario = self.diretorio / 'chaves.tmp.npy'
+        np.save(temporario, todas)
+        os.replace(temporario, self.diretorio / 'chaves.npy')
+        self._mapear()
+
+    # === Codificação ===
+
+    def _codificar(self, textos):
+        if self._codificador is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._codificador = SentenceTransformer(self.modelo).encode
+        return np.asarray(self._codificador(textos, batch_size=self.tamanho_lote), dtype=np.float32)
+
+    def linhas(self, textos):
+        """Linha de cada texto em ``vetores``, codificando apenas os textos distintos ainda ausentes"""
+        posicoes, unicos = pd.factorize(pd.Series(textos, dtype=object).fillna(''))
+        chaves = [hash_texto(texto) for texto in unicos]
+        with self._lock:
+            faltantes = {chave: texto for chave, texto in zip(chaves, unicos) if chave not in self._linhas}
+            if faltantes:
+                self._acrescentar(list(faltantes), self._codificar(list(faltantes.values())))
+            linhas_unicos = np.fromiter((self._linhas[chave] for chave in chaves), dtype=np.int64, count=len(chaves))
+        return linhas_unicos[posicoes]
+
+    def codificar(self, textos):
+        """Matriz (len(textos), dimensao) em float32, como ``SentenceTransformer.encode``"""
+        textos = list(textos)
+        if not textos:
+            return np.empty((0, self.dimensao or 0), dtype=np.float32)
+        linhas = self.linhas(textos)
+        return np.asarray(self._vetores[linhas])
+
+    def por_desafio(self, ids, textos, prefixo='desc_emb_'):
+        """Uma linha de embedding por id de desafio (a primeira descrição de cada id), indexada pelo id"""
+        pares = pd.DataFrame({'id': np.asarray(ids), 'texto': pd.Series(textos).fillna('').to_numpy()})
+        pares = pares.drop_duplicates('id').sort_values('id')
+        vetores = self.codificar(pares['texto'].tolist())
+        colunas = [f'{prefixo}{i}' for i in range(vetores.shape[1])]
+        indice = pd.Index(pares['id'].to_numpy(), name=getattr(ids, 'name', None))
+        return pd.DataFrame(vetores, index=indice, columns=colunas)
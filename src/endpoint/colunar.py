@@ -0,0 +1,213 @@
+"""Exportações brutas de ``dataframes/`` em Parquet (colunar, tipado e comprimido).
+
+O CSV é lido uma única vez na conversão; ``carregar`` lê o Parquet com projeção de
+colunas e filtros (``cliente_codigo``/``_chave``) aplicados por row group. Texto de
+baixa cardinalidade vira ``category`` e as datas viram ``datetime64``. O Parquet é
+refeito automaticamente quando o CSV de origem muda.
+
+    python -m src.endpoint.colunar converter
+    python -m src.endpoint.colunar comparar
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# === Caminhos ===
+base_dir = Path(__file__).resolve().parents[2]
+dataframes_dir = base_dir / 'dataframes'
+colunar_dir = Path(os.getenv('SQUAD_COLUNAR_DIR', dataframes_dir / 'colunar'))
+
+# Linhas por row group: pequeno o bastante para que os filtros por cliente pulem a maior parte do arquivo
+LINHAS_POR_GRUPO = 2048
+
+# Texto com até esta fração de valores distintos (ou até 64 valores) vira category
+FRACAO_CATEGORICA = 0.05
+
+# Configuração de leitura de cada exportação
+exportacoes = {
+    'avaliacaofisica': {
+        'arquivo': 'avaliacaofisica.csv', 'sep': '\t', 'encoding': 'latin-1',
+        'datas': ['dataavaliacao', 'dataproxima'],
+        'inteiros': ['cliente_codigo', 'codigo'],
+    },
+    'programatreino': {
+        'arquivo': 'programatreino.csv', 'sep': '\t', 'encoding': 'latin-1',
+        'datas': ['datainicio', 'datalancamento', 'dataproximarevisao', 'datarenovacao',
+                  'dataterminoprevisto', 'dataultimaatualizacao'],
+        'inteiros': ['cliente_codigo', 'codigo'],
+    },
+    'personas_hexad_pacto': {
+        'arquivo': 'personas_hexad_pacto.csv', 'sep': ',', 'encoding': 'utf-8', 'index_col': 0,
+        'datas': [],
+        'inteiros': ['cliente_codigo'],
+    },
+    'personas_hexad_respostas_pacto': {
+        'arquivo': 'personas_hexad_respostas_pacto.csv', 'sep': ',', 'encoding': 'utf-8-sig',
+        'datas': [],
+        'inteiros': ['cliente_codigo'],
+    },
+}
+
+# Ordenação gravada no Parquet (mantém os clientes agrupados nos row groups)
+ordenacao = ['_chave', 'cliente_codigo', 'codigo']
+
+
+def caminho_csv(nome, origem=dataframes_dir):
+    return Path(origem) / exportacoes[nome]['arquivo']
+
+
+def caminho_parquet(nome, diretorio=colunar_dir):
+    return Path(diretorio) / f'{nome}.parquet'
+
+
+def ler_csv(nome, origem=dataframes_dir, **kwargs):
+    """Leitura direta do CSV bruto (caminho antigo, sem tipagem)"""
+    config = exportacoes[nome]
+    return pd.read_csv(caminho_csv(nome, origem), sep=config['sep'], encoding=config['encoding'],
+                       index_col=config.get('index_col'), **kwargs)
+
+
+def tipar(df, nome):
+    """Datas, inteiros e booleanos anuláveis e texto de baixa cardinalidade como category"""
+    config = exportacoes[nome]
+    df = df.reset_index(drop=True)
+    for coluna in config['datas']:
+        if coluna in df:
+            df[coluna] = pd.to_datetime(df[coluna], format='ISO8601', errors='coerce')
+    for coluna in config['inteiros']:
+        if coluna in df:
+            df[coluna] = df[coluna].astype('Int64')
+    limite = max(64, int(len(df) * FRACAO_CATEGORICA))
+    for coluna in df.columns:
+        if not (pd.api.types.is_object_dtype(df[coluna]) or pd.api.types.is_string_dtype(df[coluna])):
+            continue
+        valores = df[coluna].dropna()
+        if len(valores) and valores.map(type).eq(bool).all():
+            df[coluna] = df[coluna].astype('boolean')  # True/False com vazios
+        elif valores.nunique() <= limite:
+            df[coluna] = df[coluna].astype('category')
+    return df
+
+
+def _assinatura_origem(caminho):
+    estado = os.stat(caminho)
+    return {'arquivo': Path(caminho).name, 'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def converter(nome, origem=dataframes_dir, diretorio=colunar_dir):
+    """Converte uma exportação para Parquet (zstd, ordenada por chave/cliente); retorna o caminho"""
+    df = tipar(ler_csv(nome, origem), nome)
+    chaves = [c for c in ordenacao if c in df]
+    if chaves:
+        df = df.sort_values(chaves, kind='stable', na_position='last').reset_index(drop=True)
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[b'squad.origem'] = json.dumps(_assinatura_origem(caminho_csv(nome, origem))).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    destino = caminho_parquet(nome, diretorio)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_suffix('.parquet.tmp')
+    pq.write_table(tabela, temporario, compression='zstd', row_group_size=LINHAS_POR_GRUPO,
+                   use_dictionary=True, write_statistics=True)
+    os.replace(temporario, destino)
+    return destino
+
+
+def atualizado(nome, origem=dataframes_dir, diretorio=colunar_dir):
+    """O Parquet existe e foi gerado a partir da versão atual do CSV"""
+    destino = caminho_parquet(nome, diretorio)
+    if not destino.exists():
+        return False
+    metadados = pq.read_schema(destino).metadata or {}
+    gravada = metadados.get(b'squad.origem')
+    origem_csv = caminho_csv(nome, origem)
+    if gravada is None or not origem_csv.exists():
+        return gravada is not None
+    return json.loads(gravada) == _assinatura_origem(origem_csv)
+
+
+def filtros_por_chave(clientes=None, chaves=None):
+    """Filtros do pyarrow para ``cliente_codigo`` e ``_chave`` (None = sem filtro)"""
+    filtros = []
+    if clientes is not None:
+        filtros.append(('cliente_codigo', 'in', [int(c) for c in clientes]))
+    if chaves is not None:
+        filtros.append(('_chave', 'in', list(chaves)))
+    return filtros or None
+
+
+def carregar(nome, colunas=None, clientes=None, chaves=None, filtros=None,
+             origem=dataframes_dir, diretorio=colunar_dir):
+    """Lê uma exportação do Parquet, convertendo o CSV antes se necessário.
+
+    ``colunas`` projeta apenas as colunas pedidas; ``clientes``/``chaves`` (e ``filtros``
+    no formato do pyarrow) são avaliados com as estatísticas dos row groups.
+    """
+    if not atualizado(nome, origem, diretorio):
+        converter(nome, origem, diretorio)
+    filtros = (filtros or []) + (filtros_por_chave(clientes, chaves) or [])
+    return pd.read_parquet(caminho_parquet(nome, diretorio), engine='pyarrow',
+                           columns=colunas, filters=filtros or None)
+
+
+# === Comparação com read_csv ===
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        df = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2], df.memory_usage(deep=True).sum(), len(df)
+
+
+def comparar(nome, repeticoes=5):
+    """Tempo mediano e memória (deep) do read_csv x Parquet: completo, projetado e filtrado"""
+    if not atualizado(nome):
+        converter(nome)
+    amostra = pd.read_parquet(caminho_parquet(nome), columns=['cliente_codigo'])['cliente_codigo'].dropna()
+    clientes = amostra.drop_duplicates().head(10).tolist()
+    colunas = [c for c in ('cliente_codigo', '_chave', 'codigo', 'peso', 'altura', 'imc', 'nrtreinosrealizados')
+               if c in pq.read_schema(caminho_parquet(nome)).names]
+
+    casos = [
+        ('read_csv', lambda: ler_csv(nome)),
+        ('read_csv + filtro', lambda: (lambda df: df[df['cliente_codigo'].isin(clientes)])(ler_csv(nome))),
+        ('parquet', lambda: carregar(nome)),
+        ('parquet projetado', lambda: carregar(nome, colunas=colunas)),
+        ('parquet filtrado', lambda: carregar(nome, clientes=clientes)),
+    ]
+    return [(caso, *_medir(funcao, repeticoes)) for caso, funcao in casos]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportações de dataframes/ em Parquet")
+    parser.add_argument('comando', choices=['converter', 'comparar'])
+    parser.add_argument('nomes', nargs='*', default=list(exportacoes))
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for nome in args.nomes:
+        if args.comando == 'converter':
+            inicio = time.perf_counter()
+            destino = converter(nome)
+            tamanho_csv = caminho_csv(nome).stat().st_size
+            print(f"{nome}: {destino} ({tamanho_csv / 1024:.0f} KB -> {destino.stat().st_size / 1024:.0f} KB, "
+                  f"{time.perf_counter() - inicio:.2f}s)")
+        else:
+            print(f"{nome}:")
+            for caso, tempo, memoria, linhas in comparar(nome, args.repeticoes):
+                print(f"  {caso:18s} {tempo * 1000:8.1f} ms  {memoria / 1024:8.0f} KB  {linhas:6d} linhas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Índice de coocorrência de desafios ("quem fez o desafio 14 também fez...").
+
+Cada cesta é o conjunto de desafios de um usuário: ``recommended_challenges`` e
+``completed_challenges`` de uma linha do dataset, ou os desafios de uma avaliação em
+``avaliacoes.csv``. As contagens ficam em uma matriz esparsa (CSR) desafio x desafio
+(``BᵀB`` da matriz binária cesta x desafio, sem a diagonal) e os ``TOP_SIMILARES``
+vizinhos de cada desafio são ordenados uma única vez (contagem decrescente, id
+crescente no empate); a consulta é uma busca em dicionário.
+
+O índice é compilado offline junto com o número de avaliações incluídas. Na carga,
+as avaliações gravadas depois disso são somadas. Cada avaliação gravada em
+``avaliacoes.csv``, por qualquer worker, chega por ``aplicar_avaliacoes`` (consumidor de
+``AcompanhamentoRegistros``): os pares da cesta vão para um buffer (dicionário por desafio)
+e apenas os desafios afetados são reordenados, lendo a matriz base mais o buffer; o buffer
+é incorporado à matriz a cada ``LIMITE_PENDENTES`` pares:
+
+    python -m src.endpoint.coocorrencia compilar
+"""
+import argparse
+import contextlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from src.endpoint.indice_desafios import parse_lista_desafios
+from src.endpoint.modelo import ao_recarregar, base_dir
+from src.endpoint.registro import LeitorIncremental
+
+coocorrencia_path = Path(os.getenv('SQUAD_COOCORRENCIA_PATH', base_dir / 'src' / 'dataframe' / 'coocorrencia.npz'))
+
+# Vizinhos pré-ordenados por desafio (máximo de GET /desafios/{id}/similares)
+TOP_SIMILARES = int(os.getenv('SQUAD_COOCORRENCIA_TOP', '10'))
+
+# Pares acumulados no buffer antes de incorporá-lo à matriz (O(nnz)); lotes de cestas maiores
+# que LIMITE_CESTAS_BUFFER (ex.: avaliações lidas na carga) vão direto para a matriz
+LIMITE_PENDENTES = 50_000
+LIMITE_CESTAS_BUFFER = 100
+
+
+def matriz_cestas(linhas, desafios, n_cestas, posicao):
+    """Matriz binária cesta x desafio a partir de pares (cesta, id do desafio)"""
+    desafios = np.asarray(desafios, dtype=np.int64)
+    colunas = np.array([posicao.get(int(c), -1) for c in desafios], dtype=np.int64)
+    validos = colunas >= 0
+    matriz = sparse.csr_matrix(
+        (np.ones(int(validos.sum()), dtype=np.int64), (np.asarray(linhas)[validos], colunas[validos])),
+        shape=(n_cestas, len(posicao)),
+    )
+    matriz.sum_duplicates()
+    matriz.data[:] = 1  # desafio repetido na mesma cesta conta uma vez
+    return matriz
+
+
+def _coocorrencias(cestas):
+    contagens = (cestas.T @ cestas).tocsr()
+    contagens.setdiag(0)
+    contagens.eliminate_zeros()
+    return contagens
+
+
+class IndiceCoocorrencia:
+    """Contagens desafio x desafio e os vizinhos mais frequentes de cada desafio"""
+
+    def __init__(self, item_ids, contagens, versao=None, avaliacoes_incluidas=0, top_n=TOP_SIMILARES):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self._posicao = {int(challenge_id): j for j, challenge_id in enumerate(self.item_ids)}
+        self.contagens = sparse.csr_matrix(contagens, dtype=np.int64)
+        self.versao = versao
+        self.avaliacoes_incluidas = avaliacoes_incluidas
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._pendentes = {}  # posição -> {posição do vizinho: contagem a somar}
+        self._total_pendentes = 0
+        self._similares = {}
+        self._ordenar(range(len(self.item_ids)))
+
+    @classmethod
+    def de_estado(cls, estado, avaliacoes=(), **kwargs):
+        """Cestas do dataset (recomendados + concluídos de cada linha) e das avaliações"""
+        item_ids = sorted(estado.challenges_data)
+        posicao = {challenge_id: j for j, challenge_id in enumerate(item_ids)}
+        linhas, desafios = [], []
+        for indice in (estado.indice_recomendados, estado.indice_concluidos):
+            linhas.append(np.repeat(np.arange(len(indice)), np.diff(indice.offsets)))
+            desafios.append(indice.valores)
+        n_cestas = len(estado.indice_recomendados)
+        cestas = matriz_cestas(np.concatenate(linhas), np.concatenate(desafios), n_cestas, posicao)
+        indice = cls(item_ids, _coocorrencias(cestas), versao=estado.versao, **kwargs)
+        indice.adicionar(avaliacoes)
+        return indice
+
+    def _linha(self, j):
+        """(posições dos vizinhos, contagens) do desafio ``j``: matriz base mais o buffer"""
+        contagens = self.contagens
+        inicio, fim = contagens.indptr[j], contagens.indptr[j + 1]
+        posicoes, quantidades = contagens.indices[inicio:fim], contagens.data[inicio:fim]
+        pendentes = self._pendentes.get(j)
+        if pendentes:
+            posicoes = np.concatenate([posicoes, np.fromiter(pendentes, dtype=posicoes.dtype, count=len(pendentes))])
+            quantidades = np.concatenate([quantidades, np.fromiter(pendentes.values(), dtype=np.int64,
+                                                                   count=len(pendentes))])
+            posicoes, inverso = np.unique(posicoes, return_inverse=True)
+            quantidades = np.bincount(inverso, weights=quantidades).astype(np.int64)
+        return posicoes, quantidades
+
+    def _ordenar(self, posicoes):
+        for j in posicoes:
+            vizinhos, quantidades = self._linha(j)
+            vizinhos = self.item_ids[vizinhos]
+            ordem = np.lexsort((vizinhos, -quantidades))[:self.top_n]
+            # Tupla nova a cada atualização: leituras concorrentes veem a lista antiga ou a nova
+            self._similares[int(self.item_ids[j])] = tuple(zip(vizinhos[ordem].tolist(), quantidades[ordem].tolist()))
+
+    def similares(self, challenge_id, n=None):
+        """[(id, coocorrências), ...] em ordem decrescente; ``None`` se o desafio não está no catálogo"""
+        vizinhos = self._similares.get(challenge_id)
+        return None if vizinhos is None else list(vizinhos[:n])
+
+    def adicionar(self, cestas, no_log=True):
+        """Soma novas cestas (listas de ids) e reordena os desafios cujas contagens mudaram.
+
+        ``no_log=False``: cestas ainda fora do log, que não avançam ``avaliacoes_incluidas``.
+        """
+        cestas = list(cestas)
+        if len(cestas) > LIMITE_CESTAS_BUFFER:
+            return self._adicionar_matriz(cestas, no_log)
+        posicoes_cestas = []
+        for cesta in cestas:
+            posicoes = {self._posicao.get(challenge_id) for challenge_id in parse_lista_desafios(cesta)}
+            posicoes.discard(None)
+            posicoes_cestas.append(sorted(posicoes))
+        with self._lock:
+            # Cestas vazias também contam: avaliacoes_incluidas é a posição em avaliacoes.csv
+            if no_log:
+                self.avaliacoes_incluidas += len(cestas)
+            afetados = set()
+            for posicoes in posicoes_cestas:
+                for j in posicoes:
+                    pendentes = self._pendentes.setdefault(j, {})
+                    for l in posicoes:
+                        if l != j:
+                            pendentes[l] = pendentes.get(l, 0) + 1
+                            self._total_pendentes += 1
+                if len(posicoes) > 1:
+                    afetados.update(posicoes)
+            self._ordenar(sorted(afetados))
+            if self._total_pendentes >= LIMITE_PENDENTES:
+                self._consolidar()
+        return len(cestas)
+
+    def aplicar(self, registros, inicio=0):
+        """Soma as cestas das avaliações ``registros`` (posições ``inicio``... do log) ainda não incluídas.
+
+        ``inicio=None``: avaliações deste processo ainda fora do log; lidas depois, chegam como
+        ``None`` e contam só como posição (cesta vazia).
+        """
+        if inicio is None:
+            return self.adicionar([registro.get('Recomendacao_Desafios', '') for registro in registros], no_log=False)
+        novos = registros[max(self.avaliacoes_incluidas - inicio, 0):]
+        return self.adicionar(['' if registro is None else registro.get('Recomendacao_Desafios', '')
+                               for registro in novos])
+
+    def _adicionar_matriz(self, cestas, no_log=True):
+        linhas, desafios = [], []
+        for n, cesta in enumerate(cestas):
+            ids = parse_lista_desafios(cesta)
+            linhas.extend([n] * len(ids))
+            desafios.extend(ids)
+        delta = _coocorrencias(matriz_cestas(linhas, desafios, len(cestas), self._posicao)) if desafios else None
+        with self._lock:
+            if no_log:
+                self.avaliacoes_incluidas += len(cestas)
+            if delta is not None and delta.nnz:
+                self._consolidar(delta)
+                self._ordenar(np.unique(delta.nonzero()[0]))
+        return len(cestas)
+
+    def _consolidar(self, delta=None):
+        """Incorpora o buffer (e ``delta``) à matriz base; chamado com o lock"""
+        if self._pendentes:
+            linhas = [j for j, pendentes in self._pendentes.items() for _ in pendentes]
+            colunas = [l for pendentes in self._pendentes.values() for l in pendentes]
+            valores = [v for pendentes in self._pendentes.values() for v in pendentes.values()]
+            buffer = sparse.csr_matrix((np.asarray(valores, dtype=np.int64), (linhas, colunas)),
+                                       shape=self.contagens.shape)
+            delta = buffer if delta is None else delta + buffer
+            self._pendentes = {}
+            self._total_pendentes = 0
+        if delta is not None:
+            self.contagens = (self.contagens + delta).tocsr()
+
+    def salvar(self, caminho=coocorrencia_path):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with self._lock:
+            self._consolidar()
+            contagens = self.contagens
+            with open(temporario, 'wb') as f:
+                np.savez(f, item_ids=self.item_ids, data=contagens.data, indices=contagens.indices,
+                         indptr=contagens.indptr, versao=np.array(self.versao or ''),
+                         avaliacoes_incluidas=np.array(self.avaliacoes_incluidas))
+        os.replace(temporario, caminho)
+        return caminho
+
+    @classmethod
+    def carregar(cls, caminho=coocorrencia_path):
+        with np.load(caminho) as arquivo:
+            item_ids = arquivo['item_ids']
+            contagens = sparse.csr_matrix((arquivo['data'], arquivo['indices'], arquivo['indptr']),
+                                          shape=(len(item_ids), len(item_ids)))
+            return cls(item_ids, contagens, versao=str(arquivo['versao']) or None,
+                       avaliacoes_incluidas=int(arquivo['avaliacoes_incluidas']))
+
+
+def cestas_avaliacoes(escritor):
+    """Desafios de cada avaliação gravada, na ordem do log (a mesma posição vista por ``AcompanhamentoRegistros``)"""
+    if escritor is None:
+        return []
+    return [registro.get('Recomendacao_Desafios', '') for registro in LeitorIncremental(escritor).novos()]
+
+
+_indices = {}
+_lock_indices = threading.Lock()
+_acompanhamentos = []
+
+
+def aplicar_avaliacoes(registros, inicio=0):
+    """Consumidor de ``AcompanhamentoRegistros``: soma as avaliações aos índices carregados"""
+    for indice in list(_indices.values()):
+        indice.aplicar(registros, inicio)
+
+
+def _carregar_indice(estado, escritor, limite=None):
+    cestas = cestas_avaliacoes(escritor)[:limite]
+    if coocorrencia_path.exists():
+        indice = IndiceCoocorrencia.carregar(coocorrencia_path)
+        if indice.versao == estado.versao and indice.avaliacoes_incluidas <= len(cestas):
+            indice.adicionar(cestas[indice.avaliacoes_incluidas:])
+            return indice
+        logging.info("Índice de coocorrência compilado para outra versão do modelo; recompilando em memória.")
+    return IndiceCoocorrencia.de_estado(estado, cestas)
+
+
+def obter_indice_coocorrencia(estado, avaliacoes=None):
+    """Índice da versão do estado: o arquivo compilado mais as avaliações posteriores, ou compilado em memória.
+
+    ``avaliacoes`` é o ``AcompanhamentoRegistros`` de ``avaliacoes.csv``; a carga segura o lock
+    dele para que nenhuma avaliação seja aplicada entre a leitura do disco e a publicação do índice,
+    e as avaliações seguintes passam a chegar por ``aplicar_avaliacoes``.
+    """
+    indice = _indices.get(estado.versao)
+    if indice is None:
+        with avaliacoes.lock if avaliacoes is not None else contextlib.nullcontext(), _lock_indices:
+            indice = _indices.get(estado.versao)
+            if indice is None:
+                escritor = avaliacoes.escritor if avaliacoes is not None else None
+                if avaliacoes is not None and avaliacoes.pendentes:
+                    # Até a posição lida e mais as avaliações deste processo aplicadas na hora: as
+                    # que já estão no disco, mas ainda não foram lidas, chegarão como ``None``
+                    indice = _carregar_indice(estado, escritor, avaliacoes.lidos)
+                    indice.aplicar(avaliacoes.locais, None)
+                else:
+                    indice = _carregar_indice(estado, escritor)
+                _indices[estado.versao] = indice
+            if avaliacoes is not None and avaliacoes not in _acompanhamentos:
+                _acompanhamentos.append(avaliacoes)
+                avaliacoes.consumidor(aplicar_avaliacoes)
+    return indice
+
+
+ao_recarregar(lambda estado: _indices.clear())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila o índice de coocorrência de desafios")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    compilar = sub.add_parser('compilar', help="compila e grava o índice")
+    compilar.add_argument('--saida', default=str(coocorrencia_path))
+    args = parser.parse_args(argv)
+
+    from src.endpoint.modelo import obter_estado
+    from src.endpoint.recomendador import registro_avaliacoes
+    estado = obter_estado()
+    indice = IndiceCoocorrencia.de_estado(estado, cestas_avaliacoes(registro_avaliacoes))
+    caminho = indice.salvar(args.saida)
+    print(f"Índice de coocorrência gravado em {caminho}: {len(indice.item_ids)} desafios, "
+          f"{indice.contagens.nnz} pares, {indice.avaliacoes_incluidas} avaliações (modelo {estado.versao})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Dataset de treino dos notebooks (usuário, desafio, rótulo) em arrays float32 contíguos.
+
+Substitui o ``InteractionDataset`` com ``iloc`` por amostra: as features são convertidas
+uma única vez e cada lote é obtido por fatiamento. As features dos desafios ficam em uma
+tabela com uma linha por ``item_id`` (ver ``cache_embeddings``) e cada interação guarda só
+a posição do desafio nela. Com ``diretorio``, os arrays são gravados em ``.npy`` e abertos
+com memmap, para conjuntos maiores que a memória.
+
+O torch só é importado por ``carregador``; os lotes são arrays NumPy, convertidos em
+tensores pelo ``DataLoader``.
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+
+# Linhas convertidas por vez ao gravar os arrays em disco
+LINHAS_POR_BLOCO = 65536
+
+
+def _para_float32(df, colunas, destino=None):
+    """Colunas do DataFrame em float32 (NaN -> 0), em blocos quando há um destino (memmap)"""
+    if destino is None:
+        destino = np.empty((len(df), len(colunas)), dtype=np.float32)
+    nans = 0
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO][colunas].to_numpy(dtype=np.float32, na_value=np.nan)
+        nans += int(np.isnan(bloco).any(axis=1).sum())
+        destino[inicio:inicio + len(bloco)] = np.nan_to_num(bloco)
+    return destino, nans
+
+
+class DatasetInteracoes:
+    """``dataset[idx]`` -> (features do usuário, features do desafio, rótulos) para um índice, fatia ou lote"""
+
+    arquivos = ('usuarios', 'itens', 'posicoes_itens', 'rotulos')
+
+    def __init__(self, usuarios, itens, posicoes_itens, rotulos):
+        self.usuarios = usuarios
+        self.itens = itens
+        self.posicoes_itens = posicoes_itens
+        self.rotulos = rotulos
+
+    def __len__(self):
+        return len(self.usuarios)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, list):
+            idx = np.asarray(idx)
+        return self.usuarios[idx], self.itens[self.posicoes_itens[idx]], self.rotulos[idx]
+
+    @property
+    def dimensao_usuario(self):
+        return self.usuarios.shape[1]
+
+    @property
+    def dimensao_item(self):
+        return self.itens.shape[1]
+
+    @classmethod
+    def de_dataframe(cls, df, colunas_usuario, itens, colunas_rotulo, coluna_item='item_id', diretorio=None):
+        """Converte as interações de uma vez.
+
+        ``itens``: DataFrame indexado por ``coluna_item`` com as features dos desafios
+        (interações sem desafio conhecido recebem features zeradas, como o ``nan_to_num``
+        do dataset antigo). ``colunas_rotulo``: uma coluna (``'label'``) ou uma lista.
+        """
+        colunas_rotulo = [colunas_rotulo] if isinstance(colunas_rotulo, str) else list(colunas_rotulo)
+        df = df.reset_index(drop=True)
+        tabela_itens = np.zeros((len(itens) + 1, itens.shape[1]), dtype=np.float32)  # última linha: desafio ausente
+        tabela_itens[:-1], nans_itens = _para_float32(itens, list(itens.columns))
+        posicoes = itens.index.get_indexer(df[coluna_item])
+        posicoes[posicoes < 0] = len(itens)
+
+        if diretorio is None:
+            usuarios, nans_usuarios = _para_float32(df, list(colunas_usuario))
+            rotulos, nans_rotulos = _para_float32(df, colunas_rotulo)
+        else:
+            diretorio = Path(diretorio)
+            diretorio.mkdir(parents=True, exist_ok=True)
+            usuarios, nans_usuarios = _para_float32(df, list(colunas_usuario), np.lib.format.open_memmap(
+                diretorio / 'usuarios.npy', mode='w+', dtype=np.float32, shape=(len(df), len(colunas_usuario))))
+            rotulos, nans_rotulos = _para_float32(df, colunas_rotulo, np.lib.format.open_memmap(
+                diretorio / 'rotulos.npy', mode='w+', dtype=np.float32, shape=(len(df), len(colunas_rotulo))))
+            usuarios.flush()
+            rotulos.flush()
+            np.save(diretorio / 'itens.npy', tabela_itens)
+            np.save(diretorio / 'posicoes_itens.npy', posicoes.astype(np.int32))
+
+        for nome, nans in (('usuário', nans_usuarios), ('item', nans_itens), ('rótulo', nans_rotulos)):
+            if nans:
+                logging.warning(f"{nans} linhas com NaN nas features de {nome}; substituídos por 0.")
+        if diretorio is not None:
+            return cls.carregar(diretorio)
+        return cls(usuarios, tabela_itens, posicoes.astype(np.int32), rotulos)
+
+    @classmethod
+    def carregar(cls, diretorio, mmap=True):
+        """Abre os arrays gravados por ``de_dataframe(..., diretorio=...)`` (memmap somente leitura)"""
+        diretorio = Path(diretorio)
+        modo = 'r' if mmap else None
+        return cls(*(np.load(diretorio / f'{nome}.npy', mmap_mode=modo) for nome in cls.arquivos))
+
+    def lotes(self, tamanho_lote, embaralhar=False, semente=None):
+        """Itera pelos lotes; sem embaralhar, cada lote é uma fatia contígua (sem cópia)"""
+        if not embaralhar:
+            for inicio in range(0, len(self), tamanho_lote):
+                yield self[inicio:inicio + tamanho_lote]
+            return
+        ordem = np.random.default_rng(semente).permutation(len(self))
+        for inicio in range(0, len(self), tamanho_lote):
+            # Índices ordenados dentro do lote: leitura sequencial no memmap, mesmo conjunto de amostras
+            yield self[np.sort(ordem[inicio:inicio + tamanho_lote])]
+
+
+def carregador(dataset, tamanho_lote, embaralhar=False, **kwargs):
+    """``DataLoader`` que pede lotes inteiros ao dataset (``BatchSampler``) em vez de amostra por amostra"""
+    from torch.utils.data import BatchSampler, DataLoader, RandomSampler, SequentialSampler
+
+    amostrador = RandomSampler(dataset) if embaralhar else SequentialSampler(dataset)
+    return DataLoader(dataset, batch_size=None, sampler=BatchSampler(amostrador, tamanho_lote, drop_last=False),
+                      **kwargs)
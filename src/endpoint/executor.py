@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from src.endpoint.observabilidade import capturar_metricas, registro_metricas
+
+# === Configuração ===
+# SQUAD_EXECUTOR: 'thread' (padrão) ou 'processo'
+TIPO_EXECUTOR = os.getenv('SQUAD_EXECUTOR', 'thread')
+WORKERS_EXECUTOR = int(os.getenv('SQUAD_EXECUTOR_WORKERS', str(min(8, os.cpu_count() or 1))))
+# Máximo de tarefas em execução ou na fila do executor; as demais aguardam no event loop
+MAX_CONCORRENCIA = int(os.getenv('SQUAD_MAX_CONCORRENCIA', str(WORKERS_EXECUTOR * 4)))
+
+
+# No processo do pool: geração de recarga compartilhada com o processo principal e a já carregada
+_geracao_compartilhada = None
+_geracao_carregada = 0
+
+
+def _aquecer_processo(geracao):
+    """Carrega o modelo uma vez em cada processo do pool"""
+    global _geracao_compartilhada, _geracao_carregada
+    from src.endpoint.modelo import obter_estado
+
+    _geracao_compartilhada = geracao
+    _geracao_carregada = geracao.value
+    obter_estado()
+
+
+def _acompanhar_recarga():
+    """Recarrega o estado deste processo do pool se o processo principal recarregou o seu"""
+    global _geracao_carregada
+    geracao = _geracao_compartilhada.value
+    if geracao == _geracao_carregada:
+        return
+    from src.endpoint.modelo import recarregar_estado
+
+    try:
+        recarregar_estado()
+    except Exception:
+        # Mantém o estado anterior; o erro fica em status_recarga() e não se repete a cada tarefa
+        logging.exception(f"Processo {os.getpid()} do pool não recarregou o modelo.")
+    _geracao_carregada = geracao
+
+
+def _executar_em_processo(func, *args):
+    """Executa a tarefa no processo filho, devolvendo HTTPException como valor serializável.
+
+    Retorna também as métricas medidas na tarefa (etapas, contadores), que o processo
+    principal aplica ao seu registro: só ele exporta ``/metrics``.
+    """
+    from src.endpoint import recomendador
+
+    _acompanhar_recarga()
+    with capturar_metricas() as metricas:
+        try:
+            resultado = func(*args)
+        except HTTPException as e:
+            return _ErroHTTP(e.status_code, e.detail), metricas
+    # Outros processos do pool dependem do disco para enxergar esta recomendação, e os
+    # processos do pool terminam sem executar os handlers de atexit dos escritores
+    recomendador.registro_recomendacoes.flush()
+    recomendador.registro_avaliacoes.flush()
+    return resultado, metricas
+
+
+class _ErroHTTP:
+    def __init__(self, status_code, detail):
+        self.status_code = status_code
+        self.detail = detail
+
+
+class ExecutorRecomendacao:
+    """Executor dimensionado para o trabalho de recomendação e avaliação (CPU e disco).
+
+    Mantém o event loop livre: as rotas aguardam o resultado com ``await executar(...)``
+    e no máximo ``max_concorrencia`` tarefas são submetidas ao pool ao mesmo tempo.
+
+    Com processos, cada recarga do modelo no processo principal (``/admin/recarregar`` ou
+    monitor) incrementa uma geração compartilhada; cada processo do pool recarrega o seu
+    estado antes da primeira tarefa que executar depois disso.
+    """
+
+    def __init__(self, tipo=TIPO_EXECUTOR, workers=WORKERS_EXECUTOR, max_concorrencia=MAX_CONCORRENCIA):
+        if tipo not in ('thread', 'processo'):
+            raise ValueError(f"Tipo de executor inválido: {tipo}. Use 'thread' ou 'processo'.")
+        self.tipo = tipo
+        self.workers = workers
+        self.max_concorrencia = max_concorrencia
+        self._pool = None
+        self._semaforo = None
+        self._geracao = None
+        self._pid = None
+
+    def iniciar(self):
+        if self._pool is not None:
+            return
+        if self.tipo == 'processo':
+            from src.endpoint.modelo import ao_recarregar
+
+            if self._geracao is None:
+                self._geracao = multiprocessing.Value('L', 0)
+                self._pid = os.getpid()
+                ao_recarregar(self._propagar_recarga)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_aquecer_processo,
+                                             initargs=(self._geracao,))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='recomendacao')
+        self._semaforo = asyncio.Semaphore(self.max_concorrencia)
+
+    def _propagar_recarga(self, estado):
+        # Processos do pool criados por fork herdam este callback; só o processo principal propaga
+        if os.getpid() != self._pid:
+            return
+        with self._geracao.get_lock():
+            self._geracao.value += 1
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def executar(self, func, *args):
+        self.iniciar()
+        loop = asyncio.get_running_loop()
+        async with self._semaforo:
+            if self.tipo == 'processo':
+                resultado, metricas = await loop.run_in_executor(self._pool, _executar_em_processo, func, *args)
+                registro_metricas.reproduzir(metricas)
+                if isinstance(resultado, _ErroHTTP):
+                    raise HTTPException(status_code=resultado.status_code, detail=resultado.detail)
+                return resultado
+            return await loop.run_in_executor(self._pool, func, *args)
+
+
+executor_recomendacao = ExecutorRecomendacao()
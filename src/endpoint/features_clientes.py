@@ -0,0 +1,262 @@
+"""Features por cliente derivadas de programatreino.csv e avaliacaofisica.csv.
+
+Os CSVs são lidos em blocos (memória limitada ao bloco mais o estado por cliente).
+Cada bloco é reduzido a estatísticas somáveis por (``_chave``, ``cliente_codigo``),
+então uma nova exportação só precisa processar as linhas com (``_chave``, ``codigo``)
+ainda não vistos (o ``codigo`` só é único dentro de cada base); as features são
+recalculadas a partir das somas acumuladas.
+
+Programas de treino (por cliente):
+- ``media_treinos_semanais``: treinos realizados / semanas previstas dos programas
+- ``tendencia_num_treinos``: inclinação (mínimos quadrados) dos treinos semanais de cada
+  programa em função da data de início, em treinos/semana por semana
+- ``duracao_media_treinos``: duração média prevista dos programas, em dias
+
+Avaliação física: ``peso``, ``altura``, ``imc`` (``Utils.calcular_imc``) e
+``percentualgordura`` da avaliação mais recente.
+
+    python -m src.endpoint.features_clientes atualizar
+    python -m src.endpoint.features_clientes reconstruir
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from Utils import calcular_imc
+from src.endpoint.colunar import colunar_dir, dataframes_dir, ler_csv
+
+features_path = Path(os.getenv('SQUAD_FEATURES_CLIENTES', colunar_dir / 'features_clientes.parquet'))
+TAMANHO_BLOCO = int(os.getenv('SQUAD_ETL_TAMANHO_BLOCO', '50000'))
+
+chaves = ['_chave', 'cliente_codigo']
+chaves_linha = ['_chave', 'codigo']
+colunas_programa = chaves + ['codigo', 'datainicio', 'dataterminoprevisto', 'nrtreinosrealizados']
+colunas_avaliacao = chaves + ['codigo', 'dataavaliacao', 'peso', 'altura', 'imc', 'percentualgordura']
+
+# Estatísticas somáveis dos programas (x = início do programa em semanas, y = treinos por semana)
+somas_programa = ['n_programas', 'soma_dias', 'n_com_treinos', 'soma_treinos', 'soma_semanas',
+                  'soma_x', 'soma_y', 'soma_xy', 'soma_xx']
+metricas_avaliacao = ['peso', 'altura', 'imc', 'percentualgordura']
+
+EPOCA = pd.Timestamp('2000-01-01')
+
+
+# === Redução de cada bloco ===
+
+def _datas(serie):
+    return pd.to_datetime(serie, format='ISO8601', errors='coerce')
+
+
+def reduzir_programas(bloco):
+    """Somas por cliente de um bloco de programatreino"""
+    inicio = _datas(bloco['datainicio'])
+    dias = (_datas(bloco['dataterminoprevisto']) - inicio).dt.total_seconds() / 86400
+    dias = dias.where(dias > 0)
+    semanas = dias / 7
+    treinos = bloco['nrtreinosrealizados'].where(semanas.notna())
+    com_treinos = treinos.notna()
+
+    x = ((inicio - EPOCA).dt.total_seconds() / (7 * 86400)).where(com_treinos)
+    y = (treinos / semanas).where(com_treinos)
+    parcial = pd.DataFrame({
+        '_chave': bloco['_chave'].astype(str),
+        'cliente_codigo': bloco['cliente_codigo'].astype('Int64'),
+        'n_programas': 1,
+        'soma_dias': dias.fillna(0),
+        'n_com_treinos': com_treinos.astype(int),
+        'soma_treinos': treinos.fillna(0),
+        'soma_semanas': semanas.where(com_treinos).fillna(0),
+        'soma_x': x.fillna(0),
+        'soma_y': y.fillna(0),
+        'soma_xy': (x * y).fillna(0),
+        'soma_xx': (x * x).fillna(0),
+    })
+    return parcial.dropna(subset=['cliente_codigo']).groupby(chaves, sort=False).sum()
+
+
+def normalizar_altura(altura):
+    """Altura em metros: valores em centímetros são convertidos e valores inválidos viram NaN"""
+    altura = altura.where(altura < 3, altura / 100)
+    return altura.where((altura > 0.5) & (altura < 2.5))
+
+
+def reduzir_avaliacoes(bloco):
+    """Avaliação mais recente de cada cliente em um bloco de avaliacaofisica"""
+    avaliacoes = pd.DataFrame({
+        '_chave': bloco['_chave'].astype(str),
+        'cliente_codigo': bloco['cliente_codigo'].astype('Int64'),
+        'dataavaliacao': _datas(bloco['dataavaliacao']),
+        'codigo': bloco['codigo'].astype('int64'),
+        'peso': bloco['peso'].where(bloco['peso'] > 0),
+        'altura': normalizar_altura(bloco['altura']),
+        'percentualgordura': bloco['percentualgordura'].where(bloco['percentualgordura'] > 0),
+    })
+    avaliacoes['imc'] = calcular_imc(avaliacoes['peso'], avaliacoes['altura'])
+    return mais_recentes(avaliacoes.dropna(subset=['cliente_codigo']))
+
+
+def mais_recentes(avaliacoes):
+    ordenadas = avaliacoes.sort_values(['dataavaliacao', 'codigo'], na_position='first', kind='stable')
+    return ordenadas.drop_duplicates(chaves, keep='last').set_index(chaves)
+
+
+# === Estado incremental ===
+
+class EstadoETL:
+    """Somas dos programas, última avaliação e linhas já processadas, persistidos junto às features"""
+
+    def __init__(self, diretorio):
+        self.diretorio = Path(diretorio)
+        self.programas = pd.DataFrame(columns=somas_programa,
+                                      index=pd.MultiIndex.from_arrays([[], []], names=chaves))
+        self.avaliacoes = None
+        self.processados = {nome: _linhas([], []) for nome in ('programatreino', 'avaliacaofisica')}
+
+    @classmethod
+    def carregar(cls, diretorio):
+        estado = cls(diretorio)
+        if not (estado.diretorio / 'processados.parquet').exists():
+            # Sem estado (ou estado antigo, só com ``codigo``): processa tudo de novo
+            return estado
+        if (estado.diretorio / 'programas.parquet').exists():
+            estado.programas = pd.read_parquet(estado.diretorio / 'programas.parquet')
+        if (estado.diretorio / 'avaliacoes.parquet').exists():
+            estado.avaliacoes = pd.read_parquet(estado.diretorio / 'avaliacoes.parquet')
+        processados = pd.read_parquet(estado.diretorio / 'processados.parquet')
+        for nome, linhas in processados.groupby('exportacao', sort=False):
+            estado.processados[nome] = _linhas(linhas['_chave'], linhas['codigo'])
+        return estado
+
+    def salvar(self):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.programas.to_parquet(self.diretorio / 'programas.parquet')
+        if self.avaliacoes is not None:
+            self.avaliacoes.to_parquet(self.diretorio / 'avaliacoes.parquet')
+        processados = pd.concat([linhas.to_frame(index=False).assign(exportacao=nome)
+                                 for nome, linhas in self.processados.items()], ignore_index=True)
+        processados.to_parquet(self.diretorio / 'processados.parquet', index=False)
+
+    def novos(self, nome, linhas):
+        """Máscara das linhas cujo (``_chave``, ``codigo``) ainda não foi processado"""
+        return ~linhas.isin(self.processados[nome])
+
+    def marcar(self, nome, linhas):
+        self.processados[nome] = self.processados[nome].union(linhas)
+
+    def acumular_programas(self, somas):
+        self.programas = self.programas.add(somas, fill_value=0)
+
+    def acumular_avaliacoes(self, recentes):
+        if self.avaliacoes is None or self.avaliacoes.empty:
+            self.avaliacoes = recentes
+        else:
+            self.avaliacoes = mais_recentes(pd.concat([self.avaliacoes, recentes]).reset_index())
+
+
+def _linhas(chave, codigo):
+    """Índice (``_chave``, ``codigo``) que identifica uma linha das exportações"""
+    return pd.MultiIndex.from_arrays([pd.Index(chave, dtype=object).astype(str),
+                                      pd.Index(codigo, dtype=np.int64)], names=chaves_linha)
+
+
+def _processar(estado, nome, colunas, reduzir, acumular, origem, tamanho_bloco):
+    lidas = 0
+    for bloco in ler_csv(nome, origem, usecols=colunas, chunksize=tamanho_bloco):
+        bloco = bloco.dropna(subset=['codigo'])
+        linhas = _linhas(bloco['_chave'], bloco['codigo'])
+        novos = estado.novos(nome, linhas)
+        if not novos.any():
+            continue
+        bloco = bloco[novos]
+        acumular(reduzir(bloco))
+        estado.marcar(nome, linhas[novos])
+        lidas += int(novos.sum())
+    return lidas
+
+
+# === Features ===
+
+def calcular_features(programas, avaliacoes):
+    """Tabela final por (``_chave``, ``cliente_codigo``) a partir das somas acumuladas"""
+    p = programas.astype(float)
+    n = p['n_com_treinos']
+    variancia_x = n * p['soma_xx'] - p['soma_x'] ** 2
+    features = pd.DataFrame({
+        'n_programas': p['n_programas'].astype('int64'),
+        'media_treinos_semanais': (p['soma_treinos'] / p['soma_semanas']).where(p['soma_semanas'] > 0),
+        'tendencia_num_treinos': ((n * p['soma_xy'] - p['soma_x'] * p['soma_y']) / variancia_x)
+        .where((n >= 2) & (variancia_x > 1e-9)),
+        'duracao_media_treinos': (p['soma_dias'] / p['n_programas']).where(p['soma_dias'] > 0),
+    }, index=programas.index)
+    if avaliacoes is not None and not avaliacoes.empty:
+        ultimas = avaliacoes[['dataavaliacao'] + metricas_avaliacao].rename(
+            columns={'dataavaliacao': 'data_ultima_avaliacao'})
+        features = features.join(ultimas, how='outer')
+    features = features.reset_index()
+    features['n_programas'] = features['n_programas'].astype('Int64')
+    features['_chave'] = features['_chave'].astype('category')
+    return features.sort_values(chaves, kind='stable').reset_index(drop=True)
+
+
+def atualizar(origem=dataframes_dir, destino=features_path, tamanho_bloco=TAMANHO_BLOCO, reconstruir=False):
+    """Processa as linhas novas das exportações e regrava a tabela de features; retorna linhas lidas"""
+    destino = Path(destino)
+    diretorio_estado = destino.with_suffix('.estado')
+    estado = EstadoETL(diretorio_estado) if reconstruir else EstadoETL.carregar(diretorio_estado)
+
+    lidas = {
+        'programatreino': _processar(estado, 'programatreino', colunas_programa, reduzir_programas,
+                                     estado.acumular_programas, origem, tamanho_bloco),
+        'avaliacaofisica': _processar(estado, 'avaliacaofisica', colunas_avaliacao, reduzir_avaliacoes,
+                                      estado.acumular_avaliacoes, origem, tamanho_bloco),
+    }
+    if any(lidas.values()) or not destino.exists():
+        features = calcular_features(estado.programas, estado.avaliacoes)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = destino.with_suffix('.parquet.tmp')
+        features.to_parquet(temporario, index=False, compression='zstd')
+        os.replace(temporario, destino)
+        estado.salvar()
+    return lidas
+
+
+def carregar_features(colunas=None, clientes=None, caminho=features_path):
+    filtros = [('cliente_codigo', 'in', [int(c) for c in clientes])] if clientes is not None else None
+    return pd.read_parquet(caminho, columns=colunas, filters=filtros)
+
+
+def juntar_features(dados, coluna_cliente='client_id', coluna_chave='_chave', colunas=None, caminho=features_path):
+    """Junta (left join) as features de cliente a um DataFrame com a base e o código do cliente.
+
+    O ``cliente_codigo`` só é único dentro de cada ``_chave``, então as duas colunas são obrigatórias.
+    """
+    if coluna_chave not in dados or coluna_cliente not in dados:
+        raise ValueError(f"juntar_features precisa das colunas '{coluna_chave}' e '{coluna_cliente}'")
+    features = carregar_features(colunas and chaves + list(colunas), caminho=caminho)
+    features = features.rename(columns={'_chave': coluna_chave, 'cliente_codigo': coluna_cliente})
+    features[coluna_chave] = features[coluna_chave].astype(str)
+    dados = dados.assign(**{coluna_chave: dados[coluna_chave].astype(str)})
+    return dados.merge(features, how='left', on=[coluna_chave, coluna_cliente])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ETL incremental das features por cliente")
+    parser.add_argument('comando', choices=['atualizar', 'reconstruir'])
+    parser.add_argument('--origem', default=str(dataframes_dir))
+    parser.add_argument('--destino', default=str(features_path))
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    lidas = atualizar(args.origem, args.destino, args.tamanho_bloco, reconstruir=args.comando == 'reconstruir')
+    for nome, linhas in lidas.items():
+        print(f"{nome}: {linhas} linhas novas")
+    print(f"Features gravadas em {args.destino} ({time.perf_counter() - inicio:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+"""Filtragem colaborativa: ALS implícito sobre a matriz esparsa (CSR) usuário x desafio.
+
+Linhas da matriz:
+
+- usuários do dataset: ``completed_challenges``, com peso ``mean_rating / 5``;
+- usuários da API: desafios de cada avaliação em ``avaliacoes.csv``, com peso
+  ``(rating / 5 + success / 10) / 2``, somados por usuário e desafio.
+
+O treino (Hu, Koren e Volinsky) alterna a solução exata dos fatores de usuários e de
+desafios, com confiança ``1 + alfa * peso``. Cada passo monta os sistemas f x f de todas
+as linhas com um produto esparso x denso e os resolve em lote (``np.linalg.solve``),
+em blocos de linhas distribuídos entre threads.
+
+Na API só os fatores dos desafios são usados: o vetor de cada usuário é obtido por
+fold-in (o mesmo passo do treino, com os desafios fixos) a partir das interações dele,
+atualizadas a cada ``/avaliar`` sem retreinar. O modelo é treinado offline (também por
+``python -m src.endpoint.modelo preparar``, se o arquivo não existir); sem ele, o motor
+responde 503:
+
+    python -m src.endpoint.filtragem_colaborativa treinar
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.endpoint.historico_usuarios import ler_avaliacoes
+from src.endpoint.indice_desafios import parse_lista_desafios
+from src.endpoint.indice_vizinhos import top_k_indices
+from src.endpoint.modelo import ao_recarregar, base_dir, challenges_path, dados_path
+
+als_path = Path(os.getenv('SQUAD_ALS_PATH', base_dir / 'src' / 'dataframe' / 'als.npz'))
+
+# Hiperparâmetros do ALS
+FATORES = int(os.getenv('SQUAD_ALS_FATORES', '8'))
+ITERACOES = int(os.getenv('SQUAD_ALS_ITERACOES', '15'))
+REGULARIZACAO = float(os.getenv('SQUAD_ALS_REGULARIZACAO', '0.1'))
+ALFA = float(os.getenv('SQUAD_ALS_ALFA', '10'))
+THREADS = int(os.getenv('SQUAD_ALS_THREADS', str(min(8, os.cpu_count() or 1))))
+
+# Linhas resolvidas por bloco (limita a matriz intermediária linhas x f x f)
+LINHAS_POR_BLOCO = 4096
+
+# Memória máxima dos produtos externos pré-calculados (fixos x f x f em float64). Acima disso
+# (ex.: usuários fixos no passo dos desafios), cada A_u é montado a partir de Y[idx]
+LIMITE_BYTES_EXTERNOS = 64 * 1024 * 1024
+
+
+# === Matriz de interações ===
+
+def peso_avaliacao(rating, success):
+    return (np.asarray(rating, dtype=np.float64) / 5 + np.asarray(success, dtype=np.float64) / 10) / 2
+
+
+def montar_matriz(dados, avaliacoes, item_ids):
+    """CSR (usuários do dataset + usuários das avaliações) x desafios; retorna (matriz, ids das avaliações)"""
+    posicao = {int(challenge_id): j for j, challenge_id in enumerate(item_ids)}
+    linhas, colunas, valores = [], [], []
+
+    def adicionar(linha, desafios, peso):
+        for challenge_id in parse_lista_desafios(desafios):
+            j = posicao.get(challenge_id)
+            if j is not None:
+                linhas.append(linha)
+                colunas.append(j)
+                valores.append(peso)
+
+    pesos = pd.to_numeric(dados['mean_rating'], errors='coerce').fillna(2.5).to_numpy() / 5
+    for linha, (desafios, peso) in enumerate(zip(dados['completed_challenges'], pesos)):
+        adicionar(linha, desafios, peso)
+
+    avaliacoes = avaliacoes[avaliacoes['id'].astype(str).str.fullmatch(r'[0-9a-f]{64}')]
+    pesos = peso_avaliacao(pd.to_numeric(avaliacoes['rating'], errors='coerce'),
+                           pd.to_numeric(avaliacoes['success'], errors='coerce'))
+    usuarios, ids_avaliacoes = pd.factorize(avaliacoes['id'].astype(str))
+    for usuario, desafios, peso in zip(usuarios, avaliacoes['Recomendacao_Desafios'], pesos):
+        if np.isfinite(peso):
+            adicionar(len(dados) + usuario, desafios, max(peso, 0.0))
+
+    matriz = sparse.csr_matrix(
+        (np.asarray(valores, dtype=np.float32), (linhas, colunas)),
+        shape=(len(dados) + len(ids_avaliacoes), len(item_ids)),
+    )
+    matriz.sum_duplicates()
+    return matriz, list(ids_avaliacoes)
+
+
+def matriz_interacoes(interacoes, item_ids):
+    """CSR de uma lista de dicts desafio -> peso (ids fora do catálogo são ignorados)"""
+    posicao = {int(challenge_id): j for j, challenge_id in enumerate(item_ids)}
+    indptr, colunas, valores = [0], [], []
+    for interacao in interacoes:
+        for challenge_id, peso in interacao.items():
+            j = posicao.get(int(challenge_id))
+            if j is not None:
+                colunas.append(j)
+                valores.append(peso)
+        indptr.append(len(colunas))
+    return sparse.csr_matrix(
+        (np.asarray(valores, dtype=np.float32), np.asarray(colunas, dtype=np.int32), np.asarray(indptr)),
+        shape=(len(interacoes), len(item_ids)),
+    )
+
+
+# === ALS ===
+
+def preparar_fixos(fixos):
+    """(fatores, YᵀY, produtos externos y_i y_iᵀ achatados ou ``None``): o que ``resolver`` usa dos fatores fixos"""
+    fixos = np.ascontiguousarray(fixos, dtype=np.float64)
+    externos = None
+    if fixos.size * fixos.shape[1] * 8 <= LIMITE_BYTES_EXTERNOS:
+        externos = (fixos[:, :, None] * fixos[:, None, :]).reshape(len(fixos), -1)
+    return fixos, fixos.T @ fixos, externos
+
+
+def _resolver_bloco(bloco, preparados, regularizacao, alfa):
+    fixos, fixos_t_fixos, externos = preparados
+    n, f = bloco.shape[0], fixos.shape[1]
+    # A_u = YᵀY + λI + Σ_i α r_ui y_i y_iᵀ
+    if externos is not None:
+        # Soma dos produtos externos via produto esparso x denso
+        a = ((bloco * alfa) @ externos).reshape(n, f, f)
+    else:
+        # Y_idxᵀ diag(α r_u) Y_idx por linha: memória proporcional às interações da linha
+        a = np.empty((n, f, f))
+        for u in range(n):
+            inicio, fim = bloco.indptr[u], bloco.indptr[u + 1]
+            y = fixos[bloco.indices[inicio:fim]]
+            a[u] = (y * (alfa * bloco.data[inicio:fim])[:, None]).T @ y
+    a += fixos_t_fixos + regularizacao * np.eye(f)
+    # b_u = Σ_i (1 + α r_ui) y_i  (preferência 1 nos desafios com interação)
+    confianca = bloco.copy()
+    confianca.data = 1 + alfa * confianca.data
+    b = confianca @ fixos
+    return np.linalg.solve(a, b[..., None])[..., 0]
+
+
+def resolver(matriz, fixos, regularizacao=REGULARIZACAO, alfa=ALFA, threads=THREADS):
+    """Fatores ótimos das linhas de ``matriz`` com os fatores das colunas (``fixos``, ou ``preparar_fixos``) fixos"""
+    preparados = fixos if isinstance(fixos, tuple) else preparar_fixos(fixos)
+    if matriz.shape[0] <= LINHAS_POR_BLOCO:
+        return _resolver_bloco(matriz, preparados, regularizacao, alfa)
+    blocos = [matriz[inicio:inicio + LINHAS_POR_BLOCO] for inicio in range(0, matriz.shape[0], LINHAS_POR_BLOCO)]
+
+    def resolver_bloco(bloco):
+        return _resolver_bloco(bloco, preparados, regularizacao, alfa)
+
+    if threads > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            return np.vstack(list(executor.map(resolver_bloco, blocos)))
+    return np.vstack([resolver_bloco(bloco) for bloco in blocos])
+
+
+def treinar_als(matriz, fatores=FATORES, iteracoes=ITERACOES, regularizacao=REGULARIZACAO, alfa=ALFA,
+                threads=THREADS, semente=0):
+    """(fatores dos usuários, fatores dos desafios)"""
+    rng = np.random.default_rng(semente)
+    matriz = sparse.csr_matrix(matriz, dtype=np.float64)
+    transposta = matriz.T.tocsr()
+    itens = rng.normal(0, 0.01, (matriz.shape[1], fatores))
+    usuarios = np.zeros((matriz.shape[0], fatores))
+    for _ in range(iteracoes):
+        usuarios = resolver(matriz, itens, regularizacao, alfa, threads)
+        itens = resolver(transposta, usuarios, regularizacao, alfa, threads)
+    return usuarios, itens
+
+
+# === Motor ===
+
+class MotorColaborativo:
+    """Fatores dos desafios treinados; usuários por fold-in das suas interações"""
+
+    def __init__(self, item_ids, fatores_itens, popularidade, metadados):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.fatores_itens = np.ascontiguousarray(fatores_itens, dtype=np.float64)
+        self._preparados = preparar_fixos(self.fatores_itens)
+        self.popularidade = np.asarray(popularidade, dtype=np.float64)
+        self.metadados = metadados
+        self.regularizacao = metadados['regularizacao']
+        self.alfa = metadados['alfa']
+
+    @classmethod
+    def treinar(cls, dados, avaliacoes, item_ids, fatores=FATORES, iteracoes=ITERACOES,
+                regularizacao=REGULARIZACAO, alfa=ALFA, threads=THREADS):
+        matriz, ids_avaliacoes = montar_matriz(dados, avaliacoes, item_ids)
+        _, fatores_itens = treinar_als(matriz, fatores, iteracoes, regularizacao, alfa, threads)
+        metadados = {
+            'modelo': 'als',
+            'treinado_em': datetime.datetime.now().isoformat(),
+            'usuarios': matriz.shape[0], 'usuarios_avaliacoes': len(ids_avaliacoes), 'interacoes': matriz.nnz,
+            'fatores': fatores, 'iteracoes': iteracoes, 'regularizacao': regularizacao, 'alfa': alfa,
+        }
+        popularidade = np.asarray(matriz.sum(axis=0)).ravel()
+        return cls(item_ids, fatores_itens, popularidade, metadados)
+
+    @classmethod
+    def carregar(cls, caminho=als_path):
+        with np.load(caminho) as arquivo:
+            return cls(arquivo['item_ids'], arquivo['fatores_itens'], arquivo['popularidade'],
+                       json.loads(str(arquivo['metadados'])))
+
+    def salvar(self, caminho=als_path):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with open(temporario, 'wb') as f:
+            np.savez(f, item_ids=self.item_ids, fatores_itens=self.fatores_itens, popularidade=self.popularidade,
+                     metadados=np.array(json.dumps(self.metadados)))
+        os.replace(temporario, caminho)
+        return caminho
+
+    def fatores_usuarios(self, interacoes):
+        """Fold-in: fatores de cada usuário (dict desafio -> peso) com os desafios fixos"""
+        matriz = matriz_interacoes(interacoes, self.item_ids)
+        return resolver(matriz, self._preparados, self.regularizacao, self.alfa, threads=1), matriz
+
+    def recomendar(self, interacoes, n, vistos=None):
+        """Top ``n`` desafios de cada usuário, sem os que ele já tem (``vistos``: ids por usuário; padrão:
+        os desafios de ``interacoes``); sem interações, os desafios mais populares"""
+        fatores, matriz = self.fatores_usuarios(interacoes)
+        scores = fatores @ self.fatores_itens.T
+        sem_interacoes = np.diff(matriz.indptr) == 0
+        scores[sem_interacoes] = self.popularidade
+        if vistos is not None:
+            matriz = matriz_interacoes([dict.fromkeys(ids, 1.0) for ids in vistos], self.item_ids)
+        scores[np.repeat(np.arange(matriz.shape[0]), np.diff(matriz.indptr)), matriz.indices] = -np.inf
+        top = top_k_indices(scores, n)
+        validos = np.isfinite(np.take_along_axis(scores, top, axis=1))
+        return [self.item_ids[linha[valido]].tolist() for linha, valido in zip(top, validos)]
+
+
+# === Interações dos usuários da API ===
+
+class InteracoesUsuarios:
+    """Desafio -> peso somado das avaliações de cada usuário (id = sha256 em hex).
+
+    Consumidor de ``AcompanhamentoRegistros``: ``aplicar`` soma as avaliações na ordem de
+    ``avaliacoes.csv``, gravadas por qualquer processo, então todos os workers veem as mesmas.
+    """
+
+    def __init__(self, acompanhamento=None):
+        self.acompanhamento = acompanhamento
+        self.avaliacoes_incluidas = 0
+        self._lock = threading.Lock()
+        self._usuarios = {}
+        if acompanhamento is not None:
+            acompanhamento.consumidor(self.aplicar)
+
+    def _garantir_carregado(self):
+        if self.acompanhamento is not None:
+            self.acompanhamento.iniciar()
+
+    def aplicar(self, registros, inicio=0):
+        """Soma as avaliações ``registros`` (posições ``inicio``... do log) ainda não incluídas;
+        ``inicio=None``: avaliações deste processo ainda fora do log (ver ``AcompanhamentoRegistros``)"""
+        if inicio is None:
+            novos = registros
+        else:
+            novos = [r for r in registros[max(self.avaliacoes_incluidas - inicio, 0):] if r is not None]
+        if novos:
+            avaliacoes = pd.DataFrame(novos, columns=['id', 'Recomendacao_Desafios', 'rating', 'success'])
+            pesos = peso_avaliacao(pd.to_numeric(avaliacoes['rating'], errors='coerce'),
+                                   pd.to_numeric(avaliacoes['success'], errors='coerce'))
+        with self._lock:
+            if novos:
+                for id_hash, desafios, peso in zip(avaliacoes['id'].astype(str), avaliacoes['Recomendacao_Desafios'], pesos):
+                    if np.isfinite(peso):
+                        self._somar(id_hash, desafios, max(peso, 0.0))
+            if inicio is not None:
+                self.avaliacoes_incluidas = max(self.avaliacoes_incluidas, inicio + len(registros))
+
+    def _somar(self, id_hash, desafios, peso):
+        interacoes = self._usuarios.setdefault(id_hash, {})
+        for challenge_id in parse_lista_desafios(desafios):
+            interacoes[challenge_id] = interacoes.get(challenge_id, 0.0) + peso
+
+    def obter(self, id_hash):
+        self._garantir_carregado()
+        with self._lock:
+            return dict(self._usuarios.get(id_hash, {}))
+
+    def __len__(self):
+        self._garantir_carregado()
+        return len(self._usuarios)
+
+
+def _ler_ids_catalogo(caminho=challenges_path):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return sorted(challenge['challenge_id'] for challenge in json.load(f))
+
+
+def treinar_de_arquivos(caminhos_avaliacoes, campos_avaliacao=None, **kwargs):
+    """Treina a partir do dataset, do catálogo e dos CSVs de avaliação"""
+    dados = pd.read_csv(dados_path)
+    avaliacoes = ler_avaliacoes(caminhos_avaliacoes, campos_avaliacao)
+    for coluna in ('Recomendacao_Desafios', 'rating', 'success'):
+        if coluna not in avaliacoes:
+            avaliacoes[coluna] = pd.Series(dtype=object)
+    return MotorColaborativo.treinar(dados, avaliacoes, _ler_ids_catalogo(), **kwargs)
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def obter_motor_colaborativo():
+    """Carrega o modelo treinado no primeiro uso; ``FileNotFoundError`` se ele não foi treinado"""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = MotorColaborativo.carregar(als_path)
+    return _motor
+
+
+def descartar_motor_colaborativo(*_):
+    global _motor
+    with _lock_motor:
+        _motor = None
+
+
+ao_recarregar(descartar_motor_colaborativo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Treino do modelo de filtragem colaborativa (ALS implícito)")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    treinar = sub.add_parser('treinar', help="treina e grava o modelo")
+    treinar.add_argument('--saida', default=str(als_path))
+    treinar.add_argument('--fatores', type=int, default=FATORES)
+    treinar.add_argument('--iteracoes', type=int, default=ITERACOES)
+    treinar.add_argument('--regularizacao', type=float, default=REGULARIZACAO)
+    treinar.add_argument('--alfa', type=float, default=ALFA)
+    args = parser.parse_args(argv)
+
+    from src.endpoint.recomendador import registro_avaliacoes
+    motor = treinar_de_arquivos(
+        registro_avaliacoes.segmentos(), registro_avaliacoes.campos, fatores=args.fatores,
+        iteracoes=args.iteracoes, regularizacao=args.regularizacao, alfa=args.alfa,
+    )
+    caminho = motor.salvar(args.saida)
+    m = motor.metadados
+    print(f"Modelo ALS gravado em {caminho}: {m['usuarios']} usuários ({m['usuarios_avaliacoes']} das avaliações), "
+          f"{m['interacoes']} interações, {len(motor.item_ids)} desafios")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Features de histórico do usuário (``user_avg_streak``, ``user_avg_progress``, ``user_success_rate``).
+
+São as médias das avaliações anteriores do usuário, com os mesmos valores padrão dos
+notebooks (``add_feedback_data``) antes da primeira avaliação. Dois caminhos com o
+mesmo resultado:
+
+- ``HistoricoUsuarios``: somas e contagens por id de usuário, atualizadas a cada avaliação
+  gravada em ``avaliacoes.csv`` (por qualquer worker) e gravadas periodicamente em um
+  ``.npz`` compacto junto com o número de avaliações incluídas;
+- ``adicionar_historico``: cálculo vetorizado (somas acumuladas por grupo) para o treino.
+"""
+import atexit
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Feature -> coluna da avaliação usada na média
+colunas_historico = {
+    'user_avg_streak': 'streak',
+    'user_avg_progress': 'progress_pct',
+    'user_success_rate': 'success',
+}
+features_historico = list(colunas_historico)
+
+# Valores antes da primeira avaliação (os mesmos fillna dos notebooks)
+padroes_historico = {'user_avg_streak': 0.0, 'user_avg_progress': 50.0, 'user_success_rate': 0.5}
+
+
+def adicionar_historico(df, chave='user_id', data='date'):
+    """Equivalente vetorizado de ``groupby(chave)[col].transform(lambda x: x.expanding().mean().shift(1))``"""
+    df = df.sort_values([chave, data])
+    for feature, coluna in colunas_historico.items():
+        valores = df[coluna].astype(float)
+        presentes = valores.notna().astype(np.int64)
+        # Soma e contagem acumuladas até a avaliação anterior (exclui a linha atual)
+        soma = valores.fillna(0).groupby(df[chave], sort=False).cumsum() - valores.fillna(0)
+        contagem = presentes.groupby(df[chave], sort=False).cumsum() - presentes
+        df[feature] = (soma / contagem.where(contagem > 0)).fillna(padroes_historico[feature])
+    return df
+
+
+def _features(somas, contagens):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = somas / contagens
+    return {
+        feature: float(medias[i]) if contagens[i] else padroes_historico[feature]
+        for i, feature in enumerate(features_historico)
+    }
+
+
+class HistoricoUsuarios:
+    """Somas e contagens das avaliações por usuário (id = sha256 em hex).
+
+    É um consumidor de ``AcompanhamentoRegistros``: ``aplicar`` soma as avaliações na ordem
+    do log, então o histórico corresponde sempre às primeiras ``avaliacoes_incluidas``
+    avaliações, em qualquer processo. O arquivo guarda o id como 32 bytes, as somas em
+    float64, as contagens em int32 e ``avaliacoes_incluidas``; na carga, somam-se apenas as
+    avaliações posteriores. Vários processos podem gravar o mesmo arquivo: cada um grava um
+    prefixo consistente do log.
+    """
+
+    def __init__(self, caminho=None, acompanhamento=None, intervalo_salvamento=60.0, capacidade=1024):
+        self.caminho = Path(caminho) if caminho else None
+        self.acompanhamento = acompanhamento
+        self.intervalo_salvamento = intervalo_salvamento
+        self.avaliacoes_incluidas = 0
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+        self._linhas = {}
+        self._ids = np.zeros(capacidade, dtype='S32')
+        self._somas = np.zeros((capacidade, len(features_historico)), dtype=np.float64)
+        self._contagens = np.zeros((capacidade, len(features_historico)), dtype=np.int32)
+        self._carregado = False
+        self._alterado = False
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        self._garantir_carregado()
+        return len(self._linhas)
+
+    # === Atualização e consulta ===
+
+    def aplicar(self, registros, inicio=0):
+        """Soma as avaliações ``registros`` (posições ``inicio``... do log) ainda não incluídas.
+
+        ``inicio=None``: avaliações deste processo ainda fora do log, somadas sem avançar a posição;
+        ao serem lidas do log, chegam como ``None``.
+        """
+        self._carregar_arquivo()
+        if inicio is None:
+            return self._somar(registros)
+        pular = self.avaliacoes_incluidas - inicio
+        if inicio == 0 and pular > len(registros):
+            logging.warning("Histórico salvo inclui mais avaliações do que o log; reconstruindo a partir do log.")
+            self._definir(np.zeros(0, dtype='S32'), np.zeros((0, len(features_historico))),
+                          np.zeros((0, len(features_historico)), dtype=np.int32))
+            self.avaliacoes_incluidas = pular = 0
+        self._somar([registro for registro in registros[max(pular, 0):] if registro is not None],
+                    inicio + len(registros))
+
+    def _somar(self, registros, avaliacoes_incluidas=None):
+        if registros:
+            avaliacoes = pd.DataFrame(registros, columns=['id'] + list(colunas_historico.values()))
+            ids, somas, contagens = agregar_avaliacoes(avaliacoes)
+        with self._lock:
+            if registros and len(ids):
+                hashes = [i.tobytes().hex() for i in ids.view(np.uint8).reshape(-1, 32)]
+                linhas = [self._linhas.get(id_hash) for id_hash in hashes]
+                linhas = [self._nova_linha(id_hash) if linha is None else linha for id_hash, linha in zip(hashes, linhas)]
+                # Linhas distintas (um id por grupo): a soma indexada não perde atualizações
+                self._somas[linhas] += somas
+                self._contagens[linhas] += contagens
+                self._alterado = True
+            if avaliacoes_incluidas is not None:
+                self.avaliacoes_incluidas = max(self.avaliacoes_incluidas, avaliacoes_incluidas)
+        if registros:
+            self._iniciar()
+
+    def obter(self, id_hash):
+        self._garantir_carregado()
+        with self._lock:
+            linha = self._linhas.get(id_hash)
+            if linha is None:
+                return dict(padroes_historico)
+            return _features(self._somas[linha], self._contagens[linha])
+
+    def _nova_linha(self, id_hash):
+        linha = len(self._linhas)
+        if linha == len(self._ids):
+            capacidade = 2 * len(self._ids)
+            self._ids = np.resize(self._ids, capacidade)
+            self._somas = np.vstack([self._somas, np.zeros_like(self._somas)])
+            self._contagens = np.vstack([self._contagens, np.zeros_like(self._contagens)])
+        self._ids[linha] = bytes.fromhex(id_hash)
+        self._linhas[id_hash] = linha
+        return linha
+
+    def _definir(self, ids, somas, contagens):
+        with self._lock:
+            self._ids = np.ascontiguousarray(ids, dtype='S32')
+            self._somas = np.ascontiguousarray(somas, dtype=np.float64)
+            self._contagens = np.ascontiguousarray(contagens, dtype=np.int32)
+            # Via uint8: bytes_ do NumPy descarta os zeros finais do hash
+            self._linhas = {i.tobytes().hex(): linha for linha, i in enumerate(self._ids.view(np.uint8).reshape(-1, 32))}
+            if not len(self._ids):
+                self._ids = np.zeros(1, dtype='S32')
+                self._somas = np.zeros((1, len(features_historico)))
+                self._contagens = np.zeros((1, len(features_historico)), dtype=np.int32)
+
+    # === Persistência ===
+
+    def _garantir_carregado(self):
+        """Arquivo salvo mais as avaliações gravadas depois dele (por qualquer processo)"""
+        self._carregar_arquivo()
+        if self.acompanhamento is not None:
+            self.acompanhamento.iniciar()
+
+    def _carregar_arquivo(self):
+        if self._carregado:
+            return
+        # Quem chega durante a carga espera por ela em vez de ver o histórico vazio
+        with self._lock_carga:
+            if self._carregado:
+                return
+            if self.caminho is not None and self.caminho.exists():
+                with np.load(self.caminho) as arquivo:
+                    if 'avaliacoes_incluidas' in arquivo:
+                        self._definir(arquivo['ids'], arquivo['somas'], arquivo['contagens'])
+                        self.avaliacoes_incluidas = int(arquivo['avaliacoes_incluidas'])
+                    else:
+                        logging.info("Histórico salvo sem a posição no log de avaliações; reconstruindo a partir do log.")
+            self._carregado = True
+
+    def salvar(self):
+        if self.caminho is None:
+            return
+        if self.acompanhamento is not None and self.acompanhamento.pendentes:
+            return  # avaliações locais ainda fora do log: o arquivo não seria um prefixo dele
+        with self._lock:
+            if not self._alterado:
+                return
+            n = len(self._linhas)
+            ids, somas, contagens = self._ids[:n].copy(), self._somas[:n].copy(), self._contagens[:n].copy()
+            avaliacoes_incluidas = self.avaliacoes_incluidas
+            self._alterado = False
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.caminho.with_name(self.caminho.name + '.tmp')
+        with open(temporario, 'wb') as f:
+            np.savez(f, ids=ids, somas=somas, contagens=contagens, avaliacoes_incluidas=np.array(avaliacoes_incluidas))
+        os.replace(temporario, self.caminho)
+
+    def _iniciar(self):
+        if self._thread is not None or self.caminho is None or not self.intervalo_salvamento:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executar, name='historico-usuarios', daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo_salvamento):
+            try:
+                self.salvar()
+            except OSError as e:
+                logging.error(f"Erro ao salvar o histórico de usuários: {str(e)}")
+
+    def fechar(self):
+        self._parar.set()
+        if self._carregado:
+            self.salvar()
+
+
+def ler_avaliacoes(caminhos, campos=None):
+    """Concatena os CSVs de avaliação; linhas com outro número de colunas são ignoradas"""
+    partes = []
+    for caminho in caminhos:
+        try:
+            df = pd.read_csv(caminho, dtype={'id': str})
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            continue
+        if campos is not None and list(df.columns) != list(campos):
+            df = pd.read_csv(caminho, names=campos, skiprows=1, dtype={'id': str}, on_bad_lines='skip')
+        partes.append(df)
+    if not partes:
+        return pd.DataFrame(columns=['id'] + list(colunas_historico.values()))
+    return pd.concat(partes, ignore_index=True)
+
+
+def agregar_avaliacoes(avaliacoes, chave='id'):
+    """Somas e contagens por usuário (vetorizado); ids que não são sha256 em hex são ignorados"""
+    valido = avaliacoes[chave].astype(str).str.fullmatch(r'[0-9a-f]{64}')
+    avaliacoes = avaliacoes[valido]
+    valores = avaliacoes[list(colunas_historico.values())].apply(pd.to_numeric, errors='coerce')
+    grupos = valores.groupby(avaliacoes[chave].to_numpy(), sort=True)
+    somas = grupos.sum()
+    contagens = grupos.count()
+    ids = np.array([bytes.fromhex(i) for i in somas.index], dtype='S32')
+    return ids, somas.to_numpy(dtype=np.float64), contagens.to_numpy(dtype=np.int32)
+
+
+def criar_historico(caminho, acompanhamento):
+    """Histórico alimentado por ``acompanhamento``, salvo a cada SQUAD_HISTORICO_INTERVALO segundos e ao encerrar"""
+    historico = HistoricoUsuarios(
+        caminho, acompanhamento, intervalo_salvamento=float(os.getenv('SQUAD_HISTORICO_INTERVALO', '60')),
+    )
+    acompanhamento.consumidor(historico.aplicar)
+    atexit.register(historico.fechar)
+    return historico
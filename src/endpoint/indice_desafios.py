@@ -0,0 +1,92 @@
+import ast
+import numpy as np
+
+
+def parse_lista_desafios(valor):
+    """Converte o texto de uma lista de IDs (ex.: "[14, 15]") em lista de inteiros"""
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [int(v) for v in valor]
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return []
+    texto = str(valor).strip()
+    if not texto:
+        return []
+    if texto.startswith('[') and texto.endswith(']'):
+        conteudo = texto[1:-1].strip()
+        if not conteudo:
+            return []
+        try:
+            return [int(v) for v in conteudo.split(',')]
+        except ValueError:
+            pass
+    # Formato inesperado: recorre ao parser literal (apenas na carga, nunca por requisição)
+    try:
+        convertido = ast.literal_eval(texto)
+    except (ValueError, SyntaxError):
+        return []
+    if isinstance(convertido, (list, tuple)):
+        return [int(v) for v in convertido]
+    if isinstance(convertido, int):
+        return [convertido]
+    return []
+
+
+class IndiceDesafios:
+    """Listas de desafios por usuário em formato compacto: offsets + vetor plano de IDs.
+
+    Os desafios da linha ``i`` são ``valores[offsets[i]:offsets[i + 1]]``.
+    """
+
+    def __init__(self, offsets, valores):
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.valores = np.ascontiguousarray(valores, dtype=np.int32)
+
+    @classmethod
+    def from_series(cls, serie):
+        """Constrói o índice a partir de uma coluna de listas em texto (parse único na carga)"""
+        listas = [parse_lista_desafios(v) for v in serie]
+        tamanhos = np.fromiter((len(l) for l in listas), dtype=np.int64, count=len(listas))
+        offsets = np.zeros(len(listas) + 1, dtype=np.int64)
+        np.cumsum(tamanhos, out=offsets[1:])
+        valores = np.fromiter((v for l in listas for v in l), dtype=np.int32, count=int(offsets[-1]))
+        return cls(offsets, valores)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, linha):
+        return self.valores[self.offsets[linha]:self.offsets[linha + 1]]
+
+    def coletar(self, linhas):
+        """Concatena os desafios das linhas informadas, na ordem das linhas"""
+        if len(linhas) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([self[int(i)] for i in linhas])
+
+
+def agregar_votos(indice, linhas, pesos, posicao, n_colunas):
+    """Soma, para cada entrada, o peso de cada linha (vizinho) em todos os desafios da lista dela.
+
+    ``linhas`` e ``pesos``: (entradas, k), linhas < 0 ignoradas; ``posicao``: id do desafio ->
+    coluna (-1 fora do catálogo). Sem laço em Python: as listas das linhas são expandidas
+    em um vetor de votos e somadas com ``np.bincount``. Retorna (entradas, n_colunas) float32.
+    """
+    linhas = np.asarray(linhas, dtype=np.int64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    validas = linhas >= 0
+    entradas = np.nonzero(validas)[0]
+    linhas, pesos = linhas[validas], pesos[validas]
+
+    inicios = indice.offsets[linhas]
+    tamanhos = indice.offsets[linhas + 1] - inicios
+    # Posição de cada voto em ``valores``: início da sua linha + deslocamento dentro dela
+    fins = np.cumsum(tamanhos)
+    votos = np.arange(fins[-1] if len(fins) else 0) + np.repeat(inicios - (fins - tamanhos), tamanhos)
+    desafios = indice.valores[votos]
+    colunas = np.where(desafios < len(posicao), posicao[np.minimum(desafios, len(posicao) - 1)], -1)
+    no_catalogo = colunas >= 0
+
+    chaves = np.repeat(entradas, tamanhos)[no_catalogo] * n_colunas + colunas[no_catalogo]
+    total = np.bincount(chaves, weights=np.repeat(pesos, tamanhos)[no_catalogo],
+                        minlength=validas.shape[0] * n_colunas)
+    return total.reshape(validas.shape[0], n_colunas).astype(np.float32)
@@ -0,0 +1,291 @@
+"""Índices de vizinhos mais próximos sobre a matriz de features normalizada.
+
+- ``IndiceExato``: varredura completa (produto matriz-matriz), resultado exato.
+- ``IndiceIVF``: arquivo invertido — os usuários são agrupados por k-means esférico
+  e a busca visita apenas as ``n_probe`` listas cujos centróides são mais próximos
+  da consulta. ``n_probe`` é o ajuste entre recall e latência.
+- ``IndiceAuditado``: responde com um índice aproximado e mede, a cada busca, o
+  recall em relação à varredura exata.
+
+Uso offline:
+
+    python -m src.endpoint.indice_vizinhos construir --n-listas 1024
+    python -m src.endpoint.indice_vizinhos recall --n-probe 8 --k 10
+"""
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def normalizar_linhas(matriz):
+    """Converte para float32 contíguo e normaliza cada linha pela norma L2"""
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+    # Norma acumulada em float64: resultado estável entre processos (a assinatura depende disso)
+    normas = np.sqrt(np.square(matriz, dtype=np.float64).sum(axis=-1, keepdims=True))
+    normas[normas == 0] = 1.0  # linhas nulas permanecem nulas, como no cosine_similarity
+    return np.ascontiguousarray(matriz / normas, dtype=np.float32)
+
+
+def top_k_indices(scores, k):
+    """Índices dos k maiores scores (na última dimensão) em ordem decrescente, via seleção parcial"""
+    n = scores.shape[-1]
+    k = max(0, min(k, n))
+    if k == 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(scores, n - k, axis=-1)[..., n - k:]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape).copy()
+    ordem = np.argsort(-np.take_along_axis(scores, idx, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(idx, ordem, axis=-1)
+
+
+def assinatura_matriz(matriz):
+    """Hash do conteúdo da matriz, usado para detectar índices persistidos desatualizados"""
+    matriz = np.ascontiguousarray(matriz, dtype=np.float32)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.asarray(matriz.shape, dtype=np.int64).tobytes())
+    h.update(matriz.tobytes())
+    return h.hexdigest()
+
+
+class IndiceExato:
+    """Busca exata por varredura completa da matriz normalizada"""
+
+    tipo = 'exato'
+
+    def __init__(self, matriz, normalizar=True):
+        # Matrizes já normalizadas (ex.: mapeadas do snapshot) são usadas sem cópia
+        self.matriz = normalizar_linhas(matriz) if normalizar else matriz
+
+    def buscar(self, consultas, k):
+        """Retorna (indices, scores) dos k vizinhos de cada consulta (n_consultas x k)"""
+        consultas = np.atleast_2d(consultas)
+        scores = consultas @ self.matriz.T
+        idx = top_k_indices(scores, k)
+        return idx, np.take_along_axis(scores, idx, axis=-1)
+
+
+class IndiceIVF:
+    """Índice de arquivo invertido (IVF) com centróides de k-means esférico.
+
+    As linhas são reordenadas por lista, de forma que cada lista é um bloco
+    contíguo de ``vetores`` — a busca lê apenas os blocos sondados.
+    """
+
+    tipo = 'ivf'
+
+    def __init__(self, centroides, offsets, ordem, vetores, n_probe=8, assinatura=''):
+        self.centroides = np.ascontiguousarray(centroides, dtype=np.float32)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.ordem = np.ascontiguousarray(ordem, dtype=np.int64)
+        self.vetores = np.ascontiguousarray(vetores, dtype=np.float32)
+        self.n_probe = n_probe
+        self.assinatura = assinatura
+
+    @property
+    def n_listas(self):
+        return len(self.centroides)
+
+    @classmethod
+    def construir(cls, matriz, n_listas=None, n_probe=8, iteracoes=20, amostra_treino=100_000, seed=42):
+        """Treina os centróides em uma amostra e distribui todas as linhas nas listas"""
+        assinatura = assinatura_matriz(matriz)
+        matriz = normalizar_linhas(matriz)
+        n = len(matriz)
+        if n_listas is None:
+            n_listas = int(np.sqrt(n))
+        n_listas = max(1, min(n_listas, n))
+
+        rng = np.random.default_rng(seed)
+        amostra = matriz[rng.choice(n, size=min(n, max(amostra_treino, n_listas)), replace=False)]
+        centroides = amostra[rng.choice(len(amostra), size=n_listas, replace=False)].copy()
+
+        for _ in range(iteracoes):
+            rotulos = cls._atribuir(amostra, centroides)
+            somas = np.zeros_like(centroides)
+            np.add.at(somas, rotulos, amostra)
+            vazias = np.bincount(rotulos, minlength=n_listas) == 0
+            # Listas vazias recebem pontos aleatórios da amostra
+            somas[vazias] = amostra[rng.choice(len(amostra), size=int(vazias.sum()))]
+            centroides = normalizar_linhas(somas)
+
+        rotulos = cls._atribuir(matriz, centroides)
+        ordem = np.argsort(rotulos, kind='stable')
+        offsets = np.zeros(n_listas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rotulos, minlength=n_listas), out=offsets[1:])
+        return cls(centroides, offsets, ordem, matriz[ordem], n_probe, assinatura)
+
+    @staticmethod
+    def _atribuir(matriz, centroides, bloco=65_536):
+        """Lista (centróide mais similar) de cada linha, processada em blocos"""
+        rotulos = np.empty(len(matriz), dtype=np.int64)
+        for inicio in range(0, len(matriz), bloco):
+            parte = matriz[inicio:inicio + bloco]
+            rotulos[inicio:inicio + bloco] = np.argmax(parte @ centroides.T, axis=1)
+        return rotulos
+
+    def buscar(self, consultas, k, n_probe=None):
+        """Retorna (indices, scores) dos k vizinhos aproximados de cada consulta.
+
+        Posições sem candidato suficiente são preenchidas com índice -1 e score -inf.
+        """
+        consultas = np.atleast_2d(consultas)
+        n_probe = max(1, min(n_probe or self.n_probe, self.n_listas))
+        listas = top_k_indices(consultas @ self.centroides.T, n_probe)
+
+        indices = np.full((len(consultas), k), -1, dtype=np.int64)
+        scores = np.full((len(consultas), k), -np.inf, dtype=np.float32)
+        for i, (consulta, sondadas) in enumerate(zip(consultas, listas)):
+            posicoes = np.concatenate([
+                np.arange(self.offsets[l], self.offsets[l + 1]) for l in sondadas
+            ])
+            if len(posicoes) == 0:
+                continue
+            scores_candidatos = self.vetores[posicoes] @ consulta
+            melhores = top_k_indices(scores_candidatos, k)
+            indices[i, :len(melhores)] = self.ordem[posicoes[melhores]]
+            scores[i, :len(melhores)] = scores_candidatos[melhores]
+        return indices, scores
+
+    def salvar(self, caminho):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        # Arquivo novo + rename: workers que mapeiam o índice anterior continuam lendo o arquivo antigo
+        temporario = caminho.with_name(caminho.name + '.tmp')
+        with open(temporario, 'wb') as f:
+            np.savez(f, centroides=self.centroides, offsets=self.offsets, ordem=self.ordem,
+                     vetores=self.vetores, n_probe=self.n_probe, assinatura=self.assinatura)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho, mmap=True):
+        """Com ``mmap``, os arrays são mapeados do arquivo (compartilhados entre workers)"""
+        if mmap:
+            from src.endpoint.memoria import mapear_npz
+
+            arq = mapear_npz(caminho)
+            return cls(arq['centroides'], arq['offsets'], arq['ordem'], arq['vetores'],
+                       int(arq['n_probe']), str(arq['assinatura']))
+        with np.load(caminho) as arq:
+            return cls(arq['centroides'], arq['offsets'], arq['ordem'], arq['vetores'],
+                       int(arq['n_probe']), str(arq['assinatura']))
+
+
+class IndiceAuditado:
+    """Responde com o índice aproximado e acumula o recall@k contra a busca exata"""
+
+    def __init__(self, indice, exato, intervalo_log=100):
+        self.indice = indice
+        self.intervalo_log = intervalo_log
+        self.exato = exato
+        self.tipo = f'{indice.tipo}+auditoria'
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.soma_recall = 0.0
+
+    def buscar(self, consultas, k):
+        indices, scores = self.indice.buscar(consultas, k)
+        esperados, _ = self.exato.buscar(consultas, k)
+        recalls = [calcular_recall(obtido, esperado) for obtido, esperado in zip(indices, esperados)]
+        with self._lock:
+            anteriores = self.consultas
+            self.consultas += len(recalls)
+            self.soma_recall += sum(recalls)
+            if self.consultas // self.intervalo_log > anteriores // self.intervalo_log:
+                logging.info(f"Índice {self.indice.tipo}: recall@{k} médio {self.recall_medio:.4f} "
+                             f"em {self.consultas} consultas")
+        return indices, scores
+
+    @property
+    def recall_medio(self):
+        return self.soma_recall / self.consultas if self.consultas else None
+
+
+def calcular_recall(obtidos, esperados):
+    """Fração dos vizinhos exatos presentes no resultado aproximado"""
+    esperados = np.asarray(esperados)
+    if len(esperados) == 0:
+        return 1.0
+    return len(np.intersect1d(obtidos[obtidos >= 0], esperados)) / len(esperados)
+
+
+def medir_recall(indice, matriz, consultas, k):
+    """Recall@k médio e latência média (ms) do índice frente à busca exata"""
+    exato = IndiceExato(matriz)
+    consultas = normalizar_linhas(consultas)
+    esperados, _ = exato.buscar(consultas, k)
+
+    inicio = time.perf_counter()
+    obtidos = [indice.buscar(c, k)[0][0] for c in consultas]
+    latencia_ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+
+    recall = float(np.mean([calcular_recall(o, e) for o, e in zip(obtidos, esperados)]))
+    return {'recall': recall, 'latencia_ms': latencia_ms, 'k': k, 'consultas': len(consultas)}
+
+
+def criar_indice(matriz, tipo='exato', caminho=None, n_listas=None, n_probe=8, auditar=False, normalizada=False,
+                 gravar=True):
+    """Cria o índice configurado, reaproveitando o arquivo persistido quando compatível.
+
+    Com ``gravar=False`` (workers da API), um índice ausente ou desatualizado é construído
+    apenas em memória; o arquivo é gravado por ``modelo preparar``.
+    """
+    exato = IndiceExato(matriz, normalizar=not normalizada)
+    if tipo == 'exato':
+        return exato
+    if tipo != 'ivf':
+        raise ValueError(f"Tipo de índice inválido: {tipo}. Use 'exato' ou 'ivf'.")
+
+    indice = None
+    if caminho is not None and Path(caminho).exists():
+        indice = IndiceIVF.carregar(caminho)
+        if indice.assinatura != assinatura_matriz(matriz):
+            logging.warning(f"Índice de vizinhos em {caminho} desatualizado; reconstruindo.")
+            indice = None
+    if indice is None:
+        indice = IndiceIVF.construir(matriz, n_listas=n_listas, n_probe=n_probe)
+        if caminho is not None and gravar:
+            indice.salvar(caminho)
+        elif caminho is not None:
+            logging.warning("Índice IVF construído em memória; execute 'python -m src.endpoint.modelo preparar' "
+                            "para gravá-lo e compartilhá-lo entre os workers.")
+    indice.n_probe = n_probe
+
+    return IndiceAuditado(indice, exato) if auditar else indice
+
+
+def main(argv=None):
+    from src.endpoint import modelo
+
+    parser = argparse.ArgumentParser(description="Construção e avaliação do índice de vizinhos")
+    parser.add_argument('comando', choices=['construir', 'recall'])
+    parser.add_argument('--caminho', default=str(modelo.indice_vizinhos_path))
+    parser.add_argument('--n-listas', type=int, default=None)
+    parser.add_argument('--n-probe', type=int, default=8)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--consultas', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    matriz = modelo.obter_estado().X_normalizado
+    if args.comando == 'construir':
+        inicio = time.perf_counter()
+        indice = IndiceIVF.construir(matriz, n_listas=args.n_listas, n_probe=args.n_probe)
+        indice.salvar(args.caminho)
+        print(f"Índice IVF com {indice.n_listas} listas salvo em {args.caminho} "
+              f"({time.perf_counter() - inicio:.2f}s)")
+    else:
+        indice = criar_indice(matriz, 'ivf', args.caminho, args.n_listas, args.n_probe)
+        rng = np.random.default_rng(0)
+        consultas = matriz[rng.choice(len(matriz), size=min(args.consultas, len(matriz)), replace=False)]
+        print(medir_recall(indice, matriz, consultas, args.k))
+
+
+if __name__ == '__main__':
+    main()
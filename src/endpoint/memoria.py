@@ -0,0 +1,103 @@
+"""Memória por processo e arrays mapeados em memória compartilhados entre workers.
+
+Com vários workers (``uvicorn --workers N``), cada processo mapeia os mesmos arquivos
+do snapshot (``np.load(..., mmap_mode='r')``): as páginas ficam no cache do sistema e
+são compartilhadas, em vez de uma cópia por worker. ``memoria_processo`` separa o que é
+privado de cada processo do que é compartilhado, para confirmar que a memória privada
+não cresce com o número de workers:
+
+- ``rss``: páginas residentes (inclui as compartilhadas, contadas em cada processo);
+- ``pss``: RSS com as páginas compartilhadas divididas entre os processos que as usam;
+- ``privada``: memória anônima do processo (heap do Python, arrays copiados);
+- ``compartilhada``: páginas de arquivos mapeados e memória compartilhada.
+"""
+import os
+import resource
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from src.endpoint.observabilidade import registro_metricas
+
+# Campos de /proc/<pid>/smaps_rollup (ou status) -> chave em memoria_processo
+_campos_smaps = {'Rss': 'rss', 'Pss': 'pss', 'Anonymous': 'privada'}
+_campos_status = {'VmRSS': 'rss', 'RssAnon': 'privada', 'RssFile': 'compartilhada', 'RssShmem': 'shmem'}
+
+
+def _ler_kb(caminho, campos):
+    valores = {}
+    with open(caminho, 'r', encoding='ascii') as f:
+        for linha in f:
+            nome, _, resto = linha.partition(':')
+            if nome in campos:
+                valores[campos[nome]] = int(resto.split()[0]) * 1024
+    return valores
+
+
+def memoria_processo(pid=None):
+    """Memória (bytes) do processo; fora do Linux, apenas o pico de RSS do próprio processo"""
+    pid = os.getpid() if pid is None else pid
+    proc = Path('/proc') / str(pid)
+    if not proc.exists():
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss_pico': pico if sys.platform == 'darwin' else pico * 1024}
+    memoria = _ler_kb(proc / 'status', _campos_status)
+    memoria['compartilhada'] = memoria.get('compartilhada', 0) + memoria.pop('shmem', 0)
+    if (proc / 'smaps_rollup').exists():
+        memoria.update(_ler_kb(proc / 'smaps_rollup', _campos_smaps))
+    return memoria
+
+
+def processos_filhos(pid):
+    """PIDs cujo processo pai é ``pid`` (Linux)"""
+    filhos = []
+    for stat in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            # O nome do executável (entre parênteses) pode conter espaços
+            campos = stat.read_text().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(campos[1]) == pid:
+            filhos.append(int(stat.parent.name))
+    return sorted(filhos)
+
+
+@registro_metricas.coletor
+def _metricas_memoria():
+    pid = str(os.getpid())
+    return [('squad_processo_memoria_bytes', 'gauge', 'Memória do worker por tipo (rss, pss, privada, compartilhada)',
+             [({'pid': pid, 'tipo': tipo}, valor) for tipo, valor in memoria_processo().items()])]
+
+
+def mapear_npz(caminho):
+    """Arrays de um ``.npz`` não comprimido (``np.savez``) mapeados em memória, somente leitura.
+
+    ``np.load`` não mapeia membros de um ``.npz``; como ``np.savez`` grava cada ``.npy`` sem
+    compressão, basta localizar o início dos dados de cada membro no arquivo. Escalares e
+    arrays de objetos são lidos normalmente.
+    """
+    arrays = {}
+    with zipfile.ZipFile(caminho) as arquivo_zip, open(caminho, 'rb') as f:
+        for info in arquivo_zip.infolist():
+            nome = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{caminho}: membro {info.filename} comprimido; use np.savez para mapear.")
+            # Cabeçalho local do zip: 30 bytes fixos + nome + campo extra
+            f.seek(info.header_offset + 26)
+            tamanho_nome, tamanho_extra = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + tamanho_nome + tamanho_extra)
+            versao = np.lib.format.read_magic(f)
+            if versao == (1, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                forma, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if forma == () or dtype.hasobject or 0 in forma:
+                with arquivo_zip.open(info) as membro:
+                    arrays[nome] = np.lib.format.read_array(membro, allow_pickle=False)
+                continue
+            arrays[nome] = np.memmap(caminho, dtype=dtype, mode='r', offset=f.tell(), shape=forma,
+                                     order='F' if fortran else 'C')
+    return arrays
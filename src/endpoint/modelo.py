@@ -0,0 +1,601 @@
+"""Estado do modelo de recomendação e snapshot pré-compilado.
+
+O estado (parâmetros do scaler, vocabulários dos encoders, matriz de features
+normalizada, índices de desafios e catálogo) é compilado offline a partir do
+CSV/JSON e gravado em um snapshot versionado:
+
+    python -m src.endpoint.modelo compilar
+    python -m src.endpoint.modelo tempo     # cold start: CSV x snapshot
+
+Em produção o snapshot é carregado sob demanda, com as matrizes mapeadas em
+memória (``np.load(..., mmap_mode='r')``). Sem snapshot, o estado é compilado
+em memória a partir do CSV, como antes.
+"""
+import argparse
+import dataclasses
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+import numpy as np
+
+from src.endpoint.indice_desafios import IndiceDesafios
+from src.endpoint.indice_vizinhos import criar_indice, normalizar_linhas
+from src.endpoint.observabilidade import cronometrar, registro_metricas
+from src.endpoint.serializacao import serializar
+
+# === Caminhos ===
+base_dir = Path(__file__).resolve().parents[2]
+dados_path = Path(os.getenv('SQUAD_DADOS_PATH', base_dir / 'src' / 'dataframe' / 'recommendation_dataset.csv'))
+challenges_path = Path(os.getenv('SQUAD_CHALLENGES_PATH', base_dir / 'src' / 'dataframe' / 'challenges.json'))
+snapshot_dir = Path(os.getenv('SQUAD_SNAPSHOT_DIR', base_dir / 'src' / 'dataframe' / 'snapshot'))
+
+indice_vizinhos_path = Path(os.getenv('SQUAD_INDICE_PATH', base_dir / 'src' / 'dataframe' / 'indice_vizinhos.npz'))
+# Contador incrementado por /admin/recarregar; o monitor de cada worker recarrega quando ele muda
+geracao_path = Path(os.getenv('SQUAD_GERACAO_PATH', snapshot_dir / 'GERACAO'))
+
+# SQUAD_USAR_SNAPSHOT=0 ignora o snapshot e compila a partir do CSV
+USAR_SNAPSHOT = os.getenv('SQUAD_USAR_SNAPSHOT', '1') == '1'
+
+# Índice de vizinhos: 'exato' (varredura completa) ou 'ivf' (aproximado);
+# SQUAD_IVF_NPROBE ajusta recall x latência e SQUAD_INDICE_AUDITAR=1 mede o recall contra a busca exata
+TIPO_INDICE = os.getenv('SQUAD_INDICE_VIZINHOS', 'exato')
+IVF_NPROBE = int(os.getenv('SQUAD_IVF_NPROBE', '8'))
+AUDITAR_INDICE = os.getenv('SQUAD_INDICE_AUDITAR', '0') == '1'
+
+# Versão do formato em disco; snapshots de outro formato são ignorados
+FORMATO_SNAPSHOT = 1
+
+colunas_numericas = ['age', 'training_days', 'training_time']
+colunas_hexad = ['Philanthropist', 'Socialiser', 'Free Spirit', 'Achiever', 'Player', 'Disruptor']
+categorical_cols = ['body_type', 'fitness_goal', 'experience_level']
+colunas_features = colunas_numericas + colunas_hexad + [f'{col}_encoded' for col in categorical_cols]
+
+# Mapeamento dos scores HEXAD da entrada para os nomes das colunas do dataset
+hexad_colunas = {
+    'Philanthropist': 'score_philanthropist',
+    'Socialiser': 'score_socialiser',
+    'Free Spirit': 'score_free_spirit',
+    'Achiever': 'score_achiever',
+    'Player': 'score_player',
+    'Disruptor': 'score_disruptor',
+}
+
+# Mapeamento de goal para fitness_goal
+goal_mapping = {
+    'Emagrecimento': 'Emagrecimento',
+    'Hipertrofia': 'Hipertrofia',
+    'Força': 'Força'
+}
+
+# Mapeamento de experience_level
+level_mapping = {
+    'Iniciante': 'Iniciante',
+    'Intermediário': 'Intermediário',
+    'Avançado': 'Avançado'
+}
+
+# Mapeamento de body_type
+body_mapping = {
+    'Masculino': 'Masculino',
+    'Feminino': 'Feminino'
+}
+
+# Coluna categórica -> (campo da entrada, mapeamento, valor padrão)
+categoricas_entrada = {
+    'body_type': ('body_type', body_mapping, 'Masculino'),
+    'fitness_goal': ('goal', goal_mapping, 'Emagrecimento'),
+    'experience_level': ('experience_level', level_mapping, 'Iniciante'),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class EstadoModelo:
+    """Tudo o que o recomendador precisa para atender uma requisição (imutável)"""
+
+    versao: str
+    scaler_media: np.ndarray
+    scaler_escala: np.ndarray
+    vocabularios: dict
+    X_normalizado: np.ndarray
+    indice_recomendados: IndiceDesafios
+    indice_concluidos: IndiceDesafios
+    challenges_data: dict
+    indice_vizinhos: object = None
+    # Derivados do catálogo: detalhes de resposta e seus fragmentos JSON, prontos por desafio
+    detalhes_desafios: dict = dataclasses.field(init=False, repr=False)
+    fragmentos_desafios: dict = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        detalhes = {
+            challenge_id: {
+                'id': challenge_id,
+                'name': f"Desafio {challenge_id}",
+                'description': challenge['description'],
+                'hexad_type': challenge['type'],
+                'difficulty': f"{challenge['duration']} dias, {challenge['target_sessions']} sessões"
+            }
+            for challenge_id, challenge in self.challenges_data.items()
+        }
+        object.__setattr__(self, 'detalhes_desafios', detalhes)
+        object.__setattr__(self, 'fragmentos_desafios', {
+            challenge_id: serializar(detalhe) for challenge_id, detalhe in detalhes.items()
+        })
+
+    def codificar(self, col, valores):
+        """Equivalente ao LabelEncoder.transform a partir do vocabulário salvo"""
+        classes = self.vocabularios[col]
+        codigos = np.searchsorted(classes, valores)
+        codigos = np.minimum(codigos, len(classes) - 1)
+        desconhecidos = classes[codigos] != np.asarray(valores, dtype=classes.dtype)
+        if desconhecidos.any():
+            raise ValueError(f"y contains previously unseen labels: {np.asarray(valores)[desconhecidos].tolist()}")
+        return codigos
+
+    def preparar_entradas(self, dados_dicts):
+        """Converte uma lista de entradas de usuário na matriz de features normalizada (n x d)"""
+        with cronometrar('codificacao'):
+            colunas = {}
+            numericas = np.array([[d[c] for c in colunas_numericas] for d in dados_dicts], dtype=np.float64)
+
+            # Mapear scores HEXAD para os nomes corretos do dataset
+            for col, campo in hexad_colunas.items():
+                colunas[col] = np.array([
+                    3.5 if d.get(campo) is None else d[campo] for d in dados_dicts
+                ], dtype=np.float64)
+
+            # Mapear e codificar dados categóricos
+            for col, (campo, mapeamento, padrao) in categoricas_entrada.items():
+                valores = [mapeamento.get(d.get(campo), padrao) for d in dados_dicts]
+                colunas[f'{col}_encoded'] = self.codificar(col, valores)
+
+        with cronometrar('normalizacao'):
+            # Normalizar dados numéricos (StandardScaler) e cada vetor pela norma L2
+            numericas = (numericas - self.scaler_media) / self.scaler_escala
+            for i, col in enumerate(colunas_numericas):
+                colunas[col] = numericas[:, i]
+            return normalizar_linhas(np.column_stack([colunas[c] for c in colunas_features]))
+
+
+_hashes_calculados = {}
+
+
+def _hash_arquivos(*caminhos):
+    # Reaproveitado enquanto tamanho e mtime não mudam: recargas e o monitor não releem o CSV
+    chave = tuple((str(c), Path(c).stat().st_mtime_ns, Path(c).stat().st_size) for c in caminhos)
+    if chave not in _hashes_calculados:
+        h = hashlib.blake2b(digest_size=8)
+        for caminho in caminhos:
+            h.update(Path(caminho).read_bytes())
+        _hashes_calculados.clear()
+        _hashes_calculados[chave] = h.hexdigest()
+    return _hashes_calculados[chave]
+
+
+def compilar_estado(dados_path=dados_path, challenges_path=challenges_path):
+    """Lê o CSV e o catálogo e ajusta scaler e encoders (caminho lento, usado offline)"""
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    dados = pd.read_csv(dados_path)
+    with open(challenges_path, 'r', encoding='utf-8') as f:
+        challenges_list = json.load(f)
+
+    # Converter lista de desafios para dicionário por ID
+    challenges_data = {}
+    for challenge in challenges_list:
+        challenges_data[challenge['challenge_id']] = challenge
+
+    # Normalizar dados numéricos
+    scaler = StandardScaler()
+    dados[colunas_numericas] = scaler.fit_transform(dados[colunas_numericas])
+
+    # Codificar variáveis categóricas
+    vocabularios = {}
+    for col in categorical_cols:
+        encoder = LabelEncoder()
+        dados[f'{col}_encoded'] = encoder.fit_transform(dados[col])
+        vocabularios[col] = np.asarray(encoder.classes_, dtype=str)
+
+    versao = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{_hash_arquivos(dados_path, challenges_path)}"
+    return EstadoModelo(
+        versao=versao,
+        scaler_media=scaler.mean_,
+        scaler_escala=scaler.scale_,
+        vocabularios=vocabularios,
+        X_normalizado=normalizar_linhas(dados[colunas_features].to_numpy()),
+        indice_recomendados=IndiceDesafios.from_series(dados['recommended_challenges']),
+        indice_concluidos=IndiceDesafios.from_series(dados['completed_challenges']),
+        challenges_data=challenges_data,
+    )
+
+
+def salvar_snapshot(estado, diretorio=snapshot_dir):
+    """Grava o estado em ``diretorio/<versao>/`` e aponta ``diretorio/ATUAL`` para ele"""
+    diretorio = Path(diretorio)
+    destino = diretorio / estado.versao
+    destino.mkdir(parents=True, exist_ok=True)
+
+    np.save(destino / 'X_normalizado.npy', estado.X_normalizado)
+    for nome, indice in (('recomendados', estado.indice_recomendados), ('concluidos', estado.indice_concluidos)):
+        np.save(destino / f'{nome}_offsets.npy', indice.offsets)
+        np.save(destino / f'{nome}_valores.npy', indice.valores)
+    with open(destino / 'challenges.json', 'w', encoding='utf-8') as f:
+        json.dump(list(estado.challenges_data.values()), f, ensure_ascii=False)
+
+    manifesto = {
+        'formato': FORMATO_SNAPSHOT,
+        'versao': estado.versao,
+        'criado_em': datetime.datetime.now().isoformat(),
+        'colunas_features': colunas_features,
+        'scaler': {'media': estado.scaler_media.tolist(), 'escala': estado.scaler_escala.tolist()},
+        'vocabularios': {col: classes.tolist() for col, classes in estado.vocabularios.items()},
+    }
+    # O manifesto é escrito por último: sua presença indica um snapshot completo
+    with open(destino / 'manifesto.json', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=2)
+
+    ponteiro = diretorio / 'ATUAL'
+    temporario = diretorio / 'ATUAL.tmp'
+    temporario.write_text(estado.versao, encoding='utf-8')
+    os.replace(temporario, ponteiro)
+    return destino
+
+
+def _ler_manifesto(origem):
+    with open(origem / 'manifesto.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _manifesto_compativel(manifesto):
+    return manifesto.get('formato') == FORMATO_SNAPSHOT and manifesto.get('colunas_features') == colunas_features
+
+
+def carregar_snapshot(diretorio=snapshot_dir, versao=None, mmap=True):
+    """Carrega um snapshot; as matrizes são mapeadas em memória (somente leitura)"""
+    diretorio = Path(diretorio)
+    if versao is None:
+        versao = (diretorio / 'ATUAL').read_text(encoding='utf-8').strip()
+    origem = diretorio / versao
+    manifesto = _ler_manifesto(origem)
+    if not _manifesto_compativel(manifesto):
+        raise ValueError(f"Snapshot {versao} incompatível com esta versão do recomendador.")
+
+    modo = 'r' if mmap else None
+    with open(origem / 'challenges.json', 'r', encoding='utf-8') as f:
+        challenges_data = {c['challenge_id']: c for c in json.load(f)}
+
+    return EstadoModelo(
+        versao=manifesto['versao'],
+        scaler_media=np.asarray(manifesto['scaler']['media'], dtype=np.float64),
+        scaler_escala=np.asarray(manifesto['scaler']['escala'], dtype=np.float64),
+        vocabularios={col: np.asarray(classes, dtype=str) for col, classes in manifesto['vocabularios'].items()},
+        X_normalizado=np.load(origem / 'X_normalizado.npy', mmap_mode=modo),
+        indice_recomendados=IndiceDesafios(
+            np.load(origem / 'recomendados_offsets.npy', mmap_mode=modo),
+            np.load(origem / 'recomendados_valores.npy', mmap_mode=modo),
+        ),
+        indice_concluidos=IndiceDesafios(
+            np.load(origem / 'concluidos_offsets.npy', mmap_mode=modo),
+            np.load(origem / 'concluidos_valores.npy', mmap_mode=modo),
+        ),
+        challenges_data=challenges_data,
+    )
+
+
+def snapshot_disponivel(diretorio=snapshot_dir):
+    return (Path(diretorio) / 'ATUAL').exists()
+
+
+def snapshot_atualizado(diretorio=snapshot_dir):
+    """Snapshot atual compilado a partir dos arquivos de dados e catálogo em disco, no formato desta versão"""
+    if not snapshot_disponivel(diretorio):
+        return False
+    versao = (Path(diretorio) / 'ATUAL').read_text(encoding='utf-8').strip()
+    if not versao.endswith(f"-{_hash_arquivos(dados_path, challenges_path)}"):
+        return False
+    try:
+        return _manifesto_compativel(_ler_manifesto(Path(diretorio) / versao))
+    except (OSError, ValueError):  # manifesto ausente ou corrompido
+        return False
+
+
+def limpar_snapshots(anterior, diretorio=snapshot_dir):
+    """Remove as versões do snapshot gravadas antes de ``anterior``; retorna as removidas.
+
+    A versão atual e a anterior (ainda mapeada pelas requisições em andamento) são mantidas.
+    A ordem é a de ``criado_em`` no manifesto: o carimbo do nome da versão tem resolução de segundos.
+    """
+    diretorio = Path(diretorio)
+    criacao = {}
+    for origem in diretorio.iterdir():
+        try:
+            criacao[origem.name] = _ler_manifesto(origem)['criado_em']
+        except (OSError, ValueError, KeyError):
+            continue  # não é uma versão (ou está sendo gravada)
+    if anterior not in criacao:
+        return []
+    atual = (diretorio / 'ATUAL').read_text(encoding='utf-8').strip() if snapshot_disponivel(diretorio) else None
+    removidas = []
+    for versao, criado_em in criacao.items():
+        if criado_em < criacao[anterior] and versao != atual:
+            shutil.rmtree(diretorio / versao, ignore_errors=True)
+            removidas.append(versao)
+    return sorted(removidas)
+
+
+def _recompilar_snapshot(diretorio=snapshot_dir):
+    """Recompila o snapshot desatualizado; entre workers, só o primeiro a obter a trava compila"""
+    with open(Path(diretorio) / '.compilacao.lock', 'w') as trava:
+        if fcntl is not None:
+            fcntl.flock(trava, fcntl.LOCK_EX)  # liberada ao fechar o arquivo
+        if not snapshot_atualizado(diretorio):
+            estado = compilar_estado()
+            salvar_snapshot(estado, diretorio)
+            logging.info(f"Snapshot desatualizado frente aos arquivos de dados; recompilado como {estado.versao}.")
+
+
+def carregar_estado():
+    """Snapshot quando disponível (caso contrário, compila a partir do CSV) com o índice de vizinhos.
+
+    Um snapshot que não corresponde mais ao CSV e ao catálogo em disco é recompilado e gravado
+    antes da carga, de modo que uma recarga após editar os arquivos nunca sirva o modelo antigo.
+    """
+    erro_snapshot = None
+    if USAR_SNAPSHOT and snapshot_disponivel() and not snapshot_atualizado():
+        # Desatualizado frente aos arquivos ou gravado em outro formato
+        try:
+            _recompilar_snapshot()
+        except Exception as e:
+            erro_snapshot = str(e)
+            logging.warning(f"Não foi possível gravar o snapshot ({e}); compilando apenas em memória.")
+    if USAR_SNAPSHOT and snapshot_atualizado():
+        estado = carregar_snapshot()
+    else:
+        logging.info("Snapshot do modelo atualizado não encontrado; compilando a partir do CSV.")
+        estado = compilar_estado()
+    indice = criar_indice(
+        estado.X_normalizado, TIPO_INDICE, indice_vizinhos_path,
+        n_probe=IVF_NPROBE, auditar=AUDITAR_INDICE, normalizada=True, gravar=False,
+    )
+    _status_recarga['erro_snapshot'] = erro_snapshot
+    return dataclasses.replace(estado, indice_vizinhos=indice)
+
+
+_estado = None
+_assinatura_carregada = None  # _assinatura_arquivos() lida antes da carga do estado atual
+_lock_estado = threading.Lock()
+_lock_recarga = threading.Lock()
+_status_recarga = {'em_andamento': False, 'ultima_recarga': None, 'erro': None, 'erro_snapshot': None}
+_callbacks_recarga = []
+
+
+def ao_recarregar(callback):
+    """Registra uma função chamada com o novo estado após cada recarga (ex.: invalidar caches)"""
+    _callbacks_recarga.append(callback)
+    return callback
+
+
+def obter_estado():
+    """Estado atual do modelo, carregado na primeira chamada.
+
+    Quem atende uma requisição deve chamar esta função uma única vez e usar o
+    objeto retornado até o fim: uma recarga troca a referência global, mas o
+    estado antigo continua válido para as requisições em andamento.
+    """
+    global _estado, _assinatura_carregada
+    if _estado is None:
+        with _lock_estado:
+            if _estado is None:
+                assinatura = _assinatura_arquivos()
+                _estado = carregar_estado()
+                _assinatura_carregada = assinatura
+    return _estado
+
+
+def recarregar_estado():
+    """Constrói um novo estado a partir dos arquivos e o troca atomicamente pelo atual"""
+    global _estado, _assinatura_carregada
+    with _lock_recarga:
+        _status_recarga['em_andamento'] = True
+        try:
+            # Lida antes da carga: uma mudança durante a carga dispara outra recarga pelo monitor
+            assinatura = _assinatura_arquivos()
+            novo = carregar_estado()
+            anterior = _estado
+            _estado = novo  # atribuição de referência: atômica para as demais threads
+            _assinatura_carregada = assinatura
+            _status_recarga.update(ultima_recarga=datetime.datetime.now().isoformat(), erro=None)
+            logging.info(f"Modelo recarregado: {anterior.versao if anterior else None} -> {novo.versao}")
+            if USAR_SNAPSHOT and anterior is not None and snapshot_dir.exists():
+                try:
+                    limpar_snapshots(anterior.versao)
+                except OSError as e:
+                    logging.warning(f"Não foi possível remover snapshots antigos: {e}")
+            for callback in _callbacks_recarga:
+                callback(novo)
+            return novo
+        except Exception as e:
+            _status_recarga['erro'] = str(e)
+            logging.error(f"Erro ao recarregar o modelo: {str(e)}")
+            raise
+        finally:
+            _status_recarga['em_andamento'] = False
+
+
+def solicitar_recarga():
+    """Incrementa o contador de recarga em disco: o monitor de cada worker recarrega o seu estado"""
+    try:
+        geracao = int(geracao_path.read_text(encoding='ascii')) + 1
+    except (FileNotFoundError, ValueError):
+        geracao = 1
+    geracao_path.parent.mkdir(parents=True, exist_ok=True)
+    temporario = geracao_path.with_name(f'{geracao_path.name}.{os.getpid()}.tmp')
+    temporario.write_text(str(geracao), encoding='ascii')
+    os.replace(temporario, geracao_path)
+    return geracao
+
+
+def recarregar_em_segundo_plano():
+    """Avisa os demais workers e dispara a recarga deste em uma thread; False se já houver uma em andamento"""
+    solicitar_recarga()
+    if _lock_recarga.locked():
+        return False
+
+    def executar():
+        try:
+            recarregar_estado()
+        except Exception:
+            pass  # erro registrado em status_recarga()
+
+    threading.Thread(target=executar, name='recarga-modelo', daemon=True).start()
+    return True
+
+
+def status_recarga():
+    return {'versao': _estado.versao if _estado else None, **_status_recarga}
+
+
+@registro_metricas.coletor
+def _metricas_modelo():
+    if _estado is None:
+        return []
+    metricas = [
+        ('squad_modelo_info', 'gauge', 'Versão do modelo em uso', [({'versao': _estado.versao}, 1)]),
+        ('squad_modelo_usuarios', 'gauge', 'Usuários na matriz de features', [({}, len(_estado.X_normalizado))]),
+    ]
+    recall = getattr(_estado.indice_vizinhos, 'recall_medio', None)
+    if recall is not None:
+        metricas.append(('squad_indice_recall', 'gauge', 'Recall@k médio do índice aproximado frente à busca exata',
+                         [({'indice': _estado.indice_vizinhos.tipo}, recall)]))
+    return metricas
+
+
+def _assinatura_arquivos():
+    """(mtime dos dados, do catálogo e do contador de recarga, versão apontada pelo snapshot)"""
+    caminhos = [dados_path, challenges_path, geracao_path]
+    ponteiro = snapshot_dir / 'ATUAL'
+    try:
+        versao = ponteiro.read_text(encoding='utf-8').strip() if USAR_SNAPSHOT else None
+    except FileNotFoundError:
+        versao = None
+    return tuple((str(c), c.stat().st_mtime_ns) for c in caminhos if c.exists()), versao
+
+
+def _recarga_pendente():
+    """Dados, catálogo ou contador mudaram desde a última carga, ou o snapshot passou a apontar outra versão.
+
+    O ponteiro é comparado também com a versão carregada: o snapshot que a própria carga
+    recompilou (arquivos desatualizados) não dispara outra recarga.
+    """
+    fontes, versao = _assinatura_arquivos()
+    fontes_carregadas, versao_carregada = _assinatura_carregada
+    return fontes != fontes_carregadas or versao not in (versao_carregada, _estado.versao)
+
+
+class MonitorArquivos:
+    """Verifica periodicamente os arquivos do modelo e recarrega o estado quando mudam.
+
+    Compara com a assinatura lida na última carga (``_recarga_pendente``), então a recarga
+    feita pelo próprio worker (``/admin/recarregar``) não se repete quando o monitor vê o
+    contador incrementado.
+    """
+
+    def __init__(self, intervalo=5.0):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._executar, name='monitor-modelo', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            if _estado is None or not _recarga_pendente():
+                continue
+            try:
+                recarregar_estado()
+            except Exception:
+                pass  # tenta de novo no próximo ciclo
+
+
+# SQUAD_MONITORAR_MODELO=<segundos> recarrega o modelo quando os arquivos mudam (0 desativa); com
+# vários workers (SQUAD_WORKERS > 1) fica ativo por padrão, para /admin/recarregar chegar a todos
+_varios_workers = int(os.getenv('SQUAD_WORKERS', '1')) > 1
+INTERVALO_MONITOR = float(os.getenv('SQUAD_MONITORAR_MODELO', '5' if _varios_workers else '0'))
+if _varios_workers and INTERVALO_MONITOR <= 0:
+    logging.warning("SQUAD_MONITORAR_MODELO=0 com vários workers: /admin/recarregar recarrega apenas um deles.")
+monitor_arquivos = MonitorArquivos(INTERVALO_MONITOR) if INTERVALO_MONITOR > 0 else None
+
+
+def _medir_cold_start(usar_snapshot, diretorio):
+    """Tempo (s) de um processo novo para importar o recomendador e carregar o estado"""
+    codigo = (
+        "import time; t = time.perf_counter(); "
+        "from src.endpoint import recomendador; from src.endpoint.modelo import obter_estado; "
+        "obter_estado(); print(time.perf_counter() - t)"
+    )
+    env = dict(os.environ, SQUAD_USAR_SNAPSHOT='1' if usar_snapshot else '0', SQUAD_SNAPSHOT_DIR=str(diretorio))
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=base_dir, env=env,
+                           capture_output=True, text=True, check=True)
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compilação do snapshot do modelo de recomendação")
+    parser.add_argument('comando', choices=['compilar', 'preparar', 'tempo'])
+    parser.add_argument('--diretorio', default=str(snapshot_dir))
+    args = parser.parse_args(argv)
+
+    if args.comando == 'compilar':
+        inicio = time.perf_counter()
+        estado = compilar_estado()
+        destino = salvar_snapshot(estado, args.diretorio)
+        print(f"Snapshot {estado.versao} gravado em {destino} ({time.perf_counter() - inicio:.2f}s)")
+    elif args.comando == 'preparar':
+        # Executado uma vez antes de subir os workers: todos mapeiam os mesmos arquivos
+        if snapshot_atualizado(args.diretorio):
+            print(f"Snapshot atualizado em {args.diretorio}")
+        else:
+            estado = compilar_estado()
+            print(f"Snapshot {estado.versao} gravado em {salvar_snapshot(estado, args.diretorio)}")
+        if TIPO_INDICE == 'ivf':
+            # Grava (ou valida) o índice persistido, que os workers também mapeiam
+            criar_indice(carregar_snapshot(args.diretorio).X_normalizado, TIPO_INDICE, indice_vizinhos_path,
+                         n_probe=IVF_NPROBE, normalizada=True)
+            print(f"Índice de vizinhos IVF pronto em {indice_vizinhos_path}")
+        from src.endpoint import filtragem_colaborativa
+        if not filtragem_colaborativa.als_path.exists():
+            # O motor colaborativo não treina dentro de uma requisição
+            filtragem_colaborativa.main(['treinar'])
+    else:
+        csv = _medir_cold_start(False, args.diretorio)
+        snapshot = _medir_cold_start(True, args.diretorio) if snapshot_disponivel(args.diretorio) else None
+        print(f"Cold start a partir do CSV: {csv:.3f}s")
+        if snapshot is None:
+            print("Snapshot não encontrado; execute 'compilar' primeiro.")
+        else:
+            print(f"Cold start a partir do snapshot: {snapshot:.3f}s ({csv / snapshot:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Modelo softmax (``recommendation_system/sofmax_based``) servido em NumPy.
+
+O ``RecSys`` recebe as features do usuário concatenadas ao embedding da descrição de um
+desafio e prevê os seis tipos HEXAD (``desafio_*``). Como a primeira camada é linear, a
+parte dela que depende do desafio é calculada uma única vez na carga; por requisição
+resta ``features_usuario @ W`` somado a cada desafio e as camadas seguintes (BatchNorm
+dobrada). A probabilidade de cada tipo para o usuário é a média sobre os desafios.
+
+Na API, ``SQUAD_FILTRO_TIPOS`` > 0 restringe os candidatos aos desafios dos tipos mais
+prováveis. O arquivo é gerado no notebook com ``exportar_softmax`` (última célula).
+"""
+import datetime
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.endpoint.redes_numpy import CamadaDensa, Rede, carregar_pesos, exportar_pesos, inferir_arquitetura, \
+    montar_rede
+from src.endpoint.two_tower import escalonamento, montar_features_usuario
+
+base_dir = Path(__file__).resolve().parents[2]
+softmax_path = Path(os.getenv('SQUAD_SOFTMAX_PATH', base_dir / 'src' / 'dataframe' / 'softmax.npz'))
+
+# Elementos da matriz intermediária usuários x desafios x neurônios por bloco (float32: 16 MB);
+# o bloco é dimensionado pelo tamanho do catálogo
+ELEMENTOS_POR_BLOCO = 4 * 1024 * 1024
+
+
+def exportar_softmax(caminho, model, scaler, user_feature_cols, numeric_cols, item_ids, item_features, labels):
+    """Exporta o ``RecSys`` treinado no notebook; ``item_features``: embeddings da descrição por desafio"""
+    state_dict = model.state_dict()
+    metadados = {
+        'modelo': 'softmax',
+        'exportado_em': datetime.datetime.now().isoformat(),
+        'user_feature_cols': list(user_feature_cols),
+        'numeric_cols': list(numeric_cols),
+        'labels': list(labels),
+        'arquitetura': inferir_arquitetura(set(state_dict), '', saida='output'),
+    }
+    return exportar_pesos(
+        caminho, state_dict, metadados,
+        scaler_media=scaler.mean_, scaler_escala=scaler.scale_,
+        item_ids=np.asarray(item_ids, dtype=np.int64), item_features=np.asarray(item_features, dtype=np.float32),
+    )
+
+
+def _sigmoide(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1)
+
+
+def tipo_do_rotulo(rotulo):
+    """'desafio_free_spirit' -> 'free_spirit' (mesma normalização de ``tipo_do_catalogo``)"""
+    return rotulo[len('desafio_'):] if rotulo.startswith('desafio_') else rotulo
+
+
+def tipo_do_catalogo(tipo):
+    """'Free Spirit' -> 'free_spirit', como as colunas one-hot do notebook"""
+    return str(tipo).lower().replace(' ', '_')
+
+
+class MotorSoftmax:
+    """``RecSys`` com a contribuição dos desafios na primeira camada pré-calculada"""
+
+    def __init__(self, caminho=softmax_path, challenges_data=None):
+        pesos, extras, metadados = carregar_pesos(caminho)
+        self.metadados = metadados
+        self.user_feature_cols = metadados['user_feature_cols']
+        self.tipos = [tipo_do_rotulo(rotulo) for rotulo in metadados['labels']]
+        self._media, self._escala = escalonamento(metadados, extras)
+
+        # Primeira camada dividida: usuário (por requisição) + desafio (uma vez, aqui)
+        rede = montar_rede(pesos, '', metadados['arquitetura'])
+        primeira = rede.camadas[0]
+        n_usuario = len(self.user_feature_cols)
+        item_features = extras['item_features']
+        self.contribuicao_itens = np.ascontiguousarray(item_features @ primeira.peso[n_usuario:] + primeira.vies)
+        self.item_ids = extras['item_ids']
+        self.posicao_itens = {int(item_id): posicao for posicao, item_id in enumerate(self.item_ids)}
+        camada_usuario = CamadaDensa(primeira.peso[:n_usuario].T, np.zeros_like(primeira.vies), relu=False)
+        self.camada_usuario = Rede([camada_usuario])
+        self.restante = Rede(rede.camadas[1:])
+
+        # Desafios do catálogo servido, por tipo normalizado
+        self.ids_por_tipo = {}
+        for challenge_id, desafio in (challenges_data or {}).items():
+            self.ids_por_tipo.setdefault(tipo_do_catalogo(desafio.get('type')), []).append(challenge_id)
+
+    def montar_features(self, dados_dicts, historicos):
+        return montar_features_usuario(dados_dicts, historicos, self.user_feature_cols, self._media, self._escala)
+
+    def _blocos(self, x):
+        """(início dos usuários, início dos desafios, probabilidades do bloco) com no máximo
+        ELEMENTOS_POR_BLOCO elementos na camada oculta"""
+        x = np.asarray(x, dtype=np.float32)
+        n_itens, ocultos = self.contribuicao_itens.shape
+        itens_por_bloco = max(1, min(n_itens, ELEMENTOS_POR_BLOCO // ocultos))
+        usuarios_por_bloco = max(1, ELEMENTOS_POR_BLOCO // (itens_por_bloco * ocultos))
+        for inicio in range(0, len(x), usuarios_por_bloco):
+            usuarios = self.camada_usuario(x[inicio:inicio + usuarios_por_bloco])
+            for inicio_itens in range(0, n_itens, itens_por_bloco):
+                itens = self.contribuicao_itens[inicio_itens:inicio_itens + itens_por_bloco]
+                h = usuarios[:, None, :] + itens[None, :, :]
+                np.maximum(h, 0, out=h)
+                logits = self.restante(h.reshape(-1, ocultos))
+                yield inicio, inicio_itens, _sigmoide(logits).reshape(len(usuarios), len(itens), -1)
+
+    def probabilidades(self, x):
+        """(usuários, desafios, tipos): probabilidade de cada tipo para cada par usuário x desafio"""
+        saida = np.empty((len(x), len(self.contribuicao_itens), len(self.tipos)), dtype=np.float32)
+        for inicio, inicio_itens, bloco in self._blocos(x):
+            saida[inicio:inicio + bloco.shape[0], inicio_itens:inicio_itens + bloco.shape[1]] = bloco
+        return saida
+
+    def prever_tipos(self, x):
+        """(usuários, tipos): probabilidade média de cada tipo sobre os desafios, acumulada bloco a bloco"""
+        soma = np.zeros((len(x), len(self.tipos)), dtype=np.float64)
+        for inicio, _, bloco in self._blocos(x):
+            soma[inicio:inicio + bloco.shape[0]] += bloco.sum(axis=1)
+        return (soma / len(self.contribuicao_itens)).astype(np.float32)
+
+    def tipos_previstos(self, dados_dicts, historicos, n_tipos):
+        """Os ``n_tipos`` tipos mais prováveis de cada entrada (normalizados, ex.: 'free_spirit') e, por
+        desafio (na ordem de ``item_ids``), a probabilidade somada desses tipos: (tipos, scores)"""
+        probabilidades = self.probabilidades(self.montar_features(dados_dicts, historicos))
+        ordem = np.argsort(-probabilidades.mean(axis=1, dtype=np.float64), axis=1)[:, :n_tipos]
+        scores = np.take_along_axis(probabilidades, ordem[:, None, :], axis=2).sum(axis=2)
+        return [[self.tipos[i] for i in linha] for linha in ordem], scores
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def obter_motor_softmax(challenges_data):
+    """Carrega o motor no primeiro uso; ``FileNotFoundError`` se o modelo não foi exportado"""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = MotorSoftmax(softmax_path, challenges_data)
+    return _motor
+
+
+def descartar_motor_softmax(*_):
+    global _motor
+    with _lock_motor:
+        _motor = None
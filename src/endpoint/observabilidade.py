@@ -0,0 +1,218 @@
+"""Logs com nível e amostragem, e métricas no formato de exposição do Prometheus.
+
+- ``obter_logger``: logger com nível ``SQUAD_LOG_NIVEL``; mensagens DEBUG passam por
+  amostragem (``SQUAD_LOG_AMOSTRAGEM``, fração entre 0 e 1) para não pesar no caminho quente.
+- ``cronometrar(etapa)``: mede uma etapa do recomendador no histograma
+  ``squad_etapa_duracao_segundos``.
+- ``registro_metricas.exportar()``: texto servido em ``/metrics``.
+- ``capturar_metricas()``: nos processos do pool (``SQUAD_EXECUTOR=processo``), guarda o que a
+  tarefa mediu para ``registro_metricas.reproduzir`` aplicar no processo que exporta ``/metrics``.
+"""
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+NIVEL_LOG = os.getenv('SQUAD_LOG_NIVEL', 'INFO').upper()
+AMOSTRAGEM_DEBUG = float(os.getenv('SQUAD_LOG_AMOSTRAGEM', '0.01'))
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+BUCKETS_LATENCIA = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+# === Logs ===
+
+class FiltroAmostragem(logging.Filter):
+    """Deixa passar apenas uma fração das mensagens abaixo de INFO"""
+
+    def __init__(self, taxa):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        return record.levelno >= logging.INFO or random.random() < self.taxa
+
+
+def obter_logger(nome):
+    logger = logging.getLogger(nome)
+    if not any(isinstance(f, FiltroAmostragem) for f in logger.filters):
+        logger.setLevel(NIVEL_LOG)
+        logger.addFilter(FiltroAmostragem(AMOSTRAGEM_DEBUG))
+    return logger
+
+
+# === Métricas ===
+
+# Incrementos e observações da tarefa em andamento, quando capturados (ver ``capturar_metricas``)
+_capturadas = None
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+
+def _formatar_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(rotulos.get(r, '') for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+        if _capturadas is not None:
+            _capturadas.append((self.nome, valor, rotulos))
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} counter']
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_valor(valor)}')
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(rotulos.get(r, '') for r in self.rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+        if _capturadas is not None:
+            _capturadas.append((self.nome, valor, rotulos))
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} histogram']
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                    acumulado += contagem
+                    rotulos = _formatar_rotulos(self.rotulos, chave, ('le', _formatar_valor(limite)))
+                    linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+                rotulos = _formatar_rotulos(self.rotulos, chave)
+                linhas.append(f'{self.nome}_sum{rotulos} {_formatar_valor(soma)}')
+                linhas.append(f'{self.nome}_count{rotulos} {total}')
+        return linhas
+
+
+class RegistroMetricas:
+    """Métricas do processo; coletores produzem valores calculados no momento da exportação"""
+
+    def __init__(self):
+        self._metricas = []
+        self._coletores = []
+
+    def contador(self, nome, ajuda, rotulos=()):
+        metrica = Contador(nome, ajuda, rotulos)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        metrica = Histograma(nome, ajuda, rotulos, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        """``funcao()`` retorna [(nome, tipo, ajuda, [(dict_rotulos, valor), ...]), ...]"""
+        self._coletores.append(funcao)
+        return funcao
+
+    def reproduzir(self, capturadas):
+        """Aplica incrementos e observações capturados em outro processo (``capturar_metricas``)"""
+        por_nome = {metrica.nome: metrica for metrica in self._metricas}
+        for nome, valor, rotulos in capturadas:
+            metrica = por_nome.get(nome)
+            if isinstance(metrica, Contador):
+                metrica.inc(valor, **rotulos)
+            elif isinstance(metrica, Histograma):
+                metrica.observar(valor, **rotulos)
+
+    def exportar(self):
+        linhas = []
+        for metrica in self._metricas:
+            linhas.extend(metrica.exportar())
+        for coletor in self._coletores:
+            for nome, tipo, ajuda, amostras in coletor():
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                for rotulos, valor in amostras:
+                    if valor is None:
+                        continue
+                    texto = _formatar_rotulos(tuple(rotulos), tuple(rotulos.values()))
+                    linhas.append(f'{nome}{texto} {_formatar_valor(valor)}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro_metricas = RegistroMetricas()
+
+duracao_etapas = registro_metricas.histograma(
+    'squad_etapa_duracao_segundos', 'Duração de cada etapa da recomendação', rotulos=('etapa',)
+)
+duracao_requisicoes = registro_metricas.histograma(
+    'squad_requisicao_duracao_segundos', 'Duração das requisições HTTP', rotulos=('metodo', 'rota', 'status')
+)
+total_recomendacoes = registro_metricas.contador(
+    'squad_recomendacoes_total', 'Usuários atendidos pelo recomendador', rotulos=('origem',)
+)
+
+
+@contextmanager
+def capturar_metricas():
+    """Lista, preenchida durante o bloco, dos incrementos e observações (nome, valor, rótulos) do processo.
+
+    Usado em cada tarefa de um processo do pool, que executa uma tarefa por vez: os
+    coletores e as métricas do processo filho não são exportados, então a lista volta com o
+    resultado. Inclui o que threads do próprio processo medirem durante o bloco.
+    """
+    global _capturadas
+    _capturadas = capturadas = []
+    try:
+        yield capturadas
+    finally:
+        _capturadas = None
+
+
+@contextmanager
+def cronometrar(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao_etapas.observar(time.perf_counter() - inicio, etapa=etapa)
@@ -0,0 +1,304 @@
+"""Recomendação em estágios: geradores de candidatos concorrentes e ranking vetorizado.
+
+Geradores (``SQUAD_PIPELINE_GERADORES``); ``vizinhos`` roda no pool do pipeline enquanto os
+demais, baratos, rodam na própria thread da requisição:
+
+- ``vizinhos``: desafios dos k usuários mais similares, com votos ponderados pela similaridade;
+- ``tipo_hexad``: desafios cujo ``type`` é um dos tipos HEXAD de maior score do usuário;
+- ``popularidade``: desafios mais recomendados no dataset.
+
+Cada gerador devolve uma matriz densa entradas x desafios do catálogo com scores em [0, 1]
+(0 = não é candidato). O ranking soma as matrizes com os pesos de ``SQUAD_PIPELINE_PESOS``
+e seleciona o top-N por entrada; entradas com poucos candidatos são completadas pelos
+desafios mais populares.
+
+Cada estágio tem um orçamento em ms (``SQUAD_PIPELINE_ORCAMENTOS``, contado a partir do
+início da geração; 0 = sem limite). Um gerador do pool que não termina dentro do orçamento é
+descartado e o ranking segue com os demais; os estágios executados na thread da requisição
+(geradores baratos e o ranking) não são interrompidos, apenas marcados.
+A duração e a situação de cada estágio voltam em ``ResultadoPipeline.etapas``.
+"""
+import concurrent.futures
+import dataclasses
+import os
+import threading
+import time
+
+import numpy as np
+
+from src.endpoint.executor import WORKERS_EXECUTOR
+from src.endpoint.indice_desafios import agregar_votos
+from src.endpoint.indice_vizinhos import top_k_indices
+from src.endpoint.modelo import ao_recarregar, hexad_colunas
+from src.endpoint.observabilidade import duracao_etapas, obter_logger, registro_metricas
+
+logger = obter_logger(__name__)
+
+
+def _ler_pares(texto, tipo=float):
+    """'a=1,b=2' -> {'a': 1.0, 'b': 2.0}"""
+    pares = (item.split('=', 1) for item in texto.split(',') if item.strip())
+    return {nome.strip(): tipo(valor) for nome, valor in pares}
+
+
+# === Configuração ===
+GERADORES = [nome.strip() for nome in os.getenv('SQUAD_PIPELINE_GERADORES', 'vizinhos,tipo_hexad,popularidade').split(',')
+             if nome.strip()]
+PESOS = _ler_pares(os.getenv('SQUAD_PIPELINE_PESOS', 'vizinhos=1.0,tipo_hexad=0.5,popularidade=0.1'))
+ORCAMENTOS_MS = _ler_pares(os.getenv('SQUAD_PIPELINE_ORCAMENTOS', 'vizinhos=50,tipo_hexad=20,popularidade=20,ranking=20'))
+# Geradores executados no pool; os demais são baratos e rodam na thread da requisição
+GERADORES_EM_POOL = {'vizinhos'}
+# Um gerador por requisição em execução no executor de recomendação: nenhum espera na fila
+# (o orçamento conta a partir da submissão)
+WORKERS = int(os.getenv('SQUAD_PIPELINE_WORKERS',
+                        str(max(1, WORKERS_EXECUTOR * len(GERADORES_EM_POOL.intersection(GERADORES))))))
+TOP_N = 5
+MINIMO_DESAFIOS = 3
+TIPOS_POR_USUARIO = 2
+
+estouros_pipeline = registro_metricas.contador(
+    'squad_pipeline_estouros_total', 'Estágios do pipeline que excederam o orçamento', rotulos=('etapa',)
+)
+
+
+# === Catálogo ===
+
+class CatalogoPipeline:
+    """Estruturas derivadas do catálogo e do dataset, alinhadas à ordem de ``ids``"""
+
+    def __init__(self, estado):
+        self.ids = np.array(sorted(estado.challenges_data), dtype=np.int64)
+        self.posicao = np.full(int(self.ids.max(initial=-1)) + 1, -1, dtype=np.int64)
+        self.posicao[self.ids] = np.arange(len(self.ids))
+
+        self.tipos = list(hexad_colunas)
+        self.matriz_tipos = np.zeros((len(self.tipos), len(self.ids)), dtype=np.float32)
+        for j, challenge_id in enumerate(self.ids.tolist()):
+            tipo = estado.challenges_data[challenge_id].get('type')
+            if tipo in hexad_colunas:
+                self.matriz_tipos[self.tipos.index(tipo), j] = 1
+
+        contagens = np.bincount(self.posicoes(estado.indice_recomendados.valores), minlength=len(self.ids))
+        self.popularidade = (contagens / max(int(contagens.max(initial=0)), 1)).astype(np.float32)
+        self.ordem_popularidade = np.argsort(-self.popularidade, kind='stable')
+
+    def posicoes(self, ids):
+        """Posições no catálogo dos ids informados (ids fora do catálogo são descartados)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < len(self.posicao))]
+        posicoes = self.posicao[ids]
+        return posicoes[posicoes >= 0]
+
+
+_catalogos = {}
+_lock_catalogos = threading.Lock()
+
+
+def obter_catalogo(estado):
+    catalogo = _catalogos.get(estado.versao)
+    if catalogo is None:
+        with _lock_catalogos:
+            catalogo = _catalogos.get(estado.versao)
+            if catalogo is None:
+                catalogo = _catalogos[estado.versao] = CatalogoPipeline(estado)
+    return catalogo
+
+
+ao_recarregar(lambda estado: _catalogos.clear())
+
+
+# === Geradores ===
+
+@dataclasses.dataclass
+class Contexto:
+    estado: object
+    catalogo: CatalogoPipeline
+    dados_dicts: list
+    entradas: np.ndarray
+    k: int
+
+
+def pesos_similaridade(scores):
+    """Cosseno em [-1, 1] -> peso do voto em [0, 1] (preserva a ordem dos vizinhos)"""
+    return (1 + np.asarray(scores, dtype=np.float32)) / 2
+
+
+def votos_vizinhos(estado, catalogo, idx_tops, scores_tops):
+    """(entradas, desafios): soma dos pesos dos vizinhos que receberam cada desafio"""
+    return agregar_votos(estado.indice_recomendados, idx_tops, pesos_similaridade(scores_tops),
+                         catalogo.posicao, len(catalogo.ids))
+
+
+def gerar_vizinhos(contexto):
+    idx_tops, scores_tops = contexto.estado.indice_vizinhos.buscar(contexto.entradas, contexto.k)
+    votos = votos_vizinhos(contexto.estado, contexto.catalogo, idx_tops, scores_tops)
+    # Normalizado pelo peso total dos vizinhos: 1 = todos os vizinhos receberam o desafio
+    total = np.where(idx_tops >= 0, pesos_similaridade(scores_tops), 0).sum(axis=1, keepdims=True)
+    return np.minimum(votos / np.maximum(total, 1e-12), 1)
+
+
+def gerar_tipo_hexad(contexto):
+    catalogo = contexto.catalogo
+    afinidade = np.array([
+        [3.5 if d.get(campo) is None else d[campo] for campo in hexad_colunas.values()]
+        for d in contexto.dados_dicts
+    ], dtype=np.float32) / 7
+    # Apenas os TIPOS_POR_USUARIO tipos de maior score de cada usuário
+    principais = top_k_indices(afinidade, TIPOS_POR_USUARIO)
+    mascara = np.zeros_like(afinidade, dtype=bool)
+    np.put_along_axis(mascara, principais, True, axis=1)
+    return np.clip(np.where(mascara, afinidade, 0) @ catalogo.matriz_tipos, 0, 1)
+
+
+def gerar_popularidade(contexto):
+    return np.broadcast_to(contexto.catalogo.popularidade, (len(contexto.dados_dicts), len(contexto.catalogo.ids)))
+
+
+geradores = {
+    'vizinhos': gerar_vizinhos,
+    'tipo_hexad': gerar_tipo_hexad,
+    'popularidade': gerar_popularidade,
+}
+
+
+# === Execução ===
+
+@dataclasses.dataclass
+class ResultadoPipeline:
+    desafios: list
+    scores: list
+    etapas: dict
+    completo: bool  # nenhum estágio descartado ou acima do orçamento
+
+
+_executor = None
+_lock_executor = threading.Lock()
+
+
+def _obter_executor():
+    """Criado no primeiro uso (cada processo do pool de recomendação tem o seu)"""
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='pipeline')
+    return _executor
+
+
+def _executar_gerador(nome, contexto):
+    inicio = time.perf_counter()
+    try:
+        return geradores[nome](contexto), time.perf_counter() - inicio
+    finally:
+        duracao_etapas.observar(time.perf_counter() - inicio, etapa=f'pipeline_{nome}')
+
+
+def _orcamento(nome):
+    orcamento = ORCAMENTOS_MS.get(nome, 0)
+    return orcamento / 1000 if orcamento > 0 else None
+
+
+def _melhores_posicoes(linha, n):
+    """Posições dos ``n`` maiores scores finitos (empate: menor posição), por seleção parcial"""
+    if len(linha) > n:
+        # n-ésimo maior score; todos os empatados com ele entram na ordenação
+        limite = np.partition(linha, len(linha) - n)[len(linha) - n]
+        candidatas = np.flatnonzero((linha >= limite) & np.isfinite(linha))
+    else:
+        candidatas = np.flatnonzero(np.isfinite(linha))
+    # Ordenação estável: empates resolvidos pela posição (ids em ordem crescente)
+    return candidatas[np.argsort(-linha[candidatas], kind='stable')[:n]]
+
+
+def selecionar(catalogo, scores, n=TOP_N):
+    """Top ``n`` (ids, scores) de cada linha, em ordem de score (empate: menor id); ``-inf`` = não candidato.
+
+    Linhas com menos de MINIMO_DESAFIOS candidatos são completadas pelos desafios mais populares.
+    """
+    desafios, scores_selecionados = [], []
+    for linha in scores:
+        posicoes = _melhores_posicoes(linha, n)
+        if len(posicoes) < MINIMO_DESAFIOS:
+            # Poucos candidatos: completa com os mais populares ainda não escolhidos
+            escolhidos = set(posicoes.tolist())
+            extras = [p for p in catalogo.ordem_popularidade[:MINIMO_DESAFIOS + len(posicoes)].tolist()
+                      if p not in escolhidos]
+            posicoes = np.concatenate([posicoes, extras[:MINIMO_DESAFIOS - len(posicoes)]]).astype(np.intp)
+        desafios.append(catalogo.ids[posicoes].tolist())
+        scores_selecionados.append([round(float(s), 4) if np.isfinite(s) else 0.0 for s in linha[posicoes]])
+    return desafios, scores_selecionados
+
+
+def ranquear(catalogo, matrizes, n=TOP_N):
+    """Top ``n`` (ids, scores) de cada entrada pela soma ponderada dos scores dos geradores"""
+    total = None
+    candidatos = None
+    for nome, matriz in matrizes.items():
+        ponderada = PESOS.get(nome, 1.0) * np.asarray(matriz, dtype=np.float32)
+        total = ponderada if total is None else total + ponderada
+        candidatos = matriz > 0 if candidatos is None else candidatos | (matriz > 0)
+    return selecionar(catalogo, np.where(candidatos, total, -np.inf), n)
+
+
+def executar(estado, dados_dicts, entradas, k, n=TOP_N):
+    """Roda os geradores (cada um dentro do seu orçamento) e ranqueia os candidatos"""
+    catalogo = obter_catalogo(estado)
+    contexto = Contexto(estado, catalogo, dados_dicts, entradas, k)
+
+    inicio = time.perf_counter()
+    em_pool = [nome for nome in GERADORES if nome in GERADORES_EM_POOL]
+    futuros = {}
+    if em_pool:
+        executor = _obter_executor()
+        futuros = {nome: executor.submit(_executar_gerador, nome, contexto) for nome in em_pool}
+    etapas, matrizes = {}, {}
+    completo = True
+
+    # Geradores baratos na thread da requisição, enquanto o pool calcula os demais
+    for nome in GERADORES:
+        if nome in futuros:
+            continue
+        try:
+            matrizes[nome], duracao = _executar_gerador(nome, contexto)
+        except Exception as e:
+            logger.error(f"Erro no gerador {nome}: {str(e)}")
+            etapas[nome] = {'ms': round((time.perf_counter() - inicio) * 1000, 3), 'status': 'erro'}
+            completo = False
+            continue
+        orcamento = _orcamento(nome)
+        estourou = orcamento is not None and duracao > orcamento
+        etapas[nome] = {'ms': round(duracao * 1000, 3), 'status': 'estourou' if estourou else 'ok'}
+        if estourou:
+            estouros_pipeline.inc(etapa=nome)
+            completo = False
+
+    # Em ordem de prazo: ao esperar um gerador, os prazos anteriores já passaram
+    for nome in sorted(futuros, key=lambda nome: _orcamento(nome) or float('inf')):
+        orcamento = _orcamento(nome)
+        restante = None if orcamento is None else max(0.0, inicio + orcamento - time.perf_counter())
+        try:
+            matrizes[nome], duracao = futuros[nome].result(timeout=restante)
+            etapas[nome] = {'ms': round(duracao * 1000, 3), 'status': 'ok'}
+        except concurrent.futures.TimeoutError:
+            futuros[nome].cancel()  # não interrompe um gerador já em execução; o resultado é ignorado
+            etapas[nome] = {'ms': round((time.perf_counter() - inicio) * 1000, 3), 'status': 'estourou'}
+            estouros_pipeline.inc(etapa=nome)
+            completo = False
+        except Exception as e:
+            logger.error(f"Erro no gerador {nome}: {str(e)}")
+            etapas[nome] = {'ms': round((time.perf_counter() - inicio) * 1000, 3), 'status': 'erro'}
+            completo = False
+
+    inicio_ranking = time.perf_counter()
+    if not matrizes:  # nenhum gerador dentro do orçamento: apenas os mais populares
+        matrizes = {'popularidade': gerar_popularidade(contexto)}
+    desafios, scores = ranquear(catalogo, matrizes, n)
+    duracao = time.perf_counter() - inicio_ranking
+    duracao_etapas.observar(duracao, etapa='pipeline_ranking')
+    orcamento = _orcamento('ranking')
+    estourou = orcamento is not None and duracao > orcamento
+    etapas['ranking'] = {'ms': round(duracao * 1000, 3), 'status': 'estourou' if estourou else 'ok'}
+    if estourou:
+        estouros_pipeline.inc(etapa='ranking')
+
+    return ResultadoPipeline(desafios, scores, etapas, completo and not estourou)
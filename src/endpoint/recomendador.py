@@ -1,221 +1,388 @@
-import pandas as pd
+import numpy as np
+import os
 import datetime
-import random
 import hashlib
-import json
-import ast
+import threading
 from pathlib import Path
 from fastapi import HTTPException
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics.pairwise import cosine_similarity
 from src.endpoint.formulario import UsuarioInput, AvaliacaoInput
-import logging
-
-# === Caminhos ===
-base_dir = Path(__file__).resolve().parents[2]
-dados_path = base_dir / 'src' / 'dataframe' / 'recommendation_dataset.csv'
-challenges_path = base_dir / 'src' / 'dataframe' / 'challenges.json'
-
-# Carregar dados de recomendação
-dados = pd.read_csv(dados_path)
-
-# Carregar desafios
-with open(challenges_path, 'r', encoding='utf-8') as f:
-    challenges_list = json.load(f)
-
-# Converter lista de desafios para dicionário por ID
-challenges_data = {}
-for challenge in challenges_list:
-    challenges_data[challenge['challenge_id']] = challenge
-
-# Preparar dados para similaridade
-colunas_features = [
-    'age', 'training_days', 'training_time',
-    'Philanthropist', 'Socialiser', 'Free Spirit',
-    'Achiever', 'Player', 'Disruptor'
+from src.endpoint.modelo import ao_recarregar, base_dir, obter_estado
+from src.endpoint.cache import criar_cache_recomendacoes
+from src.endpoint.modelo_softmax import descartar_motor_softmax, obter_motor_softmax
+from src.endpoint import pipeline
+from src.endpoint.two_tower import descartar_motor_two_tower, obter_motor_two_tower
+from src.endpoint.registro import AcompanhamentoRegistros, IndiceUltimoRegistro, criar_escritor
+from src.endpoint.observabilidade import cronometrar, obter_logger, registro_metricas, total_recomendacoes
+
+logger = obter_logger(__name__)
+
+# Quantidade de usuários similares considerados na recomendação
+TOP_K_VIZINHOS = int(os.getenv('SQUAD_TOP_K_VIZINHOS', '3'))
+
+# Motores de recomendação: 'pipeline' (geradores de candidatos + ranking, ver pipeline.py),
+# 'conteudo' (apenas usuários similares), 'two_tower' (modelo exportado do notebook)
+# ou 'colaborativo' (ALS implícito, ver filtragem_colaborativa.py)
+MOTORES = ('pipeline', 'conteudo', 'two_tower', 'colaborativo')
+MOTOR_PADRAO = os.getenv('SQUAD_MOTOR', 'conteudo')
+TOP_DESAFIOS = 5
+
+# Pré-filtro dos candidatos pelos N tipos HEXAD mais prováveis segundo o modelo softmax (0 desativa)
+FILTRO_TIPOS = int(os.getenv('SQUAD_FILTRO_TIPOS', '0'))
+
+# === Registros (gravados em segundo plano, em lotes) ===
+campos_recomendacao = [
+    'id', 'Data_Hora', 'usuario', 'age', 'body_type', 'fitness_goal',
+    'experience_level', 'Recomendacao_Desafios', 'Numero_Desafios'
+]
+campos_avaliacao = [
+    'id', 'Data_Hora_Avaliacao', 'usuario', 'Recomendacao_Desafios',
+    'success', 'streak', 'progress_pct', 'rating', 'time'
 ]
+registros_dir = Path(os.getenv('SQUAD_REGISTROS_DIR', base_dir))
+registro_recomendacoes = criar_escritor(registros_dir / "registro_recomendacoes.csv", campos_recomendacao)
+registro_avaliacoes = criar_escritor(registros_dir / "avaliacoes.csv", campos_avaliacao)
+
+# Última recomendação de cada usuário (id_hash), usada pelo avaliar; lido do disco no primeiro uso
+ultimas_recomendacoes = IndiceUltimoRegistro(registro_recomendacoes)
 
-# Normalizar dados numéricos
-scaler = StandardScaler()
-dados[['age', 'training_days', 'training_time']] = scaler.fit_transform(
-    dados[['age', 'training_days', 'training_time']]
-)
+# Com vários workers, a recomendação pode ter sido feita em outro processo e ainda estar na fila
+# do escritor dele (gravada em até SQUAD_LOG_INTERVALO_FLUSH s): o avaliar espera por ela
+_varios_workers = int(os.getenv('SQUAD_WORKERS', '1')) > 1
+ESPERA_RECOMENDACAO = float(os.getenv(
+    'SQUAD_AVALIAR_ESPERA', str(registro_recomendacoes.intervalo_flush + 0.25 if _varios_workers else 0)))
 
-# Codificar variáveis categóricas
-label_encoders = {}
-categorical_cols = ['body_type', 'fitness_goal', 'experience_level']
+# Histórico, interações e coocorrência são derivados de avaliacoes.csv: cada processo aplica,
+# na ordem do log, as avaliações gravadas por qualquer worker (a cada SQUAD_AVALIACOES_INTERVALO s),
+# então todos convergem para o mesmo estado; as do próprio /avaliar são aplicadas na hora
+avaliacoes_gravadas = AcompanhamentoRegistros(
+    registro_avaliacoes, intervalo=float(os.getenv('SQUAD_AVALIACOES_INTERVALO', '1.0')))
 
-for col in categorical_cols:
-    label_encoders[col] = LabelEncoder()
-    dados[f'{col}_encoded'] = label_encoders[col].fit_transform(dados[col])
+# Médias das avaliações anteriores de cada usuário (features de histórico dos modelos neurais)
+historico_path = Path(os.getenv('SQUAD_HISTORICO_PATH', registros_dir / "historico_usuarios.npz"))
 
-# Adicionar colunas codificadas às features
-colunas_features.extend([f'{col}_encoded' for col in categorical_cols])
+# Histórico, interações (ALS) e coocorrência usam pandas/scipy: são importados e criados no
+# primeiro uso, para que importar o recomendador (e cada processo do executor) continue rápido
+_historico_usuarios = None
+_interacoes_usuarios = None
+_lock_derivados = threading.Lock()
 
-X = dados[colunas_features]
+def obter_historico_usuarios():
+    global _historico_usuarios
+    if _historico_usuarios is None:
+        with _lock_derivados:
+            if _historico_usuarios is None:
+                from src.endpoint.historico_usuarios import criar_historico
+                _historico_usuarios = criar_historico(historico_path, avaliacoes_gravadas)
+    return _historico_usuarios
+
+def obter_interacoes_usuarios():
+    """Desafios avaliados por usuário (fold-in do motor colaborativo)"""
+    global _interacoes_usuarios
+    if _interacoes_usuarios is None:
+        with _lock_derivados:
+            if _interacoes_usuarios is None:
+                from src.endpoint.filtragem_colaborativa import InteracoesUsuarios
+                _interacoes_usuarios = InteracoesUsuarios(avaliacoes_gravadas)
+    return _interacoes_usuarios
+
+def fechar_historico_usuarios():
+    if _historico_usuarios is not None:
+        _historico_usuarios.fechar()
+
+def obter_indice_coocorrencia(estado):
+    from src.endpoint.coocorrencia import obter_indice_coocorrencia
+    return obter_indice_coocorrencia(estado, avaliacoes_gravadas)
+
+# Desafios recomendados por perfil codificado (LRU + TTL), invalidado a cada recarga do modelo
+cache_recomendacoes = criar_cache_recomendacoes()
+ao_recarregar(lambda estado: cache_recomendacoes.limpar())
+ao_recarregar(descartar_motor_two_tower)
+ao_recarregar(descartar_motor_softmax)
+
+@registro_metricas.coletor
+def _metricas_recomendador():
+    cache = cache_recomendacoes.estatisticas
+    escritores = {'recomendacoes': registro_recomendacoes, 'avaliacoes': registro_avaliacoes}
+    estatisticas = {nome: escritor.estatisticas for nome, escritor in escritores.items()}
+    return [
+        ('squad_cache_consultas_total', 'counter', 'Consultas ao cache de recomendações',
+         [({'resultado': 'hit'}, cache['hits']), ({'resultado': 'miss'}, cache['misses'])]),
+        ('squad_cache_despejos_total', 'counter', 'Entradas removidas do cache',
+         [({'motivo': 'lru'}, cache['despejos']), ({'motivo': 'ttl'}, cache['expirados'])]),
+        ('squad_cache_entradas', 'gauge', 'Entradas no cache de recomendações', [({}, cache['tamanho'])]),
+        ('squad_registros_total', 'counter', 'Registros tratados pelos escritores de log',
+         [({'arquivo': nome, 'situacao': situacao}, e[situacao])
+          for nome, e in estatisticas.items() for situacao in ('gravados', 'descartados', 'bloqueados')]),
+        ('squad_registros_pendentes', 'gauge', 'Registros na fila aguardando gravação',
+         [({'arquivo': nome}, e['pendentes']) for nome, e in estatisticas.items()]),
+    ]
 
 def gerar_id(usuario: str, senha: str) -> str:
     return hashlib.sha256((usuario + senha).encode('utf-8')).hexdigest()
 
-def get_challenge_details(challenge_ids):
-    """Retorna detalhes dos desafios baseado nos IDs"""
-    challenges = []
-    for challenge_id in challenge_ids:
-        if challenge_id in challenges_data:
-            challenge = challenges_data[challenge_id]
-            challenges.append({
-                'id': challenge_id,
-                'name': f"Desafio {challenge_id}",
-                'description': challenge['description'],
-                'hexad_type': challenge['type'],
-                'difficulty': f"{challenge['duration']} dias, {challenge['target_sessions']} sessões"
-            })
-    return challenges
+def get_challenge_details(challenge_ids, estado=None):
+    """Retorna detalhes dos desafios baseado nos IDs (dicts pré-montados do catálogo; não alterar)"""
+    detalhes = (estado or obter_estado()).detalhes_desafios
+    return [detalhes[challenge_id] for challenge_id in challenge_ids if challenge_id in detalhes]
+
+def coletar_desafios(estado, idx_tops, scores_tops, n=TOP_DESAFIOS):
+    """Desafios recomendados aos usuários similares, com votos ponderados pela similaridade.
+
+    Para cada entrada: (ids, scores) em ordem decrescente de score (empate: menor id),
+    completados pelos desafios mais populares se houver menos de 3.
+    """
+    catalogo = pipeline.obter_catalogo(estado)
+    votos = pipeline.votos_vizinhos(estado, catalogo, idx_tops, scores_tops)
+    desafios, scores = pipeline.selecionar(catalogo, np.where(votos > 0, votos, -np.inf), n)
+    logger.debug("Desafios coletados: %s; scores: %s", desafios, scores)
+    return desafios, scores
+
+def montar_registro(id_hash, dados_dict, desafios_unicos):
+    return {
+        'id': id_hash,
+        'Data_Hora': datetime.datetime.now().isoformat(),
+        'usuario': dados_dict['usuario'],
+        'age': dados_dict.get('age'),
+        'body_type': dados_dict.get('body_type'),
+        'fitness_goal': dados_dict.get('goal'),
+        'experience_level': dados_dict.get('experience_level'),
+        'Recomendacao_Desafios': desafios_unicos,
+        'Numero_Desafios': len(desafios_unicos)
+    }
+
+def salvar_registros(registros):
+    """Enfileira os registros de recomendação e atualiza o índice da última recomendação"""
+    for registro in registros:
+        ultimas_recomendacoes.atualizar(registro)
+    registro_recomendacoes.registrar_lote(registros)
+
+def _desafios_conteudo(estado, dados_dicts, k):
+    """Desafios e scores dos k usuários mais similares de cada entrada (um único produto matriz-matriz)"""
+    entradas = estado.preparar_entradas(dados_dicts)
+
+    # Perfis já vistos (mesmo vetor codificado) reaproveitam os desafios calculados
+    with cronometrar('cache'):
+        chaves = [cache_recomendacoes.chave(vetor, k, estado.versao) for vetor in entradas]
+        desafios_por_entrada = [
+            cache_recomendacoes.obter(chave) if cache_recomendacoes.ativo else None for chave in chaves
+        ]
+    faltantes = [i for i, desafios in enumerate(desafios_por_entrada) if desafios is None]
+    total_recomendacoes.inc(len(dados_dicts) - len(faltantes), origem='cache')
+    total_recomendacoes.inc(len(faltantes), origem='calculo')
+
+    if faltantes:
+        # Buscar os top k usuários similares (cosseno = produto interno entre vetores normalizados)
+        with cronometrar('similaridade'):
+            idx_tops, scores_tops = estado.indice_vizinhos.buscar(entradas[faltantes], k)
+
+        with cronometrar('coleta_desafios'):
+            for i, desafios, scores in zip(faltantes, *coletar_desafios(estado, idx_tops, scores_tops)):
+                desafios_por_entrada[i] = (desafios, dict(zip(desafios, scores)))
+                cache_recomendacoes.guardar(chaves[i], desafios_por_entrada[i])
+
+    return [desafios for desafios, _ in desafios_por_entrada], [scores for _, scores in desafios_por_entrada]
+
+def _desafios_pipeline(estado, dados_dicts, k):
+    """Desafios e scores do pipeline em estágios e, por entrada, a duração/situação de cada estágio"""
+    entradas = estado.preparar_entradas(dados_dicts)
+
+    with cronometrar('cache'):
+        chaves = [('pipeline',) + cache_recomendacoes.chave(vetor, k, estado.versao) for vetor in entradas]
+        desafios_por_entrada = [
+            cache_recomendacoes.obter(chave) if cache_recomendacoes.ativo else None for chave in chaves
+        ]
+    faltantes = [i for i, desafios in enumerate(desafios_por_entrada) if desafios is None]
+    total_recomendacoes.inc(len(dados_dicts) - len(faltantes), origem='cache')
+    total_recomendacoes.inc(len(faltantes), origem='pipeline')
+    etapas_por_entrada = [{'cache': {'status': 'ok'}}] * len(dados_dicts)
+
+    if faltantes:
+        resultado = pipeline.executar(estado, [dados_dicts[i] for i in faltantes], entradas[faltantes], k,
+                                      TOP_DESAFIOS)
+        for i, desafios, scores in zip(faltantes, resultado.desafios, resultado.scores):
+            desafios_por_entrada[i] = (desafios, dict(zip(desafios, scores)))
+            etapas_por_entrada[i] = resultado.etapas
+            # Resultados degradados (estágio descartado) não são reaproveitados
+            if resultado.completo:
+                cache_recomendacoes.guardar(chaves[i], desafios_por_entrada[i])
 
-def recomendar(usuario_input):
+    return ([desafios for desafios, _ in desafios_por_entrada], [scores for _, scores in desafios_por_entrada],
+            etapas_por_entrada)
+
+def _desafios_two_tower(estado, dados_dicts, ids_hash):
+    """Top desafios do modelo two-tower, usando o histórico de avaliações de cada usuário"""
     try:
-        dados_dict = usuario_input.dict()
-        usuario = dados_dict['usuario']
-        senha = dados_dict['senha']
-
-        id_hash = gerar_id(usuario, senha)
-        
-        # Preparar dados do usuário para similaridade
-        entrada_df = pd.DataFrame([dados_dict])
-        
-        # Normalizar dados numéricos
-        entrada_df[['age', 'training_days', 'training_time']] = scaler.transform(
-            entrada_df[['age', 'training_days', 'training_time']]
-        )
-        
-        # Mapear scores HEXAD para os nomes corretos do dataset
-        entrada_df['Philanthropist'] = dados_dict.get('score_philanthropist', 3.5)
-        entrada_df['Socialiser'] = dados_dict.get('score_socialiser', 3.5)
-        entrada_df['Free Spirit'] = dados_dict.get('score_free_spirit', 3.5)
-        entrada_df['Achiever'] = dados_dict.get('score_achiever', 3.5)
-        entrada_df['Player'] = dados_dict.get('score_player', 3.5)
-        entrada_df['Disruptor'] = dados_dict.get('score_disruptor', 3.5)
-        
-        # Mapear dados categóricos para os valores do dataset
-        # Mapeamento de goal para fitness_goal
-        goal_mapping = {
-            'Emagrecimento': 'Emagrecimento',
-            'Hipertrofia': 'Hipertrofia', 
-            'Força': 'Força'
-        }
-        entrada_df['fitness_goal'] = goal_mapping.get(dados_dict.get('goal', 'Emagrecimento'), 'Emagrecimento')
-        
-        # Mapeamento de experience_level
-        level_mapping = {
-            'Iniciante': 'Iniciante',
-            'Intermediário': 'Intermediário',
-            'Avançado': 'Avançado'
-        }
-        entrada_df['experience_level'] = level_mapping.get(dados_dict.get('experience_level', 'Iniciante'), 'Iniciante')
-        
-        # Mapeamento de body_type
-        body_mapping = {
-            'Masculino': 'Masculino',
-            'Feminino': 'Feminino'
-        }
-        entrada_df['body_type'] = body_mapping.get(dados_dict.get('body_type', 'Masculino'), 'Masculino')
-        
-        # Codificar dados categóricos
-        for col in categorical_cols:
-            entrada_df[f'{col}_encoded'] = label_encoders[col].transform(entrada_df[col])
-        
-        entrada_features = entrada_df[colunas_features]
-
-        # Calcular similaridade
-        scores_sim = cosine_similarity(X, entrada_features).flatten()
-        idx_top = scores_sim.argsort()[-3:][::-1]  # Top 3 usuários similares
-        
-        print(f"DEBUG: Top 3 índices similares: {idx_top}")
-        print(f"DEBUG: Scores de similaridade: {scores_sim[idx_top]}")
-        
-        # Pegar desafios recomendados dos usuários similares
-        desafios_recomendados = []
-        for idx in idx_top:
-            user_challenges = dados.iloc[idx]['recommended_challenges']
-            print(f"DEBUG: Usuário {idx} - desafios: {user_challenges}")
-            if pd.notna(user_challenges) and user_challenges:
-                # Converter string de lista para lista real usando ast.literal_eval
-                if isinstance(user_challenges, str):
-                    try:
-                        challenges_list = ast.literal_eval(user_challenges)
-                        print(f"DEBUG: Lista convertida: {challenges_list}")
-                        if isinstance(challenges_list, list):
-                            desafios_recomendados.extend(challenges_list)
-                    except Exception as e:
-                        print(f"DEBUG: Erro ao converter: {e}")
-                        continue
-                else:
-                    desafios_recomendados.extend(user_challenges)
-        
-        print(f"DEBUG: Desafios coletados: {desafios_recomendados}")
-        
-        # Remover duplicatas e pegar top 5
-        desafios_unicos = list(set(desafios_recomendados))[:5]
-        print(f"DEBUG: Desafios únicos: {desafios_unicos}")
-        
-        # Se não houver desafios suficientes, adicionar alguns aleatórios
-        if len(desafios_unicos) < 3:
-            all_challenge_ids = list(challenges_data.keys())
-            desafios_aleatorios = random.sample(all_challenge_ids, 3 - len(desafios_unicos))
-            desafios_unicos.extend(desafios_aleatorios)
-            print(f"DEBUG: Adicionados desafios aleatórios: {desafios_aleatorios}")
-        
-        # Obter detalhes dos desafios
-        desafios_detalhados = get_challenge_details(desafios_unicos)
-        print(f"DEBUG: Desafios detalhados: {len(desafios_detalhados)}")
-        
-        registro = {
-            'id': id_hash,
-            'Data_Hora': datetime.datetime.now().isoformat(),
-            'usuario': usuario,
-            'age': dados_dict.get('age'),
-            'body_type': dados_dict.get('body_type'),
-            'fitness_goal': dados_dict.get('goal'),
-            'experience_level': dados_dict.get('experience_level'),
-            'Recomendacao_Desafios': desafios_unicos,
-            'Numero_Desafios': len(desafios_unicos)
-        }
+        motor = obter_motor_two_tower(estado.challenges_data.keys())
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Modelo two-tower não exportado; use o motor 'conteudo'.")
+    historicos = [obter_historico_usuarios().obter(id_hash) for id_hash in ids_hash]
+    total_recomendacoes.inc(len(dados_dicts), origem='two_tower')
+    return motor.recomendar(dados_dicts, historicos, TOP_DESAFIOS)
+
+def _desafios_colaborativo(estado, dados_dicts, ids_hash, k):
+    """Top desafios do ALS; usuários sem avaliações usam os desafios concluídos pelos k mais similares"""
+    from src.endpoint.filtragem_colaborativa import obter_motor_colaborativo
+    try:
+        motor = obter_motor_colaborativo()
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Modelo ALS não treinado (python -m src.endpoint.filtragem_colaborativa "
+                                                    "treinar); use o motor 'conteudo'.")
+    interacoes = [obter_interacoes_usuarios().obter(id_hash) for id_hash in ids_hash]
+    # Só os desafios avaliados pelo próprio usuário saem da recomendação
+    vistos = [list(interacao) for interacao in interacoes]
+    sem_avaliacoes = [i for i, interacao in enumerate(interacoes) if not interacao]
+    if sem_avaliacoes:
+        entradas = estado.preparar_entradas([dados_dicts[i] for i in sem_avaliacoes])
+        idx_tops, _ = estado.indice_vizinhos.buscar(entradas, k)
+        for i, idx_top in zip(sem_avaliacoes, idx_tops):
+            desafios, contagens = np.unique(estado.indice_concluidos.coletar(idx_top[idx_top >= 0]), return_counts=True)
+            interacoes[i] = dict(zip(desafios.tolist(), (contagens / len(idx_top)).tolist()))
+    total_recomendacoes.inc(len(dados_dicts), origem='colaborativo')
+    return motor.recomendar(interacoes, TOP_DESAFIOS, vistos)
 
-        # Salvar registro
-        csv_path = base_dir / "registro_recomendacoes.csv"
-        df_saida = pd.DataFrame([registro])
-        if csv_path.exists():
-            df_saida.to_csv(csv_path, mode='a', header=False, index=False)
+def _filtrar_por_tipo(estado, dados_dicts, ids_hash, desafios_por_entrada):
+    """Mantém os desafios dos tipos mais prováveis, completando com os desafios desses tipos de maior
+    probabilidade segundo o modelo (empate pelo menor id)"""
+    try:
+        modelo = obter_motor_softmax(estado.challenges_data)
+    except FileNotFoundError:
+        logger.warning("SQUAD_FILTRO_TIPOS ativo sem o modelo softmax exportado; filtro ignorado.")
+        return desafios_por_entrada
+    historicos = [obter_historico_usuarios().obter(id_hash) for id_hash in ids_hash]
+    tipos_por_entrada, scores_por_entrada = modelo.tipos_previstos(dados_dicts, historicos, FILTRO_TIPOS)
+    filtrados = []
+    for tipos, scores, desafios in zip(tipos_por_entrada, scores_por_entrada, desafios_por_entrada):
+        permitidos = {cid for tipo in tipos for cid in modelo.ids_por_tipo.get(tipo, ())}
+        mantidos = [cid for cid in desafios if cid in permitidos]
+        # Desafios fora do modelo exportado vêm por último
+        def chave(cid):
+            posicao = modelo.posicao_itens.get(cid)
+            return (-float(scores[posicao]) if posicao is not None else float('inf'), cid)
+        restantes = sorted(permitidos.difference(mantidos), key=chave)
+        mantidos.extend(restantes[:max(0, len(desafios) - len(mantidos))])
+        filtrados.append(mantidos)
+    return filtrados
+
+def _recomendar_entradas(dados_dicts, k, motor=None):
+    """Calcula as recomendações de várias entradas de uma vez com o motor escolhido"""
+    motor = motor or MOTOR_PADRAO
+    if motor not in MOTORES:
+        raise HTTPException(status_code=400, detail=f"Motor inválido: {motor}. Use um de {', '.join(MOTORES)}.")
+    estado = obter_estado()
+    ids_hash = [gerar_id(dados_dict['usuario'], dados_dict['senha']) for dados_dict in dados_dicts]
+
+    # Scores (desafio -> score) e etapas só existem nos motores que os calculam
+    scores_por_entrada = etapas_por_entrada = [None] * len(dados_dicts)
+    with cronometrar(f'motor_{motor}'):
+        if motor == 'pipeline':
+            desafios_por_entrada, scores_por_entrada, etapas_por_entrada = _desafios_pipeline(estado, dados_dicts, k)
+        elif motor == 'two_tower':
+            desafios_por_entrada = _desafios_two_tower(estado, dados_dicts, ids_hash)
+        elif motor == 'colaborativo':
+            desafios_por_entrada = _desafios_colaborativo(estado, dados_dicts, ids_hash, k)
         else:
-            df_saida.to_csv(csv_path, index=False)
+            desafios_por_entrada, scores_por_entrada = _desafios_conteudo(estado, dados_dicts, k)
+    if FILTRO_TIPOS > 0:
+        with cronometrar('filtro_tipos'):
+            desafios_por_entrada = _filtrar_por_tipo(estado, dados_dicts, ids_hash, desafios_por_entrada)
+
+    resultados = []
+    registros = []
+    with cronometrar('catalogo'):
+        for id_hash, dados_dict, desafios_unicos, scores, etapas in zip(
+                ids_hash, dados_dicts, desafios_por_entrada, scores_por_entrada, etapas_por_entrada):
+            # Obter detalhes dos desafios
+            desafios_detalhados = get_challenge_details(desafios_unicos, estado)
+
+            registros.append(montar_registro(id_hash, dados_dict, desafios_unicos))
+            resultados.append({
+                "id": id_hash, 
+                "desafios": desafios_detalhados,
+                "total_desafios": len(desafios_detalhados),
+                "versao_modelo": estado.versao,
+                "motor": motor
+            })
+            if scores is not None:
+                # Desafios incluídos pelo filtro de tipos não têm score do motor
+                resultados[-1]["scores"] = [scores.get(desafio['id'], 0.0) for desafio in desafios_detalhados]
+            if etapas is not None:
+                resultados[-1]["etapas"] = etapas
+
+    # Salvar registros
+    with cronometrar('registro'):
+        salvar_registros(registros)
 
+    return resultados
+
+def recomendar(usuario_input, k=TOP_K_VIZINHOS, motor=None):
+    try:
+        return _recomendar_entradas([usuario_input.dict()], k, motor)[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro na recomendação: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+def recomendar_lote(usuarios_input, k=TOP_K_VIZINHOS, motor=None):
+    """Recomenda desafios para vários usuários de uma vez, gravando o registro uma única vez"""
+    if not usuarios_input:
+        return {"resultados": [], "total_usuarios": 0}
+    try:
+        resultados = _recomendar_entradas([u.dict() for u in usuarios_input], k, motor)
         return {
-            "id": id_hash, 
-            "desafios": desafios_detalhados,
-            "total_desafios": len(desafios_detalhados)
+            "resultados": resultados,
+            "total_usuarios": len(resultados),
+            "versao_modelo": resultados[0]["versao_modelo"]
         }
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Erro na recomendação: {str(e)}")
+        logger.error(f"Erro na recomendação em lote: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
+def _resultado_similares(challenge_id, similares, estado):
+    return {
+        "id": challenge_id,
+        "desafios": get_challenge_details([similar for similar, _ in similares], estado),
+        "coocorrencias": [contagem for _, contagem in similares],
+        "total_desafios": len(similares),
+        "versao_modelo": estado.versao,
+    }
+
+def desafios_similares(challenge_id, n=None):
+    """Desafios que mais aparecem junto com ``challenge_id`` (índice de coocorrência pré-ordenado)"""
+    estado = obter_estado()
+    similares = obter_indice_coocorrencia(estado).similares(challenge_id, n)
+    avaliacoes_gravadas.iniciar()
+    if similares is None:
+        raise HTTPException(status_code=404, detail="Desafio não encontrado.")
+    return _resultado_similares(challenge_id, similares, estado)
+
+def desafios_similares_lote(challenge_ids, n=None):
+    """``desafios_similares`` de vários desafios numa consulta; ids fora do catálogo são omitidos"""
+    estado = obter_estado()
+    indice = obter_indice_coocorrencia(estado)
+    avaliacoes_gravadas.iniciar()
+    resultados = []
+    for challenge_id in challenge_ids:
+        similares = indice.similares(challenge_id, n)
+        if similares is not None:
+            resultados.append(_resultado_similares(challenge_id, similares, estado))
+    return {"resultados": resultados, "total": len(resultados)}
+
 def avaliar(avaliacao_input: AvaliacaoInput):
     dados_dict = avaliacao_input.dict()
     usuario = dados_dict['usuario']
     senha = dados_dict['senha']
     id_hash = gerar_id(usuario, senha)
 
-    rec_csv = base_dir / "registro_recomendacoes.csv"
-    if not rec_csv.exists():
-        raise HTTPException(status_code=404, detail="Nenhuma recomendação registrada ainda.")
-
-    df_rec = pd.read_csv(rec_csv)
-    df_user = df_rec[df_rec['id'] == id_hash]
-    if df_user.empty:
+    with cronometrar('busca_recomendacao'):
+        ultima = ultimas_recomendacoes.obter(id_hash, espera=ESPERA_RECOMENDACAO)
+    if ultima is None:
+        if len(ultimas_recomendacoes) == 0:
+            raise HTTPException(status_code=404, detail="Nenhuma recomendação registrada ainda.")
         raise HTTPException(status_code=404, detail="Nenhuma recomendação encontrada para este usuário.")
 
-    ultima = df_user.iloc[-1].to_dict()
-
     avaliacao = {
         'id': id_hash,
         'Data_Hora_Avaliacao': datetime.datetime.now().isoformat(),
@@ -228,11 +395,12 @@ def avaliar(avaliacao_input: AvaliacaoInput):
         'time': dados_dict['time']
     }
 
-    aval_csv = base_dir / "avaliacoes.csv"
-    df_aval = pd.DataFrame([avaliacao])
-    if aval_csv.exists():
-        df_aval.to_csv(aval_csv, mode='a', header=False, index=False)
-    else:
-        df_aval.to_csv(aval_csv, index=False)
+    with cronometrar('registro_avaliacao'):
+        historico_usuarios = obter_historico_usuarios()
+        # Enfileirada no escritor e aplicada na hora ao histórico, às interações e à coocorrência
+        # deste processo; os demais workers a recebem ao lê-la do log
+        if not avaliacoes_gravadas.registrar(avaliacao):
+            raise HTTPException(status_code=503, detail="Fila de avaliações cheia; tente novamente.")
+        historico = historico_usuarios.obter(id_hash)
 
-    return {"mensagem": "Avaliação registrada com sucesso.", "id": id_hash}
\ No newline at end of file
+    return {"mensagem": "Avaliação registrada com sucesso.", "id": id_hash, "historico": historico}
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""Inferência em NumPy das redes treinadas nos notebooks (sem importar torch).
+
+Os pesos são exportados do ``state_dict`` para um ``.npz`` (mais um JSON de metadados);
+cada bloco Linear -> BatchNorm1d -> ReLU -> Dropout vira, em modo de inferência, uma
+única camada densa com a BatchNorm dobrada nos pesos.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+def dobrar_batchnorm(peso, vies, gama, beta, media, variancia, eps=1e-5):
+    """Linear (peso no formato do torch, saída x entrada) seguido de BatchNorm -> um único Linear"""
+    escala = gama / np.sqrt(variancia + eps)
+    return peso * escala[:, None], (vies - media) * escala + beta
+
+
+class CamadaDensa:
+    """``y = x @ W + b`` (W já transposto e contíguo), com ReLU opcional"""
+
+    def __init__(self, peso, vies, relu):
+        self.peso = np.ascontiguousarray(np.asarray(peso, dtype=np.float32).T)
+        self.vies = np.asarray(vies, dtype=np.float32)
+        self.relu = relu
+
+    def __call__(self, x):
+        y = x @ self.peso
+        y += self.vies
+        if self.relu:
+            np.maximum(y, 0, out=y)
+        return y
+
+
+class Rede:
+    def __init__(self, camadas):
+        self.camadas = camadas
+
+    @property
+    def dimensao_entrada(self):
+        return self.camadas[0].peso.shape[0]
+
+    @property
+    def dimensao_saida(self):
+        return self.camadas[-1].peso.shape[1]
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for camada in self.camadas:
+            x = camada(x)
+        return x
+
+
+def inferir_arquitetura(nomes, prefixo, saida='output_embedding'):
+    """Blocos ``fc{i}`` (+ ``bn{i}``) com ReLU seguidos da camada ``saida``, como nas redes dos notebooks"""
+    arquitetura = []
+    i = 1
+    while f'{prefixo}fc{i}.weight' in nomes:
+        bn = f'bn{i}' if f'{prefixo}bn{i}.weight' in nomes else None
+        arquitetura.append([f'fc{i}', bn, True])
+        i += 1
+    arquitetura.append([saida, None, False])
+    return arquitetura
+
+
+def montar_rede(pesos, prefixo, arquitetura, eps=1e-5):
+    """Cria a rede a partir do ``state_dict`` exportado; ``arquitetura`` = [[linear, batchnorm|None, relu], ...]"""
+    camadas = []
+    for linear, bn, relu in arquitetura:
+        peso = pesos[f'{prefixo}{linear}.weight'].astype(np.float64)
+        vies = pesos[f'{prefixo}{linear}.bias'].astype(np.float64)
+        if bn is not None:
+            peso, vies = dobrar_batchnorm(
+                peso, vies,
+                pesos[f'{prefixo}{bn}.weight'], pesos[f'{prefixo}{bn}.bias'],
+                pesos[f'{prefixo}{bn}.running_mean'], pesos[f'{prefixo}{bn}.running_var'], eps,
+            )
+        camadas.append(CamadaDensa(peso, vies, relu))
+    return Rede(camadas)
+
+
+def _para_numpy(valor):
+    if hasattr(valor, 'detach'):  # tensor do torch
+        valor = valor.detach().cpu().numpy()
+    return np.asarray(valor)
+
+
+def exportar_pesos(caminho, state_dict, metadados, **arrays):
+    """Grava ``state_dict`` (tensores ou arrays), arrays extras e metadados em um ``.npz``"""
+    conteudo = {nome: _para_numpy(valor) for nome, valor in state_dict.items() if not nome.endswith('num_batches_tracked')}
+    conteudo.update({f'__{nome}': _para_numpy(valor) for nome, valor in arrays.items()})
+    conteudo['__metadados'] = np.array(json.dumps(metadados, ensure_ascii=False))
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'wb') as f:
+        np.savez(f, **conteudo)
+    return caminho
+
+
+def carregar_pesos(caminho):
+    """Retorna (pesos, arrays extras, metadados) de um arquivo gravado por ``exportar_pesos``"""
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        pesos = {nome: arquivo[nome] for nome in arquivo.files if not nome.startswith('__')}
+        extras = {nome[2:]: arquivo[nome] for nome in arquivo.files if nome.startswith('__') and nome != '__metadados'}
+        metadados = json.loads(str(arquivo['__metadados']))
+    return pesos, extras, metadados
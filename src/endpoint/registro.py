@@ -0,0 +1,485 @@
+import atexit
+import csv
+import datetime
+import io
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+
+class EscritorRegistros:
+    """Grava registros CSV em segundo plano, em lotes, a partir de uma fila limitada.
+
+    - ``registrar`` apenas enfileira o registro; uma thread dedicada grava lotes de até
+      ``tamanho_lote`` registros a cada ``intervalo_flush`` segundos (ou antes, se o lote encher).
+    - Cada lote é gravado com uma única chamada ``write`` em modo append, o que evita
+      linhas intercaladas quando vários workers escrevem no mesmo arquivo.
+    - O segmento atual é rotacionado (renomeado com carimbo de data/hora) ao atingir
+      ``max_bytes`` ou ``max_segundos``.
+    - Com a fila cheia, o registro é descartado ou, se ``bloquear=True``, o chamador espera
+      até ``timeout_bloqueio`` segundos; ambos os casos são contabilizados em ``estatisticas``.
+    """
+
+    def __init__(self, caminho, campos, capacidade=10_000, tamanho_lote=500, intervalo_flush=1.0,
+                 max_bytes=64 * 1024 * 1024, max_segundos=None, bloquear=False, timeout_bloqueio=0.05):
+        self.caminho = Path(caminho)
+        self.campos = list(campos)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self.bloquear = bloquear
+        self.timeout_bloqueio = timeout_bloqueio
+
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._lock = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+        self._thread = None
+        self._parar = threading.Event()
+        self._inicio_segmento = time.time()
+
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.bloqueados = 0
+
+    # === Produtores ===
+
+    def registrar(self, registro):
+        """Enfileira um registro; retorna False se ele foi descartado.
+
+        Depois de ``fechar``, o registro é gravado de forma síncrona.
+        """
+        if self._parar.is_set():
+            with self._lock:
+                self.enfileirados += 1
+            return self._gravar([registro])
+        self._iniciar()
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            if not self.bloquear:
+                return self._descartar()
+            with self._lock:
+                self.bloqueados += 1
+            try:
+                self._fila.put(registro, timeout=self.timeout_bloqueio)
+            except queue.Full:
+                return self._descartar()
+        with self._lock:
+            self.enfileirados += 1
+        return True
+
+    def registrar_lote(self, registros):
+        return sum(self.registrar(r) for r in registros)
+
+    def gravar(self, registros):
+        """Grava os registros na hora, sem passar pela fila: outros processos podem lê-los ao retornar"""
+        registros = list(registros)
+        with self._lock:
+            self.enfileirados += len(registros)
+        return self._gravar(registros)
+
+    def _descartar(self):
+        with self._lock:
+            self.descartados += 1
+        return False
+
+    # === Consumidor ===
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._executar, name=f'escritor-{self.caminho.stem}', daemon=True
+                )
+                self._thread.start()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            lote = self._coletar_lote(time.monotonic() + self.intervalo_flush)
+            if lote:
+                self._gravar_da_fila(lote)
+        # Esvaziar o que restou na fila no encerramento
+        while True:
+            lote = self._coletar_lote(None)
+            if not lote:
+                break
+            self._gravar_da_fila(lote)
+
+    def _coletar_lote(self, prazo):
+        lote = []
+        while len(lote) < self.tamanho_lote:
+            try:
+                if prazo is None:
+                    item = self._fila.get_nowait()
+                else:
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    item = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            lote.append(item)
+        return lote
+
+    def _gravar_da_fila(self, lote):
+        try:
+            self._gravar(lote)
+        finally:
+            for _ in lote:
+                self._fila.task_done()
+
+    def _gravar(self, lote):
+        """Grava o lote; retorna False (e contabiliza o descarte) se a gravação falhar"""
+        try:
+            with self._lock_gravacao:
+                self._rotacionar_se_necessario()
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=self.campos, extrasaction='ignore', lineterminator='\n')
+                if self._criar_arquivo():
+                    writer.writeheader()
+                writer.writerows(lote)
+                with open(self.caminho, 'a', encoding='utf-8', newline='') as f:
+                    f.write(buffer.getvalue())
+            with self._lock:
+                self.gravados += len(lote)
+            return True
+        except Exception as e:
+            logging.error(f"Erro ao gravar {len(lote)} registros em {self.caminho}: {str(e)}")
+            with self._lock:
+                self.descartados += len(lote)
+            return False
+
+    def _criar_arquivo(self):
+        """Cria o segmento se ele não existir; retorna True se o cabeçalho deve ser escrito"""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)  # SQUAD_REGISTROS_DIR ainda não criado
+        try:
+            fd = os.open(self.caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        self._inicio_segmento = time.time()
+        return True
+
+    def _rotacionar_se_necessario(self):
+        if not self.caminho.exists():
+            return
+        por_tamanho = self.max_bytes is not None and self.caminho.stat().st_size >= self.max_bytes
+        por_tempo = self.max_segundos is not None and time.time() - self._inicio_segmento >= self.max_segundos
+        if not (por_tamanho or por_tempo):
+            return
+        carimbo = datetime.datetime.now().strftime('%Y%m%dT%H%M%S_%f')
+        destino = self.caminho.with_name(f'{self.caminho.stem}.{carimbo}{self.caminho.suffix}')
+        try:
+            os.replace(self.caminho, destino)
+        except FileNotFoundError:
+            pass  # outro worker rotacionou primeiro
+        self._inicio_segmento = time.time()
+
+    # === Controle ===
+
+    def flush(self, timeout=None):
+        """Aguarda até que todos os registros enfileirados tenham sido gravados"""
+        if self._thread is None:
+            return True
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+
+    def fechar(self, timeout=10.0):
+        """Interrompe a thread após gravar tudo o que estava na fila; registros posteriores são gravados na hora"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def segmentos(self):
+        """Segmentos rotacionados em ordem cronológica, seguidos do segmento atual"""
+        rotacionados = sorted(self.caminho.parent.glob(f'{self.caminho.stem}.*{self.caminho.suffix}'))
+        atual = [self.caminho] if self.caminho.exists() else []
+        return rotacionados + atual
+
+    @property
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'enfileirados': self.enfileirados,
+                'gravados': self.gravados,
+                'descartados': self.descartados,
+                'bloqueados': self.bloqueados,
+                'pendentes': self._fila.qsize(),
+            }
+
+
+def criar_escritor(caminho, campos):
+    """Cria um escritor configurado pelas variáveis SQUAD_LOG_* e o encerra junto com o processo"""
+    max_segundos = float(os.getenv('SQUAD_LOG_MAX_SEGUNDOS', '0')) or None
+    escritor = EscritorRegistros(
+        caminho,
+        campos,
+        capacidade=int(os.getenv('SQUAD_LOG_CAPACIDADE', '10000')),
+        tamanho_lote=int(os.getenv('SQUAD_LOG_TAMANHO_LOTE', '500')),
+        intervalo_flush=float(os.getenv('SQUAD_LOG_INTERVALO_FLUSH', '1.0')),
+        max_bytes=int(os.getenv('SQUAD_LOG_MAX_BYTES', str(64 * 1024 * 1024))),
+        max_segundos=max_segundos,
+        bloquear=os.getenv('SQUAD_LOG_BLOQUEAR', '0') == '1',
+    )
+    atexit.register(escritor.fechar)
+    return escritor
+
+
+def _converter_linha(linha, campos, cabecalho):
+    """Registro de uma linha CSV; linhas antigas podem ter sido anexadas com um esquema diferente do cabeçalho"""
+    if len(linha) == len(campos):
+        return dict(zip(campos, linha))
+    if cabecalho is not None and len(linha) == len(cabecalho):
+        return dict(zip(cabecalho, linha))
+    return None
+
+
+class LeitorIncremental:
+    """Lê apenas as linhas anexadas aos segmentos de um escritor desde a leitura anterior.
+
+    A posição (bytes lidos) de cada segmento é guardada pelo inode, que não muda quando o
+    segmento atual é rotacionado (renomeado). Um segmento que não cresceu custa apenas um
+    ``fstat``; os demais são lidos a partir da última posição, até a última linha completa.
+    """
+
+    def __init__(self, escritor):
+        self.escritor = escritor
+        self.lidos = 0
+        self._posicoes = {}  # (st_dev, st_ino) -> (bytes lidos, cabeçalho)
+        self._lock = threading.Lock()
+
+    def novos(self):
+        """Registros gravados desde a chamada anterior, em ordem"""
+        with self._lock:
+            registros = []
+            for segmento in self.escritor.segmentos():
+                try:
+                    with open(segmento, 'rb') as f:
+                        info = os.fstat(f.fileno())
+                        inode = (info.st_dev, info.st_ino)
+                        posicao, cabecalho = self._posicoes.get(inode, (0, None))
+                        if info.st_size <= posicao:
+                            continue
+                        f.seek(posicao)
+                        bloco = f.read(info.st_size - posicao)
+                except FileNotFoundError:
+                    break  # rotacionado durante a listagem: o restante fica para a próxima leitura
+                fim = bloco.rfind(b'\n') + 1  # uma linha incompleta ainda está sendo gravada
+                linhas = csv.reader(io.StringIO(bloco[:fim].decode('utf-8'), newline=''))
+                if posicao == 0:
+                    cabecalho = next(linhas, None)
+                for linha in linhas:
+                    registro = _converter_linha(linha, self.escritor.campos, cabecalho)
+                    if registro is not None:
+                        registros.append(registro)
+                self._posicoes[inode] = (posicao + fim, cabecalho)
+            self.lidos += len(registros)
+            return registros
+
+
+class IndiceUltimoRegistro:
+    """Índice em memória chave -> registro mais recente, para consultas O(1).
+
+    É construído uma vez a partir dos segmentos em disco, atualizado a cada novo
+    registro e pode ser reconstruído do disco (ex.: após uma queda do processo).
+    Com vários workers, uma chave ausente dispara ``sincronizar``, que lê apenas as
+    linhas anexadas desde a última leitura (``LeitorIncremental``).
+    """
+
+    def __init__(self, escritor, chave='id', campo_data='Data_Hora', max_esperas=4):
+        self.escritor = escritor
+        self.chave = chave
+        self.campo_data = campo_data
+        self._lock = threading.Lock()
+        self._registros = {}
+        self._leitor = LeitorIncremental(escritor)
+        self._esperas = threading.BoundedSemaphore(max_esperas)
+
+    def reconstruir(self):
+        """Descarta o índice e relê todos os segmentos"""
+        with self._lock:
+            # Registros feitos por este processo e ainda não gravados são preservados
+            locais, self._registros = self._registros, {}
+            self._leitor = LeitorIncremental(self.escritor)
+        self.sincronizar()
+        for registro in locais.values():
+            self._mesclar(registro)
+        return len(self._registros)
+
+    def sincronizar(self):
+        """Acrescenta as linhas gravadas (por qualquer processo) desde a última leitura"""
+        for registro in self._leitor.novos():
+            if registro.get(self.chave):
+                self._mesclar(registro)
+
+    def _mesclar(self, registro):
+        with self._lock:
+            atual = self._registros.get(registro[self.chave])
+            if atual is None or registro.get(self.campo_data, '') >= atual.get(self.campo_data, ''):
+                self._registros[registro[self.chave]] = registro
+
+    def atualizar(self, registro):
+        with self._lock:
+            self._registros[registro[self.chave]] = registro
+
+    def obter(self, valor, espera=0.0):
+        """Registro mais recente da chave.
+
+        Com ``espera``, uma chave ausente é procurada de novo no disco até o prazo: cobre o
+        registro feito em outro worker e ainda na fila do escritor dele. Poucas consultas
+        esperam ao mesmo tempo; as demais respondem com o que já está no disco.
+        """
+        registro = self._registros.get(valor)
+        if registro is None:
+            self.sincronizar()
+            registro = self._registros.get(valor)
+        if registro is None and espera > 0 and self._esperas.acquire(blocking=False):
+            try:
+                limite = time.monotonic() + espera
+                while registro is None and time.monotonic() < limite:
+                    time.sleep(min(0.05, max(0.0, limite - time.monotonic())))
+                    self.sincronizar()
+                    registro = self._registros.get(valor)
+            finally:
+                self._esperas.release()
+        return registro
+
+    def __len__(self):
+        return len(self._registros)
+
+
+class AcompanhamentoRegistros:
+    """Aplica, em ordem, cada registro gravado no escritor (por qualquer processo) a consumidores.
+
+    Os consumidores mantêm estado derivado do log (histórico, interações, coocorrência). Cada
+    um recebe ``(registros, inicio)``, em que ``inicio`` é a posição do primeiro registro no
+    log, e ignora os que já incluiu (ex.: os contados em um arquivo salvo). Como todos os
+    processos leem o mesmo log na mesma ordem, todos convergem para o mesmo estado, e o
+    estado de cada consumidor corresponde sempre a um prefixo do log.
+
+    ``iniciar`` aplica o log inteiro (a carga) e, com ``intervalo``, inicia uma thread que
+    acompanha os registros dos demais processos. ``lock`` é mantido durante a aplicação:
+    quem reconstrói um consumidor a partir do disco o segura para não perder registros.
+
+    ``registrar`` enfileira um registro deste processo e o aplica na hora, com ``inicio=None``
+    (fora do log). Quando ele é lido do log, chega aos consumidores como ``None``: a posição
+    avança, mas o registro não é somado de novo. ``pendentes`` conta os registros aplicados
+    assim e ainda não lidos; enquanto houver algum, o estado não é um prefixo do log.
+    """
+
+    def __init__(self, escritor, intervalo=1.0):
+        self.escritor = escritor
+        self.intervalo = intervalo
+        self.lock = threading.RLock()
+        self._leitor = LeitorIncremental(escritor)
+        self._consumidores = []
+        self._locais = {}  # linha CSV -> registro aplicado por ``registrar`` e ainda não lido do log
+        self._ausentes = set()
+        self._iniciado = False
+        self._parar = threading.Event()
+        self._thread = None
+
+    def consumidor(self, funcao):
+        """Registra ``funcao(registros, inicio)``; pode ser usado como decorador.
+
+        Registrada depois de ``iniciar`` (consumidor criado sob demanda), recebe antes os
+        registros já aplicados aos demais, relidos do disco, e os registros locais pendentes.
+        """
+        with self.lock:
+            if self._iniciado and self.lidos:
+                funcao(LeitorIncremental(self.escritor).novos()[:self.lidos], 0)
+            if self._locais:
+                funcao(list(self._locais.values()), None)
+            self._consumidores.append(funcao)
+        return funcao
+
+    @property
+    def lidos(self):
+        return self._leitor.lidos
+
+    @property
+    def pendentes(self):
+        return len(self._locais)
+
+    @property
+    def locais(self):
+        """Registros aplicados por ``registrar`` e ainda não lidos do log"""
+        with self.lock:
+            return list(self._locais.values())
+
+    def _linha(self, registro):
+        """Valores como o csv grava e o ``LeitorIncremental`` lê: identifica o registro no log"""
+        return tuple('' if registro.get(campo) is None else str(registro.get(campo)) for campo in self.escritor.campos)
+
+    def registrar(self, registro):
+        """Enfileira o registro no escritor e o aplica na hora aos consumidores; False se foi descartado"""
+        self.iniciar()
+        with self.lock:
+            if not self.escritor.registrar(registro):
+                return False
+            self._locais[self._linha(registro)] = registro
+            for funcao in self._consumidores:
+                funcao([registro], None)
+            return True
+
+    def sincronizar(self):
+        """Aplica os registros gravados desde a leitura anterior; retorna quantos"""
+        with self.lock:
+            # Fila vazia antes da leitura: todo registro local já foi gravado (ou perdido)
+            fila_vazia = self.escritor.flush(timeout=0)
+            inicio = self._leitor.lidos
+            registros = self._leitor.novos()
+            if self._locais:
+                registros = [None if self._locais.pop(self._linha(r), None) is not None else r for r in registros]
+                self._descartar_perdidos(fila_vazia)
+            if registros:
+                for funcao in self._consumidores:
+                    funcao(registros, inicio)
+            return len(registros)
+
+    def _descartar_perdidos(self, fila_vazia):
+        """Locais ausentes do log em duas leituras seguidas com a fila vazia: a gravação falhou"""
+        ausentes = set(self._locais) if fila_vazia else set()
+        perdidos = ausentes & self._ausentes
+        for linha in perdidos:
+            del self._locais[linha]
+        if perdidos:
+            logging.warning(f"{len(perdidos)} registros aplicados localmente não chegaram a {self.escritor.caminho}.")
+        self._ausentes = ausentes - perdidos
+
+    def iniciar(self):
+        if self._iniciado:
+            return
+        with self.lock:
+            if self._iniciado:
+                return
+            self.sincronizar()
+            # Só depois da carga: quem testa a flag fora do lock não vê os consumidores pela metade
+            self._iniciado = True
+            if self.intervalo:
+                self._thread = threading.Thread(target=self._executar, name=f'acompanhamento-{self.escritor.caminho.stem}',
+                                                daemon=True)
+                self._thread.start()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                logging.error(f"Erro ao acompanhar {self.escritor.caminho}: {str(e)}")
+
+    def parar(self):
+        self._parar.set()
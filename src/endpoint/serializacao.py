@@ -0,0 +1,62 @@
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # dependência opcional; sem ela usa-se o json da biblioteca padrão
+    orjson = None
+
+
+def serializar(conteudo):
+    """Serializa para bytes JSON (UTF-8), com orjson quando disponível"""
+    if orjson is not None:
+        return orjson.dumps(conteudo, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _serializar_desafios(desafios, estado):
+    """Concatena os fragmentos pré-serializados do catálogo.
+
+    O fragmento só é reaproveitado se o dict for o próprio objeto do catálogo do
+    estado (ex.: não veio de outro processo nem de outra versão do modelo).
+    """
+    partes = []
+    for desafio in desafios:
+        if estado.detalhes_desafios.get(desafio['id']) is desafio:
+            partes.append(estado.fragmentos_desafios[desafio['id']])
+        else:
+            partes.append(serializar(desafio))
+    return b'[' + b','.join(partes) + b']'
+
+
+def serializar_recomendacao(resultado, estado):
+    resto = {chave: valor for chave, valor in resultado.items() if chave != 'desafios'}
+    corpo = b'{"desafios":' + _serializar_desafios(resultado['desafios'], estado)
+    if resto:
+        corpo += b',' + serializar(resto)[1:]
+    else:
+        corpo += b'}'
+    return corpo
+
+
+def serializar_lote(resposta, estado):
+    resto = {chave: valor for chave, valor in resposta.items() if chave != 'resultados'}
+    resultados = b','.join(serializar_recomendacao(r, estado) for r in resposta['resultados'])
+    corpo = b'{"resultados":[' + resultados + b']'
+    if resto:
+        corpo += b',' + serializar(resto)[1:]
+    else:
+        corpo += b'}'
+    return corpo
+
+
+class RespostaJSONRapida(Response):
+    """Resposta JSON que aceita bytes já montados ou serializa com ``serializar``"""
+
+    media_type = 'application/json'
+
+    def render(self, content):
+        if isinstance(content, bytes):
+            return content
+        return serializar(content)
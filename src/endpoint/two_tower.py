@@ -0,0 +1,141 @@
+"""Motor de recomendação two-tower (``recommendation_system/two_tower_based``) servido em NumPy.
+
+Na carga, a torre de itens é aplicada uma única vez a todos os desafios do catálogo;
+a cada requisição roda apenas a torre do usuário (BatchNorm dobrada nas camadas) e o
+ranking é um produto interno seguido de top-k.
+
+O arquivo é gerado no notebook com ``exportar_two_tower`` (ver a última seção dele).
+"""
+import datetime
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.endpoint.indice_vizinhos import top_k_indices
+from src.endpoint.redes_numpy import carregar_pesos, exportar_pesos, inferir_arquitetura, montar_rede
+
+base_dir = Path(__file__).resolve().parents[2]
+two_tower_path = Path(os.getenv('SQUAD_TWO_TOWER_PATH', base_dir / 'src' / 'dataframe' / 'two_tower.npz'))
+
+# sexo do dataset de alunos para cada body_type da API (o one-hot do notebook gera sexo_<valor>)
+SEXO_POR_TIPO_CORPORAL = {'Masculino': 1, 'Feminino': -1}
+
+
+def exportar_two_tower(caminho, model, scaler, user_feature_cols, numeric_cols, item_ids, item_features,
+                       item_feature_cols=None):
+    """Exporta o ``TwoTowerRecommender`` treinado no notebook (chamado lá, onde o torch está disponível)"""
+    state_dict = model.state_dict()
+    nomes = set(state_dict)
+    metadados = {
+        'modelo': 'two_tower',
+        'exportado_em': datetime.datetime.now().isoformat(),
+        'user_feature_cols': list(user_feature_cols),
+        'numeric_cols': list(numeric_cols),
+        'item_feature_cols': list(item_feature_cols) if item_feature_cols is not None else None,
+        'arquitetura': {
+            'user_tower.': inferir_arquitetura(nomes, 'user_tower.'),
+            'item_tower.': inferir_arquitetura(nomes, 'item_tower.'),
+        },
+    }
+    return exportar_pesos(
+        caminho, state_dict, metadados,
+        scaler_media=scaler.mean_, scaler_escala=scaler.scale_,
+        item_ids=np.asarray(item_ids, dtype=np.int64), item_features=np.asarray(item_features, dtype=np.float32),
+    )
+
+
+def escalonamento(metadados, extras):
+    """Média e escala do StandardScaler na ordem de ``user_feature_cols`` (0 e 1 nas colunas não escalonadas)"""
+    colunas = metadados['user_feature_cols']
+    media = np.zeros(len(colunas), dtype=np.float32)
+    escala = np.ones(len(colunas), dtype=np.float32)
+    for coluna, m, e in zip(metadados['numeric_cols'], extras['scaler_media'], extras['scaler_escala']):
+        i = colunas.index(coluna)
+        media[i], escala[i] = m, e
+    return media, escala
+
+
+def montar_features_usuario(dados_dicts, historicos, colunas, media, escala):
+    """Features de usuário dos notebooks (as mesmas no two-tower e no softmax) a partir das entradas da API"""
+    ano = datetime.date.today().year
+    valores = {
+        'media_treinos_semanais': [d['training_days'] for d in dados_dicts],
+        'tendencia_num_treinos': [0.0] * len(dados_dicts),
+        'duracao_media_treinos': [d['training_time'] for d in dados_dicts],
+        'ano_nascimento': [ano - d['age'] for d in dados_dicts],
+        'num_convites_enviados': [0.0] * len(dados_dicts),
+        'num_convites_recebidos': [0.0] * len(dados_dicts),
+        'foi_indicado': [0.0] * len(dados_dicts),
+        'aluno_philanthropist': [d['score_philanthropist'] for d in dados_dicts],
+        'aluno_socialiser': [d['score_socialiser'] for d in dados_dicts],
+        'aluno_achiever': [d['score_achiever'] for d in dados_dicts],
+        'aluno_player': [d['score_player'] for d in dados_dicts],
+        'aluno_free_spirit': [d['score_free_spirit'] for d in dados_dicts],
+        'aluno_disruptor': [d['score_disruptor'] for d in dados_dicts],
+    }
+    for feature in ('user_avg_streak', 'user_avg_progress', 'user_success_rate'):
+        valores[feature] = [h[feature] for h in historicos]
+    sexos = [SEXO_POR_TIPO_CORPORAL.get(d['body_type']) for d in dados_dicts]
+
+    x = np.zeros((len(dados_dicts), len(colunas)), dtype=np.float32)
+    for j, coluna in enumerate(colunas):
+        if coluna in valores:
+            x[:, j] = valores[coluna]
+        elif coluna.startswith('sexo_'):
+            x[:, j] = [str(s) == coluna[len('sexo_'):] for s in sexos]
+    return (x - media) / escala
+
+
+class MotorTwoTower:
+    """Torre do usuário em NumPy + embeddings de todos os desafios pré-calculados"""
+
+    def __init__(self, caminho=two_tower_path, ids_catalogo=None):
+        pesos, extras, metadados = carregar_pesos(caminho)
+        self.metadados = metadados
+        self.user_feature_cols = metadados['user_feature_cols']
+        arquitetura = metadados['arquitetura']
+        self.torre_usuario = montar_rede(pesos, 'user_tower.', arquitetura['user_tower.'])
+        torre_item = montar_rede(pesos, 'item_tower.', arquitetura['item_tower.'])
+
+        self._media, self._escala = escalonamento(metadados, extras)
+
+        item_ids = extras['item_ids']
+        item_features = extras['item_features']
+        if ids_catalogo is not None:  # apenas desafios que existem no catálogo servido
+            manter = np.isin(item_ids, np.fromiter(ids_catalogo, dtype=np.int64))
+            item_ids, item_features = item_ids[manter], item_features[manter]
+        self.item_ids = item_ids
+        self.item_embeddings = np.ascontiguousarray(torre_item(item_features), dtype=np.float32)
+
+    def montar_features(self, dados_dicts, historicos):
+        return montar_features_usuario(dados_dicts, historicos, self.user_feature_cols, self._media, self._escala)
+
+    def recomendar(self, dados_dicts, historicos, n=5):
+        """Ids dos ``n`` desafios de maior score para cada entrada (uma única multiplicação de matrizes)"""
+        embeddings = self.torre_usuario(self.montar_features(dados_dicts, historicos))
+        scores = embeddings @ self.item_embeddings.T
+        indices = top_k_indices(scores, min(n, len(self.item_ids)))
+        return [self.item_ids[linha].tolist() for linha in indices]
+
+
+_motor = None
+_lock_motor = threading.Lock()
+
+
+def obter_motor_two_tower(ids_catalogo):
+    """Carrega o motor no primeiro uso; ``FileNotFoundError`` se o modelo não foi exportado"""
+    global _motor
+    if _motor is None:
+        with _lock_motor:
+            if _motor is None:
+                _motor = MotorTwoTower(two_tower_path, ids_catalogo)
+    return _motor
+
+
+def descartar_motor_two_tower(*_):
+    """Força o recarregamento (ex.: após uma recarga do catálogo)"""
+    global _motor
+    with _lock_motor:
+        _motor = None
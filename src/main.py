@@ -1,11 +1,25 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, Header, HTTPException, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.endpoint.formulario import UsuarioInput, AvaliacaoInput
-from src.endpoint.recomendador import recomendar, avaliar
+from src.endpoint.executor import executor_recomendacao
+from src.endpoint.observabilidade import duracao_requisicoes, registro_metricas
+from src.endpoint.serializacao import RespostaJSONRapida, serializar_lote, serializar_recomendacao
+from src.endpoint.coocorrencia import TOP_SIMILARES, obter_indice_coocorrencia
+from src.endpoint.memoria import memoria_processo
+from src.endpoint.modelo import (obter_estado, monitor_arquivos,
+                                 recarregar_em_segundo_plano, status_recarga)
+from src.endpoint.recomendador import (recomendar, recomendar_lote, avaliar, desafios_similares,
+                                      desafios_similares_lote, cache_recomendacoes,
+                                      TOP_K_VIZINHOS, fechar_historico_usuarios, registro_recomendacoes,
+                                      registro_avaliacoes, avaliacoes_gravadas)
 from fastapi.staticfiles import StaticFiles
+from typing import List, Optional
+import logging
+import os
+import time
 
 
 app = FastAPI(title="Squad IA - Sistema de Recomendação de Desafios", 
@@ -22,13 +36,81 @@ app.add_middleware(
 
 templates = Jinja2Templates(directory="src/templates")
 
+@app.middleware("http")
+async def medir_requisicoes(request: Request, call_next):
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        resposta = await call_next(request)
+        status = resposta.status_code
+        return resposta
+    finally:
+        # Rota como template (ex.: /questionario), não o caminho concreto, para limitar a cardinalidade
+        rota = getattr(request.scope.get("route"), "path", "desconhecida")
+        duracao_requisicoes.observar(time.perf_counter() - inicio,
+                                     metodo=request.method, rota=rota, status=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def iniciar_executor():
+    executor_recomendacao.iniciar()
+    # Carregar o modelo (snapshot mapeado em memória ou CSV) e o índice de coocorrência antes da primeira requisição
+    try:
+        obter_indice_coocorrencia(obter_estado(), avaliacoes_gravadas)
+        avaliacoes_gravadas.iniciar()
+    except Exception as e:
+        logging.error(f"Erro ao carregar o modelo: {str(e)}")
+    if monitor_arquivos is not None:
+        monitor_arquivos.iniciar()
+
+@app.on_event("shutdown")
+def fechar_registros():
+    # Concluir as tarefas em andamento e gravar os registros pendentes antes de encerrar o worker
+    executor_recomendacao.encerrar()
+    registro_recomendacoes.fechar()
+    registro_avaliacoes.fechar()
+    avaliacoes_gravadas.parar()
+    fechar_historico_usuarios()
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Squad IA API está funcionando!"}
+    return {
+        "status": "healthy",
+        "message": "Squad IA API está funcionando!",
+        "registros": {
+            "recomendacoes": registro_recomendacoes.estatisticas,
+            "avaliacoes": registro_avaliacoes.estatisticas,
+        },
+        "cache": cache_recomendacoes.estatisticas,
+        # Cada worker responde com a própria memória (o snapshot mapeado conta como compartilhada)
+        "processo": {"pid": os.getpid(), "memoria": memoria_processo()},
+    }
+
+# Token exigido no cabeçalho X-Admin-Token pelas rotas /admin (se definido)
+ADMIN_TOKEN = os.getenv('SQUAD_ADMIN_TOKEN')
+
+def verificar_admin(token: Optional[str]):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+
+@app.get("/admin/modelo")
+async def admin_modelo(x_admin_token: Optional[str] = Header(None)):
+    verificar_admin(x_admin_token)
+    return status_recarga()
+
+@app.post("/admin/recarregar", status_code=202)
+async def admin_recarregar(x_admin_token: Optional[str] = Header(None)):
+    """Recarrega dataset e catálogo em segundo plano; as requisições em andamento terminam na versão anterior"""
+    verificar_admin(x_admin_token)
+    iniciada = recarregar_em_segundo_plano()
+    return {"recarga_iniciada": iniciada, **status_recarga()}
 
 @app.post("/questionario")
 async def questionario(usuario: str = Form(...), senha: str = Form(...)):
@@ -80,7 +162,7 @@ async def recomendar_form(
         experience_level=experience_level,
     )
 
-    rec = recomendar(dados)
+    rec = await executor_recomendacao.executar(recomendar, dados)
     context = {
         "request": request,
         "usuario": usuario,
@@ -110,14 +192,32 @@ async def avaliar_form(
         time=time,
     )
 
-    resp = avaliar(dados)
+    resp = await executor_recomendacao.executar(avaliar, dados)
     context = {"request": request, **resp}
     return templates.TemplateResponse("avaliado.html", context)
 
-@app.post("/recomendar")
-def post_recomendar(usuario: UsuarioInput):
-    return recomendar(usuario)
+@app.post("/recomendar", response_class=RespostaJSONRapida)
+async def post_recomendar(usuario: UsuarioInput, motor: Optional[str] = Query(None)):
+    """``motor``: 'pipeline', 'conteudo', 'two_tower' ou 'colaborativo'; padrão em SQUAD_MOTOR"""
+    resultado = await executor_recomendacao.executar(recomendar, usuario, TOP_K_VIZINHOS, motor)
+    return RespostaJSONRapida(serializar_recomendacao(resultado, obter_estado()))
+
+@app.post("/recomendar/batch", response_class=RespostaJSONRapida)
+async def post_recomendar_batch(usuarios: List[UsuarioInput], motor: Optional[str] = Query(None)):
+    resposta = await executor_recomendacao.executar(recomendar_lote, usuarios, TOP_K_VIZINHOS, motor)
+    return RespostaJSONRapida(serializar_lote(resposta, obter_estado()))
 
 @app.post("/avaliar")
-def post_avaliar(avaliacao: AvaliacaoInput):
-    return avaliar(avaliacao)
\ No newline at end of file
+async def post_avaliar(avaliacao: AvaliacaoInput):
+    return await executor_recomendacao.executar(avaliar, avaliacao)
+
+@app.get("/desafios/similares", response_class=RespostaJSONRapida)
+async def get_desafios_similares_lote(ids: List[int] = Query(..., max_length=100),
+                                      n: int = Query(TOP_SIMILARES, ge=1, le=TOP_SIMILARES)):
+    """``/desafios/{id}/similares`` de vários desafios (``?ids=14&ids=20``) em uma requisição"""
+    return RespostaJSONRapida(serializar_lote(desafios_similares_lote(ids, n), obter_estado()))
+
+@app.get("/desafios/{challenge_id}/similares", response_class=RespostaJSONRapida)
+async def get_desafios_similares(challenge_id: int, n: int = Query(TOP_SIMILARES, ge=1, le=TOP_SIMILARES)):
+    """Desafios feitos por quem fez ``challenge_id``, do mais ao menos frequente (consulta ao índice pré-ordenado)"""
+    return RespostaJSONRapida(serializar_recomendacao(desafios_similares(challenge_id, n), obter_estado()))
@@ -112,6 +112,18 @@ def tela_recomendacao():
                 recomendacao = response.json()
                 st.success(f"✅ {recomendacao['total_desafios']} desafios encontrados!")
                 
+                # Desafios feitos junto com cada recomendado, numa única consulta (opcional)
+                similares = {}
+                try:
+                    resposta_similares = requests.get(
+                        "http://localhost:8000/desafios/similares",
+                        params={"ids": [d['id'] for d in recomendacao['desafios']], "n": 3}, timeout=2
+                    )
+                    if resposta_similares.status_code == 200:
+                        similares = {r['id']: r['desafios'] for r in resposta_similares.json()['resultados']}
+                except requests.RequestException:
+                    pass
+
                 # Exibir desafios
                 for i, desafio in enumerate(recomendacao['desafios'], 1):
                     with st.expander(f"🎯 Desafio {i}: {desafio['name']}"):
@@ -119,7 +131,10 @@ def tela_recomendacao():
                         st.write(f"**Tipo HEXAD:** {desafio['hexad_type']}")
                         st.write(f"**Dificuldade:** {desafio['difficulty']}")
                         st.write(f"**ID:** {desafio['id']}")
-                
+                        if similares.get(desafio['id']):
+                            nomes = ", ".join(s['name'] for s in similares[desafio['id']])
+                            st.write(f"**Quem fez este desafio também fez:** {nomes}")
+
                 st.session_state.recomendacao = recomendacao
                 
             else:
@@ -1,7 +1,12 @@
 #!/bin/bash
 
-# Inicia FastAPI em background
-uvicorn src.main:app --host 0.0.0.0 --port 8000 &
+# Compila o snapshot do modelo (e o índice IVF) uma única vez; os workers apenas o mapeiam em memória
+python -m src.endpoint.modelo preparar
+
+# Inicia FastAPI em background (SQUAD_WORKERS processos compartilhando o snapshot; exportado
+# para que cada worker saiba que há outros: monitor de recarga e espera do /avaliar)
+export SQUAD_WORKERS="${SQUAD_WORKERS:-1}"
+uvicorn src.main:app --host 0.0.0.0 --port 8000 --workers "${SQUAD_WORKERS:-1}" &
 
 # Inicia Streamlit no foreground (mantém o container vivo)
 streamlit run src/app.py --server.port=8501 --server.enableCORS=false
@@ -0,0 +1,55 @@
+"""Configuração comum: todos os arquivos gerados pela API vão para um diretório temporário.
+
+As variáveis SQUAD_* são lidas na importação dos módulos de ``src.endpoint``, então são
+definidas aqui, antes de qualquer teste importar o recomendador. Dataset e catálogo são
+copiados para o diretório temporário, para que os testes de recarga possam alterá-los.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+raiz = Path(__file__).resolve().parents[1]
+diretorio = Path(tempfile.mkdtemp(prefix='squad-testes-'))
+shutil.copy(raiz / 'src' / 'dataframe' / 'recommendation_dataset.csv', diretorio)
+shutil.copy(raiz / 'src' / 'dataframe' / 'challenges.json', diretorio)
+
+os.environ.update({
+    'SQUAD_DADOS_PATH': str(diretorio / 'recommendation_dataset.csv'),
+    'SQUAD_CHALLENGES_PATH': str(diretorio / 'challenges.json'),
+    'SQUAD_SNAPSHOT_DIR': str(diretorio / 'snapshot'),
+    'SQUAD_INDICE_PATH': str(diretorio / 'indice_vizinhos.npz'),
+    'SQUAD_REGISTROS_DIR': str(diretorio / 'registros'),
+    'SQUAD_COOCORRENCIA_PATH': str(diretorio / 'coocorrencia.npz'),
+    'SQUAD_ALS_PATH': str(diretorio / 'als.npz'),
+    'SQUAD_TWO_TOWER_PATH': str(diretorio / 'two_tower.npz'),
+    'SQUAD_SOFTMAX_PATH': str(diretorio / 'softmax.npz'),
+    'SQUAD_AVALIACOES_INTERVALO': '0',
+    'SQUAD_HISTORICO_INTERVALO': '0',
+    'SQUAD_MONITORAR_MODELO': '0',
+    'SQUAD_EXECUTOR': 'thread',
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def estado():
+    from src.endpoint.modelo import obter_estado
+
+    return obter_estado()
+
+
+def usuario_exemplo(usuario='ana', senha='segredo', **campos):
+    dados = {
+        'usuario': usuario, 'senha': senha, 'age': 30, 'height': 170.0, 'weight': 70.0, 'body_type': 'Masculino',
+        'goal': 'Hipertrofia', 'training_days': 3, 'training_time': 60, 'experience_level': 'Intermediário',
+        'score_philanthropist': 3.0, 'score_socialiser': 3.0, 'score_achiever': 6.0, 'score_player': 4.0,
+        'score_free_spirit': 2.0, 'score_disruptor': 1.0,
+    }
+    dados.update(campos)
+    return dados
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.endpoint import filtragem_colaborativa, modelo, recomendador
+from src.main import app
+from tests.conftest import usuario_exemplo
+
+
+@pytest.fixture(scope='module')
+def cliente():
+    # O bloco with executa os eventos de startup/shutdown (executor, índices, registros)
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+def recomendar(cliente, usuario, motor=None):
+    return cliente.post('/recomendar', json=usuario, params={'motor': motor} if motor else None)
+
+
+def test_health(cliente):
+    resposta = cliente.get('/health')
+    assert resposta.status_code == 200
+    assert resposta.json()['status'] == 'healthy'
+
+
+
+@pytest.mark.parametrize('motor', [None, 'pipeline', 'conteudo'])
+def test_recomendar_por_motor(cliente, motor):
+    resposta = recomendar(cliente, usuario_exemplo(), motor)
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo['motor'] == (motor or 'conteudo')
+    assert corpo['total_desafios'] == len(corpo['desafios']) > 0
+    assert corpo['versao_modelo'] == modelo.obter_estado().versao
+    assert ('etapas' in corpo) == (motor == 'pipeline')
+
+
+def test_recomendar_motor_invalido_ou_indisponivel(cliente):
+    assert recomendar(cliente, usuario_exemplo(), 'aleatorio').status_code == 400
+    # Nenhum modelo two-tower exportado no diretório temporário
+    assert recomendar(cliente, usuario_exemplo(), 'two_tower').status_code == 503
+
+
+def test_recomendar_colaborativo_depois_do_treino(cliente):
+    filtragem_colaborativa.descartar_motor_colaborativo()
+    assert recomendar(cliente, usuario_exemplo(), 'colaborativo').status_code == 503
+
+    filtragem_colaborativa.main(['treinar', '--fatores', '4', '--iteracoes', '2'])
+    filtragem_colaborativa.descartar_motor_colaborativo()
+    try:
+        resposta = recomendar(cliente, usuario_exemplo(), 'colaborativo')
+        assert resposta.status_code == 200
+        assert len(resposta.json()['desafios']) > 0
+    finally:
+        filtragem_colaborativa.als_path.unlink()
+        filtragem_colaborativa.descartar_motor_colaborativo()
+
+def test_recomendar_em_lote_igual_a_individual(cliente):
+    usuarios = [usuario_exemplo('ana'), usuario_exemplo('bia', goal='Emagrecimento', age=45)]
+    resposta = cliente.post('/recomendar/batch', json=usuarios, params={'motor': 'conteudo'})
+    assert resposta.status_code == 200
+    resultados = resposta.json()['resultados']
+    assert len(resultados) == 2
+    for usuario, resultado in zip(usuarios, resultados):
+        individual = recomendar(cliente, usuario, 'conteudo').json()
+        assert [d['id'] for d in resultado['desafios']] == [d['id'] for d in individual['desafios']]
+
+
+
+
+def test_avaliar_atualiza_o_historico(cliente):
+    recomendar(cliente, usuario_exemplo('carla'))
+    avaliacao = {'usuario': 'carla', 'senha': 'segredo', 'success': 8, 'streak': 4,
+                 'progress_pct': 75.0, 'rating': 5, 'time': 30}
+    resposta = cliente.post('/avaliar', json=avaliacao)
+    assert resposta.status_code == 200
+    assert resposta.json()['historico']['user_avg_streak'] == 4.0
+
+    # Lida depois do log, a avaliação (já aplicada na hora) não é somada de novo
+    recomendador.registro_avaliacoes.flush()
+    recomendador.avaliacoes_gravadas.sincronizar()
+    assert recomendador.avaliacoes_gravadas.pendentes == 0
+    segunda = cliente.post('/avaliar', json={**avaliacao, 'streak': 2})
+    assert segunda.json()['historico']['user_avg_streak'] == 3.0
+
+    desconhecido = cliente.post('/avaliar', json={**avaliacao, 'usuario': 'ninguem'})
+    assert desconhecido.status_code == 404
+
+def test_desafios_similares(cliente):
+    catalogo = sorted(modelo.obter_estado().challenges_data)
+    resposta = cliente.get(f'/desafios/{catalogo[0]}/similares', params={'n': 3})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo['id'] == catalogo[0] and corpo['total_desafios'] <= 3
+    assert corpo['coocorrencias'] == sorted(corpo['coocorrencias'], reverse=True)
+
+    assert cliente.get('/desafios/999999/similares').status_code == 404
+
+    lote = cliente.get('/desafios/similares', params={'ids': [catalogo[0], 999999, catalogo[1]], 'n': 3})
+    assert lote.status_code == 200
+    assert [r['id'] for r in lote.json()['resultados']] == [catalogo[0], catalogo[1]]
+    assert lote.json()['resultados'][0] == corpo
+
+def test_admin_recarregar(cliente):
+    versao = cliente.get('/admin/modelo').json()['versao']
+    assert versao == modelo.obter_estado().versao
+    try:
+        geracao = int(modelo.geracao_path.read_text(encoding='ascii'))
+    except FileNotFoundError:
+        geracao = 0
+
+    resposta = cliente.post('/admin/recarregar')
+    assert resposta.status_code == 202
+    # O contador em disco avisa os demais workers
+    assert int(modelo.geracao_path.read_text(encoding='ascii')) == geracao + 1
+    limite = time.monotonic() + 30
+    while cliente.get('/admin/modelo').json()['em_andamento'] and time.monotonic() < limite:
+        time.sleep(0.05)
+    status = cliente.get('/admin/modelo').json()
+    assert status['erro'] is None and status['erro_snapshot'] is None and status['ultima_recarga'] is not None
+    assert recomendar(cliente, usuario_exemplo()).status_code == 200
+
+
+def test_metrics(cliente):
+    recomendar(cliente, usuario_exemplo())
+    texto = cliente.get('/metrics').text
+    for nome in ('squad_requisicao_duracao_segundos', 'squad_etapa_duracao_segundos', 'squad_recomendacoes_total',
+                 'squad_cache_consultas_total', 'squad_modelo_info', 'squad_registros_total'):
+        assert f'# TYPE {nome}' in texto
+    assert 'squad_requisicao_duracao_segundos_count{metodo="POST",rota="/recomendar",status="200"}' in texto
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.endpoint import cache
+from src.endpoint.cache import CacheLRU, CacheRecomendacoes
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_despejo_lru():
+    lru = CacheLRU(capacidade=2, ttl=None)
+    lru.guardar('a', 1)
+    lru.guardar('b', 2)
+    assert lru.obter('a') == 1  # 'b' passa a ser o menos usado
+    lru.guardar('c', 3)
+    assert lru.obter('b') is None
+    assert lru.obter('a') == 1 and lru.obter('c') == 3
+    estatisticas = lru.estatisticas
+    assert estatisticas['despejos'] == 1
+    assert (estatisticas['hits'], estatisticas['misses']) == (3, 1)
+
+
+def test_expiracao_por_ttl(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(cache.time, 'monotonic', relogio)
+    ttl = CacheLRU(capacidade=10, ttl=5.0)
+    ttl.guardar('a', 1)
+    relogio.agora = 4.9
+    assert ttl.obter('a') == 1
+    relogio.agora = 5.0
+    assert ttl.obter('a') is None
+    assert ttl.estatisticas['expirados'] == 1
+    assert len(ttl) == 0
+
+
+def test_capacidade_zero_desativa():
+    desativado = CacheRecomendacoes(capacidade=0)
+    desativado.guardar('a', 1)
+    assert not desativado.ativo
+    assert desativado.obter('a') is None
+
+
+def test_chave_arredondada_agrupa_perfis_proximos():
+    recomendacoes = CacheRecomendacoes(casas_decimais=2)
+    vetor = np.array([0.101, -0.0001, 0.5], dtype=np.float32)
+    proximo = np.array([0.099, 0.0001, 0.5], dtype=np.float32)
+    assert recomendacoes.chave(vetor, 3, 'v1') == recomendacoes.chave(proximo, 3, 'v1')
+    assert recomendacoes.chave(vetor, 3, 'v1') != recomendacoes.chave(vetor, 3, 'v2')
+    assert CacheRecomendacoes().chave(vetor, 3, 'v1') != CacheRecomendacoes().chave(proximo, 3, 'v1')
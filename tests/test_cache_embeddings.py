@@ -0,0 +1,47 @@
+import numpy as np
+
+from src.endpoint.cache_embeddings import CacheEmbeddings
+
+
+class Codificador:
+    """Codificador falso que registra os textos recebidos"""
+
+    def __init__(self):
+        self.chamadas = []
+
+    def __call__(self, textos, batch_size):
+        self.chamadas.append(list(textos))
+        return np.array([[len(texto), texto.count('a'), 1.0] for texto in textos])
+
+
+def test_hit_nao_chama_o_codificador(tmp_path):
+    codificador = Codificador()
+    cache = CacheEmbeddings(tmp_path, modelo='falso', codificador=codificador)
+
+    primeiro = cache.codificar(['abc', 'aa', 'abc'])
+    assert codificador.chamadas == [['abc', 'aa']]
+    np.testing.assert_array_equal(primeiro[0], primeiro[2])
+
+    segundo = cache.codificar(['aa', 'abc'])
+    assert codificador.chamadas == [['abc', 'aa']]
+    np.testing.assert_array_equal(segundo, primeiro[[1, 0]])
+
+    cache.codificar(['aa', 'novo'])
+    assert codificador.chamadas[-1] == ['novo']
+
+
+def test_cache_persiste_entre_instancias(tmp_path):
+    CacheEmbeddings(tmp_path, modelo='falso', codificador=Codificador()).codificar(['abc', 'aa'])
+
+    codificador = Codificador()
+    cache = CacheEmbeddings(tmp_path, modelo='falso', codificador=codificador)
+    assert len(cache) == 2
+    np.testing.assert_array_equal(cache.codificar(['aa']), [[2, 2, 1]])
+    assert codificador.chamadas == []
+
+
+def test_por_desafio_uma_linha_por_id(tmp_path):
+    cache = CacheEmbeddings(tmp_path, modelo='falso', codificador=Codificador())
+    tabela = cache.por_desafio([3, 1, 3], ['abc', 'aa', 'outro'])
+    assert tabela.index.tolist() == [1, 3]
+    np.testing.assert_array_equal(tabela.loc[3].to_numpy(), [3, 1, 1])
@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+
+from src.endpoint import colunar
+
+
+def escrever_avaliacoes(origem, linhas=300):
+    df = pd.DataFrame({
+        '_chave': ['a' if i % 2 else 'b' for i in range(linhas)],
+        'cliente_codigo': [i % 30 for i in range(linhas)],
+        'codigo': list(range(linhas)),
+        'dataavaliacao': ['2024-01-%02d' % (i % 28 + 1) for i in range(linhas)],
+        'dataproxima': ['' for _ in range(linhas)],
+        'peso': [60.0 + i % 40 for i in range(linhas)],
+        'sexo': ['M' if i % 3 else 'F' for i in range(linhas)],
+    })
+    df.to_csv(colunar.caminho_csv('avaliacaofisica', origem), sep='\t', encoding='latin-1', index=False)
+    return df
+
+
+def test_carregar_igual_ao_csv(tmp_path):
+    escrever_avaliacoes(tmp_path)
+    destino = tmp_path / 'colunar'
+    df = colunar.carregar('avaliacaofisica', origem=tmp_path, diretorio=destino)
+    csv = colunar.ler_csv('avaliacaofisica', origem=tmp_path)
+
+    assert len(df) == len(csv)
+    assert str(df['cliente_codigo'].dtype) == 'Int64'
+    assert pd.api.types.is_datetime64_any_dtype(df['dataavaliacao'])
+    assert str(df['sexo'].dtype) == 'category'
+    ordenado = df.set_index('codigo').sort_index()
+    esperado = csv.set_index('codigo').sort_index()
+    assert ordenado['peso'].tolist() == esperado['peso'].tolist()
+    assert ordenado['_chave'].astype(str).tolist() == esperado['_chave'].tolist()
+
+
+def test_projecao_e_filtros(tmp_path):
+    escrever_avaliacoes(tmp_path)
+    destino = tmp_path / 'colunar'
+    df = colunar.carregar('avaliacaofisica', colunas=['cliente_codigo', 'peso'], clientes=[3, 7], chaves=['a'],
+                          origem=tmp_path, diretorio=destino)
+    csv = colunar.ler_csv('avaliacaofisica', origem=tmp_path)
+    esperado = csv[csv['cliente_codigo'].isin([3, 7]) & (csv['_chave'] == 'a')]
+
+    assert list(df.columns) == ['cliente_codigo', 'peso']
+    assert sorted(df['peso']) == sorted(esperado['peso'])
+
+
+def test_reconverte_quando_o_csv_muda(tmp_path):
+    escrever_avaliacoes(tmp_path)
+    destino = tmp_path / 'colunar'
+    colunar.converter('avaliacaofisica', origem=tmp_path, diretorio=destino)
+    assert colunar.atualizado('avaliacaofisica', origem=tmp_path, diretorio=destino)
+
+    escrever_avaliacoes(tmp_path, linhas=120)
+    csv = colunar.caminho_csv('avaliacaofisica', tmp_path)
+    os.utime(csv, ns=(csv.stat().st_atime_ns, csv.stat().st_mtime_ns + 10**9))
+    assert not colunar.atualizado('avaliacaofisica', origem=tmp_path, diretorio=destino)
+    assert len(colunar.carregar('avaliacaofisica', origem=tmp_path, diretorio=destino)) == 120
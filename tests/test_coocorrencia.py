@@ -0,0 +1,78 @@
+import itertools
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from src.endpoint import coocorrencia
+from src.endpoint.coocorrencia import IndiceCoocorrencia
+
+
+def contar_pares(cestas, catalogo):
+    pares = Counter()
+    for cesta in cestas:
+        ids = sorted(set(cesta) & set(catalogo))
+        for a, b in itertools.permutations(ids, 2):
+            pares[a, b] += 1
+    return pares
+
+
+def similares_esperados(pares, challenge_id, n):
+    vizinhos = [(b, contagem) for (a, b), contagem in pares.items() if a == challenge_id]
+    return sorted(vizinhos, key=lambda par: (-par[1], par[0]))[:n]
+
+
+def cestas_aleatorias(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # Inclui ids fora do catálogo (90..94) e desafios repetidos na mesma cesta
+    return [rng.choice(np.r_[10:40, 90:95], size=rng.integers(0, 7)).tolist() for _ in range(n)]
+
+
+def indice_vazio(item_ids, top_n=5):
+    return IndiceCoocorrencia(item_ids, sparse.csr_matrix((len(item_ids), len(item_ids)), dtype=np.int64), top_n=top_n)
+
+
+def test_buffer_e_matriz_iguais_a_contagem_direta(monkeypatch):
+    monkeypatch.setattr(coocorrencia, 'LIMITE_PENDENTES', 200)  # força algumas consolidações
+    item_ids = list(range(10, 40))
+    cestas = cestas_aleatorias(400)
+    pares = contar_pares(cestas, item_ids)
+
+    por_avaliacao, em_lote = indice_vazio(item_ids), indice_vazio(item_ids)
+    for cesta in cestas:
+        por_avaliacao.adicionar([str(cesta)])
+    em_lote.adicionar([str(cesta) for cesta in cestas])
+
+    for indice in (por_avaliacao, em_lote):
+        assert indice.avaliacoes_incluidas == 400
+        for challenge_id in item_ids:
+            assert indice.similares(challenge_id) == similares_esperados(pares, challenge_id, 5)
+    assert indice.similares(99) is None
+
+
+def test_aplicar_ignora_posicoes_ja_incluidas():
+    item_ids = list(range(10, 40))
+    cestas = cestas_aleatorias(30, seed=1)
+    registros = [{'Recomendacao_Desafios': str(cesta)} for cesta in cestas]
+    indice = indice_vazio(item_ids)
+    indice.aplicar(registros[:20], 0)
+    indice.aplicar(registros[10:], 10)
+    pares = contar_pares(cestas, item_ids)
+    assert indice.avaliacoes_incluidas == 30
+    assert all(indice.similares(c) == similares_esperados(pares, c, 5) for c in item_ids)
+
+
+def test_de_estado_e_arquivo_salvo(estado, tmp_path):
+    indice = IndiceCoocorrencia.de_estado(estado)
+    catalogo = sorted(estado.challenges_data)
+    cestas = [list(estado.indice_recomendados[i]) + list(estado.indice_concluidos[i])
+              for i in range(len(estado.indice_recomendados))]
+    pares = contar_pares(cestas, catalogo)
+    for challenge_id in catalogo:
+        assert indice.similares(challenge_id, 3) == similares_esperados(pares, challenge_id, 3)
+
+    indice.adicionar(['[14, 15]'])
+    carregado = IndiceCoocorrencia.carregar(indice.salvar(tmp_path / 'coocorrencia.npz'))
+    assert carregado.versao == estado.versao and carregado.avaliacoes_incluidas == 1
+    assert (carregado.contagens != indice.contagens).nnz == 0
+    assert carregado.similares(14) == indice.similares(14)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.endpoint.dataset_interacoes import DatasetInteracoes
+
+colunas_usuario = ['idade', 'peso', 'streak']
+
+
+@pytest.fixture
+def interacoes():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(50, 3)), columns=colunas_usuario)
+    df['item_id'] = rng.choice([10, 20, 30, 99], size=50)  # 99 não está na tabela de desafios
+    df['label'] = rng.integers(0, 2, size=50).astype(float)
+    df.loc[5, 'peso'] = np.nan
+    itens = pd.DataFrame(rng.normal(size=(3, 4)), index=pd.Index([10, 20, 30], name='item_id'),
+                         columns=[f'desc_emb_{i}' for i in range(4)])
+    return df, itens
+
+
+def linhas_iloc(df, itens, posicoes):
+    """Features como o InteractionDataset antigo: iloc por amostra com nan_to_num"""
+    usuarios = np.nan_to_num(df.iloc[posicoes][colunas_usuario].to_numpy(dtype=np.float32))
+    desafios = itens.reindex(df.iloc[posicoes]['item_id']).fillna(0).to_numpy(dtype=np.float32)
+    rotulos = df.iloc[posicoes][['label']].to_numpy(dtype=np.float32)
+    return usuarios, desafios, rotulos
+
+
+@pytest.mark.parametrize('em_disco', [False, True])
+def test_fatias_iguais_as_linhas_do_iloc(interacoes, tmp_path, em_disco):
+    df, itens = interacoes
+    dataset = DatasetInteracoes.de_dataframe(df, colunas_usuario, itens, 'label',
+                                             diretorio=tmp_path if em_disco else None)
+    assert len(dataset) == 50 and dataset.dimensao_usuario == 3 and dataset.dimensao_item == 4
+
+    for indice in (slice(0, 16), slice(40, 50), [3, 5, 17], 7):
+        posicoes = np.arange(50)[indice]
+        for obtido, esperado in zip(dataset[indice], linhas_iloc(df, itens, np.atleast_1d(posicoes))):
+            np.testing.assert_array_equal(np.atleast_2d(obtido), esperado)
+
+
+def test_lotes_embaralhados_cobrem_o_dataset(interacoes):
+    df, itens = interacoes
+    dataset = DatasetInteracoes.de_dataframe(df, colunas_usuario, itens, 'label')
+    usuarios = np.concatenate([lote[0] for lote in dataset.lotes(16, embaralhar=True, semente=1)])
+    esperado = np.nan_to_num(df[colunas_usuario].to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(np.sort(usuarios, axis=0), np.sort(esperado, axis=0))
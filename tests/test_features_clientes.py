@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from src.endpoint import features_clientes
+from src.endpoint.colunar import caminho_csv
+
+
+def escrever(origem, programas, avaliacoes):
+    pd.DataFrame(programas, columns=features_clientes.colunas_programa).to_csv(
+        caminho_csv('programatreino', origem), sep='\t', encoding='latin-1', index=False)
+    pd.DataFrame(avaliacoes, columns=features_clientes.colunas_avaliacao).to_csv(
+        caminho_csv('avaliacaofisica', origem), sep='\t', encoding='latin-1', index=False)
+
+
+# O mesmo codigo aparece em duas bases (_chave) diferentes
+programas = [
+    ('a', 1, 10, '2024-01-01', '2024-01-29', 8),
+    ('a', 1, 11, '2024-02-01', '2024-02-15', 6),
+    ('b', 1, 10, '2024-01-01', '2024-01-15', 2),
+]
+avaliacoes = [
+    ('a', 1, 5, '2024-01-10', 80.0, 180.0, None, 20.0),
+    ('b', 1, 5, '2024-01-12', 60.0, 1.60, None, 25.0),
+]
+
+
+def test_segunda_execucao_nao_adiciona_linhas(tmp_path):
+    escrever(tmp_path, programas, avaliacoes)
+    destino = tmp_path / 'features.parquet'
+
+    assert features_clientes.atualizar(tmp_path, destino) == {'programatreino': 3, 'avaliacaofisica': 2}
+    primeira = pd.read_parquet(destino)
+    assert features_clientes.atualizar(tmp_path, destino) == {'programatreino': 0, 'avaliacaofisica': 0}
+    pd.testing.assert_frame_equal(pd.read_parquet(destino), primeira)
+
+    escrever(tmp_path, programas + [('b', 1, 12, '2024-03-01', '2024-03-15', 4)], avaliacoes)
+    assert features_clientes.atualizar(tmp_path, destino) == {'programatreino': 1, 'avaliacaofisica': 0}
+
+
+def test_codigo_repetido_em_outra_base(tmp_path):
+    escrever(tmp_path, programas, avaliacoes)
+    destino = tmp_path / 'features.parquet'
+    features_clientes.atualizar(tmp_path, destino)
+
+    features = pd.read_parquet(destino).set_index(['_chave', 'cliente_codigo'])
+    assert features.loc[('a', 1), 'n_programas'] == 2
+    assert features.loc[('b', 1), 'n_programas'] == 1
+    assert features.loc[('a', 1), 'duracao_media_treinos'] == pytest.approx(21.0)
+    assert features.loc[('b', 1), 'peso'] == 60.0 and features.loc[('b', 1), 'altura'] == pytest.approx(1.6)
+
+
+def test_juntar_features_pelas_duas_chaves(tmp_path):
+    escrever(tmp_path, programas, avaliacoes)
+    destino = tmp_path / 'features.parquet'
+    features_clientes.atualizar(tmp_path, destino)
+
+    dados = pd.DataFrame({'_chave': ['a', 'b', 'c'], 'client_id': [1, 1, 1]})
+    juntos = features_clientes.juntar_features(dados, caminho=destino)
+    assert len(juntos) == 3
+    assert juntos['peso'].tolist()[:2] == [80.0, 60.0] and pd.isna(juntos['peso'].iloc[2])
+
+    with pytest.raises(ValueError):
+        features_clientes.juntar_features(dados.drop(columns='_chave'), caminho=destino)
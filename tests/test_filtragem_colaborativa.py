@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from src.endpoint import filtragem_colaborativa
+from src.endpoint.filtragem_colaborativa import InteracoesUsuarios, MotorColaborativo, resolver, treinar_als
+
+
+def interacoes_aleatorias(usuarios=300, itens=25, densidade=0.15, seed=0):
+    return sparse.random(usuarios, itens, density=densidade, format='csr', random_state=seed,
+                         data_rvs=lambda n: np.random.default_rng(seed).uniform(0.1, 1.0, n))
+
+
+def resolver_direto(matriz, fixos, regularizacao, alfa):
+    """Um sistema por linha: (YᵀC_uY + λI) x_u = YᵀC_u p_u, com C_u = I + α diag(r_u)"""
+    f = fixos.shape[1]
+    resultado = []
+    for r in matriz.toarray():
+        confianca = 1 + alfa * r
+        a = fixos.T @ (confianca[:, None] * fixos) + regularizacao * np.eye(f)
+        resultado.append(np.linalg.solve(a, fixos.T @ (confianca * (r > 0))))
+    return np.array(resultado)
+
+
+@pytest.mark.parametrize('limite_externos', [filtragem_colaborativa.LIMITE_BYTES_EXTERNOS, 0])
+def test_resolver_igual_a_solucao_por_linha(monkeypatch, limite_externos):
+    # Limite 0: A_u montado linha a linha, sem os produtos externos pré-calculados
+    monkeypatch.setattr(filtragem_colaborativa, 'LIMITE_BYTES_EXTERNOS', limite_externos)
+    matriz = interacoes_aleatorias()
+    fixos = np.random.default_rng(1).normal(size=(matriz.shape[1], 6))
+    np.testing.assert_allclose(resolver(matriz, fixos, 0.1, 10.0, threads=1),
+                               resolver_direto(matriz, fixos, 0.1, 10.0), rtol=1e-8, atol=1e-10)
+
+
+def test_resolver_em_blocos_e_threads(monkeypatch):
+    monkeypatch.setattr(filtragem_colaborativa, 'LINHAS_POR_BLOCO', 64)
+    matriz = interacoes_aleatorias(usuarios=500)
+    fixos = np.random.default_rng(2).normal(size=(matriz.shape[1], 4))
+    np.testing.assert_allclose(resolver(matriz, fixos, 0.1, 10.0, threads=3),
+                               resolver_direto(matriz, fixos, 0.1, 10.0), rtol=1e-8, atol=1e-10)
+
+
+def test_treino_reconstroi_as_preferencias():
+    matriz = interacoes_aleatorias(densidade=0.2)
+    usuarios, itens = treinar_als(matriz, fatores=8, iteracoes=10, threads=1)
+    scores = usuarios @ itens.T
+    preferencias = matriz.toarray() > 0
+    # Desafios com interação pontuam mais que os demais, em média
+    assert scores[preferencias].mean() > scores[~preferencias].mean() + 0.3
+
+
+def test_motor_fold_in_e_populares():
+    matriz = interacoes_aleatorias(densidade=0.2)
+    _, itens = treinar_als(matriz, fatores=8, iteracoes=10, threads=1)
+    item_ids = np.arange(100, 100 + matriz.shape[1])
+    motor = MotorColaborativo(item_ids, itens, np.asarray(matriz.sum(axis=0)).ravel(),
+                              {'regularizacao': 0.1, 'alfa': 10.0})
+    interacao = {int(item_ids[j]): float(v) for j, v in zip(matriz[0].indices, matriz[0].data)}
+
+    com_interacoes, sem_interacoes = motor.recomendar([interacao, {}], 5)
+    assert len(set(com_interacoes)) == 5 and set(com_interacoes) <= set(item_ids.tolist())
+    populares = item_ids[np.argsort(-motor.popularidade, kind='stable')[:5]].tolist()
+    assert sem_interacoes == populares
+
+
+
+def test_motor_nao_recomenda_desafios_avaliados():
+    matriz = interacoes_aleatorias(densidade=0.2)
+    _, itens = treinar_als(matriz, fatores=8, iteracoes=10, threads=1)
+    item_ids = np.arange(100, 100 + matriz.shape[1])
+    motor = MotorColaborativo(item_ids, itens, np.asarray(matriz.sum(axis=0)).ravel(),
+                              {'regularizacao': 0.1, 'alfa': 10.0})
+    interacoes = [{int(item_ids[j]): float(v) for j, v in zip(matriz[i].indices, matriz[i].data)} for i in range(20)]
+
+    for interacao, desafios in zip(interacoes, motor.recomendar(interacoes, 10)):
+        assert not set(desafios) & set(interacao)
+        assert len(desafios) == min(10, len(item_ids) - len(interacao))
+
+    # Todos avaliados: nada a recomendar; ``vistos`` substitui os desafios das interações
+    todos = {int(i): 1.0 for i in item_ids}
+    assert motor.recomendar([todos], 5) == [[]]
+    assert len(motor.recomendar([todos], 5, vistos=[[]])[0]) == 5
+
+def test_interacoes_usuarios_somam_cada_posicao_uma_vez():
+    interacoes = InteracoesUsuarios()
+    log = [{'id': 'ana', 'Recomendacao_Desafios': '[1, 2]', 'rating': '5', 'success': '10'},
+           {'id': 'ana', 'Recomendacao_Desafios': '[2]', 'rating': '0', 'success': '0'},
+           {'id': 'bia', 'Recomendacao_Desafios': '[3]', 'rating': '5', 'success': '0'}]
+    interacoes.aplicar(log[:2], 0)
+    interacoes.aplicar(log[1:], 1)
+    assert interacoes.obter('ana') == {1: 1.0, 2: 1.0}
+    assert interacoes.obter('bia') == {3: 0.5}
+    assert len(interacoes) == 2
@@ -0,0 +1,84 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.endpoint.historico_usuarios import HistoricoUsuarios, adicionar_historico, padroes_historico
+from src.endpoint.registro import AcompanhamentoRegistros, EscritorRegistros, LeitorIncremental
+
+
+def id_usuario(nome):
+    return hashlib.sha256(nome.encode()).hexdigest()
+
+
+def avaliacao(nome, streak, progress_pct, success):
+    return {'id': id_usuario(nome), 'streak': str(streak), 'progress_pct': str(progress_pct), 'success': str(success)}
+
+
+def test_adicionar_historico_igual_a_media_expansiva():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'user_id': rng.integers(0, 20, size=300),
+        'date': pd.date_range('2026-01-01', periods=300, freq='h'),
+        'streak': rng.integers(0, 10, size=300).astype(float),
+        'progress_pct': rng.uniform(0, 100, size=300),
+        'success': rng.integers(0, 2, size=300).astype(float),
+    })
+    df.loc[::7, 'streak'] = np.nan
+    obtido = adicionar_historico(df.copy())
+
+    esperado = df.sort_values(['user_id', 'date'])
+    for feature, coluna in (('user_avg_streak', 'streak'), ('user_avg_progress', 'progress_pct'),
+                            ('user_success_rate', 'success')):
+        media = esperado.groupby('user_id')[coluna].transform(lambda x: x.expanding().mean().shift(1))
+        np.testing.assert_allclose(obtido[feature], media.fillna(padroes_historico[feature]))
+
+
+def test_aplicar_ignora_avaliacoes_ja_incluidas(tmp_path):
+    historico = HistoricoUsuarios(tmp_path / 'historico.npz', intervalo_salvamento=0)
+    log = [avaliacao('ana', 2, 50, 1), avaliacao('bia', 4, 80, 0), avaliacao('ana', 4, 70, 0)]
+    historico.aplicar(log[:2], 0)
+    historico.aplicar(log[1:], 1)  # a posição 1 chega de novo e é ignorada
+    assert historico.obter(id_usuario('ana')) == {'user_avg_streak': 3.0, 'user_avg_progress': 60.0,
+                                                   'user_success_rate': 0.5}
+    assert historico.obter(id_usuario('carla')) == padroes_historico
+    assert historico.avaliacoes_incluidas == 3
+
+
+def test_arquivo_salvo_retoma_da_posicao_no_log(tmp_path):
+    caminho = tmp_path / 'historico.npz'
+    log = [avaliacao('ana', 1, 10, 1), avaliacao('ana', 3, 30, 1), avaliacao('bia', 5, 50, 0)]
+    primeiro = HistoricoUsuarios(caminho, intervalo_salvamento=0)
+    primeiro.aplicar(log[:2], 0)
+    primeiro.salvar()
+
+    # Outro processo lê o log inteiro desde o início: soma apenas o que o arquivo não incluía
+    segundo = HistoricoUsuarios(caminho, intervalo_salvamento=0)
+    segundo.aplicar(log, 0)
+    assert segundo.obter(id_usuario('ana'))['user_avg_streak'] == 2.0
+    assert segundo.obter(id_usuario('bia'))['user_avg_streak'] == 5.0
+    assert len(segundo) == 2
+
+
+def test_avaliacao_local_aplicada_uma_vez_e_salva_como_prefixo(tmp_path):
+    caminho = tmp_path / 'historico.npz'
+    log = EscritorRegistros(tmp_path / 'avaliacoes.csv', ['id', 'streak', 'progress_pct', 'success'],
+                            intervalo_flush=0.01)
+    acompanhamento = AcompanhamentoRegistros(log, intervalo=0)
+    historico = HistoricoUsuarios(caminho, acompanhamento, intervalo_salvamento=0)
+    acompanhamento.consumidor(historico.aplicar)
+
+    acompanhamento.registrar(avaliacao('ana', 4, 40, 1))
+    assert historico.obter(id_usuario('ana'))['user_avg_streak'] == 4.0
+    historico.salvar()
+    assert not caminho.exists()  # ainda não lida do log
+
+    log.flush()
+    acompanhamento.sincronizar()
+    assert historico.obter(id_usuario('ana'))['user_avg_streak'] == 4.0
+    assert historico.avaliacoes_incluidas == 1
+    historico.salvar()
+
+    recarregado = HistoricoUsuarios(caminho, intervalo_salvamento=0)
+    recarregado.aplicar(LeitorIncremental(log).novos(), 0)
+    assert recarregado.obter(id_usuario('ana'))['user_avg_streak'] == 4.0
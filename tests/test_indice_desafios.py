@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.endpoint.indice_desafios import IndiceDesafios, agregar_votos, parse_lista_desafios
+
+
+def votos_com_laco(indice, linhas, pesos, posicao, n_colunas):
+    """Agregação anterior ao bincount: um laço por vizinho e por desafio"""
+    total = np.zeros((len(linhas), n_colunas))
+    for entrada, (linhas_entrada, pesos_entrada) in enumerate(zip(linhas, pesos)):
+        for linha, peso in zip(linhas_entrada, pesos_entrada):
+            if linha < 0:
+                continue
+            for desafio in indice[linha]:
+                if desafio < len(posicao) and posicao[desafio] >= 0:
+                    total[entrada, posicao[desafio]] += peso
+    return total
+
+
+def test_parse_lista_desafios():
+    assert parse_lista_desafios('[14, 15]') == [14, 15]
+    assert parse_lista_desafios('[]') == []
+    assert parse_lista_desafios(float('nan')) == []
+    assert parse_lista_desafios('(3, 4)') == [3, 4]
+    assert parse_lista_desafios([1, 2]) == [1, 2]
+
+
+def test_indice_guarda_as_listas_por_linha():
+    listas = ['[14, 15]', '[]', float('nan'), '[3]']
+    indice = IndiceDesafios.from_series(listas)
+    assert len(indice) == 4
+    assert [list(indice[i]) for i in range(4)] == [[14, 15], [], [], [3]]
+
+
+def test_agregar_votos_igual_ao_laco():
+    rng = np.random.default_rng(0)
+    listas = [str(sorted(rng.choice(40, size=rng.integers(0, 6), replace=False).tolist())) for _ in range(200)]
+    indice = IndiceDesafios.from_series(listas)
+    # Desafios 0..29 no catálogo (colunas embaralhadas); 30..39 ficam de fora
+    posicao = np.full(35, -1, dtype=np.int64)
+    posicao[:30] = rng.permutation(30)
+    linhas = rng.integers(-1, 200, size=(8, 5))
+    pesos = rng.random((8, 5))
+
+    obtido = agregar_votos(indice, linhas, pesos, posicao, 30)
+    np.testing.assert_allclose(obtido, votos_com_laco(indice, linhas, pesos, posicao, 30), rtol=1e-6)
+    assert obtido.dtype == np.float32
+
+
+def test_agregar_votos_sem_vizinhos_validos():
+    indice = IndiceDesafios.from_series(['[1, 2]'])
+    votos = agregar_votos(indice, np.full((2, 3), -1), np.ones((2, 3)), np.arange(3), 3)
+    np.testing.assert_array_equal(votos, np.zeros((2, 3)))
@@ -0,0 +1,62 @@
+import numpy as np
+
+from src.endpoint.indice_vizinhos import (IndiceExato, IndiceIVF, calcular_recall, criar_indice, normalizar_linhas,
+                                          top_k_indices)
+
+
+def dados_agrupados(n=2000, dimensao=12, grupos=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centros = rng.normal(size=(grupos, dimensao))
+    return (centros[rng.integers(grupos, size=n)] + 0.3 * rng.normal(size=(n, dimensao))).astype(np.float32)
+
+
+def recall(obtidos, esperados):
+    return np.mean([calcular_recall(o, e) for o, e in zip(obtidos, esperados)])
+
+
+def test_top_k_indices_igual_a_ordenacao_completa():
+    scores = np.random.default_rng(1).normal(size=(5, 300)).astype(np.float32)
+    for k in (1, 7, 300, 500):
+        esperado = np.argsort(-scores, axis=1, kind='stable')[:, :min(k, 300)]
+        np.testing.assert_array_equal(top_k_indices(scores, k), esperado)
+
+
+def test_ivf_sondando_todas_as_listas_igual_a_busca_exata():
+    matriz = dados_agrupados()
+    consultas = normalizar_linhas(matriz[:50] + 0.01)
+    exato = IndiceExato(matriz)
+    ivf = IndiceIVF.construir(matriz, n_listas=16)
+
+    idx_exato, scores_exato = exato.buscar(consultas, 10)
+    idx_ivf, scores_ivf = ivf.buscar(consultas, 10, n_probe=ivf.n_listas)
+    np.testing.assert_allclose(scores_ivf, scores_exato, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(idx_ivf, idx_exato)
+
+
+def test_ivf_recall_com_poucas_listas_sondadas():
+    matriz = dados_agrupados()
+    consultas = normalizar_linhas(matriz[::40])
+    idx_exato, _ = IndiceExato(matriz).buscar(consultas, 10)
+    idx_ivf, _ = IndiceIVF.construir(matriz, n_listas=32, n_probe=8).buscar(consultas, 10)
+    assert recall(idx_ivf, idx_exato) >= 0.9
+
+
+def test_ivf_salvar_nao_altera_o_arquivo_mapeado(tmp_path):
+    caminho = tmp_path / 'ivf.npz'
+    antigo = IndiceIVF.construir(dados_agrupados(seed=2), n_listas=8)
+    antigo.salvar(caminho)
+    mapeado = IndiceIVF.carregar(caminho)
+    vetores = np.array(mapeado.vetores)
+
+    IndiceIVF.construir(dados_agrupados(n=3000, seed=3), n_listas=8).salvar(caminho)
+    np.testing.assert_array_equal(mapeado.vetores, vetores)
+    assert len(IndiceIVF.carregar(caminho).ordem) == 3000
+
+
+def test_criar_indice_sem_gravar_constroi_em_memoria(tmp_path):
+    caminho = tmp_path / 'ivf.npz'
+    indice = criar_indice(dados_agrupados(), 'ivf', caminho, n_listas=8, gravar=False)
+    assert indice.tipo == 'ivf'
+    assert not caminho.exists()
+    criar_indice(dados_agrupados(), 'ivf', caminho, n_listas=8)
+    assert caminho.exists()
@@ -0,0 +1,143 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from src.endpoint import modelo
+
+
+@pytest.fixture
+def callbacks(monkeypatch):
+    """Callbacks de recarga registrados apenas durante o teste"""
+    monkeypatch.setattr(modelo, '_callbacks_recarga', list(modelo._callbacks_recarga))
+    recebidos = []
+    modelo.ao_recarregar(recebidos.append)
+    return recebidos
+
+
+def test_recarga_troca_o_estado_atomicamente(estado, callbacks):
+    anterior = modelo.obter_estado()
+    novo = modelo.recarregar_estado()
+    assert modelo.obter_estado() is novo is not anterior
+    assert callbacks == [novo]
+    # Quem ainda segura o estado anterior continua com um objeto íntegro
+    assert anterior.indice_vizinhos.buscar(anterior.X_normalizado[:1], 3)[0][0][0] == 0
+    assert modelo.status_recarga()['erro'] is None
+
+
+def test_recarga_com_erro_mantem_o_estado_atual(estado, callbacks, monkeypatch):
+    atual = modelo.obter_estado()
+
+    def falhar():
+        raise ValueError("arquivo corrompido")
+
+    monkeypatch.setattr(modelo, 'carregar_estado', falhar)
+    with pytest.raises(ValueError):
+        modelo.recarregar_estado()
+    assert modelo.obter_estado() is atual
+    assert callbacks == []
+    assert modelo.status_recarga()['erro'] == "arquivo corrompido"
+
+
+def test_snapshot_desatualizado_e_recompilado_na_recarga(estado, callbacks):
+    modelo.salvar_snapshot(modelo.compilar_estado())
+    assert modelo.snapshot_atualizado()
+    original = modelo.dados_path.read_text(encoding='utf-8')
+    try:
+        linhas = original.splitlines()
+        modelo.dados_path.write_text(original + linhas[1] + '\n', encoding='utf-8')
+        assert not modelo.snapshot_atualizado()
+
+        novo = modelo.recarregar_estado()
+        assert modelo.snapshot_atualizado()
+        assert len(novo.X_normalizado) == len(linhas)  # cabeçalho + linhas antigas -> uma linha a mais
+        assert isinstance(novo.X_normalizado, np.memmap)  # carregado do snapshot recompilado
+    finally:
+        modelo.dados_path.write_text(original, encoding='utf-8')
+        modelo.recarregar_estado()
+
+
+def versoes_gravadas():
+    """Versões do snapshot em disco, da mais antiga à mais nova"""
+    manifestos = [json.loads(m.read_text(encoding='utf-8')) for m in modelo.snapshot_dir.glob('*/manifesto.json')]
+    return [m['versao'] for m in sorted(manifestos, key=lambda m: m['criado_em'])]
+
+
+def test_snapshot_de_outro_formato_e_recompilado(estado, callbacks):
+    modelo.salvar_snapshot(modelo.compilar_estado())
+    antiga = (modelo.snapshot_dir / 'ATUAL').read_text(encoding='utf-8')
+    manifesto_path = modelo.snapshot_dir / antiga / 'manifesto.json'
+    manifesto = json.loads(manifesto_path.read_text(encoding='utf-8'))
+    manifesto_path.write_text(json.dumps(dict(manifesto, formato=modelo.FORMATO_SNAPSHOT + 1)), encoding='utf-8')
+    assert not modelo.snapshot_atualizado()
+
+    novo = modelo.recarregar_estado()
+    assert modelo.snapshot_atualizado()
+    assert json.loads((modelo.snapshot_dir / novo.versao / 'manifesto.json').read_text(encoding='utf-8'))['formato'] \
+        == modelo.FORMATO_SNAPSHOT
+    assert isinstance(novo.X_normalizado, np.memmap)
+    assert modelo.status_recarga()['erro'] is None and modelo.status_recarga()['erro_snapshot'] is None
+
+
+def test_falha_ao_recompilar_fica_em_status_recarga(estado, callbacks, monkeypatch):
+    modelo.salvar_snapshot(modelo.compilar_estado())
+    original = modelo.dados_path.read_text(encoding='utf-8')
+
+    def falhar(diretorio=modelo.snapshot_dir):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(modelo, '_recompilar_snapshot', falhar)
+    try:
+        modelo.dados_path.write_text(original + original.splitlines()[1] + '\n', encoding='utf-8')
+        novo = modelo.recarregar_estado()  # servido a partir do CSV, compilado em memória
+        assert not isinstance(novo.X_normalizado, np.memmap)
+        assert modelo.status_recarga()['erro_snapshot'] == "disco cheio"
+    finally:
+        monkeypatch.undo()
+        modelo.dados_path.write_text(original, encoding='utf-8')
+        modelo.recarregar_estado()
+    assert modelo.status_recarga()['erro_snapshot'] is None
+
+
+def test_recarga_remove_versoes_anteriores_a_anterior(estado, callbacks):
+    original = modelo.dados_path.read_text(encoding='utf-8')
+    linha = original.splitlines()[1]
+    try:
+        for n in range(1, 4):
+            modelo.dados_path.write_text(original + (linha + '\n') * n, encoding='utf-8')
+            anterior = modelo.obter_estado()
+            novo = modelo.recarregar_estado()
+            assert versoes_gravadas()[-2:] in ([anterior.versao, novo.versao], [novo.versao])
+    finally:
+        modelo.dados_path.write_text(original, encoding='utf-8')
+        modelo.recarregar_estado()
+    assert len(versoes_gravadas()) <= 2
+
+
+def esperar(condicao, limite=10):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.05)
+
+
+def test_recarga_solicitada_chega_ao_monitor(estado, callbacks):
+    modelo.obter_estado()
+    monitor = modelo.MonitorArquivos(intervalo=0.05)
+    monitor.iniciar()
+    try:
+        time.sleep(0.2)
+        assert callbacks == []  # nada mudou desde a última carga
+        geracao = modelo.solicitar_recarga()
+        assert int(modelo.geracao_path.read_text(encoding='ascii')) == geracao
+        esperar(lambda: callbacks)
+        time.sleep(0.2)
+        assert len(callbacks) == 1
+
+        # A recarga feita pelo próprio worker não se repete quando o monitor vê o contador
+        modelo.solicitar_recarga()
+        modelo.recarregar_estado()
+        time.sleep(0.3)
+        assert len(callbacks) == 2
+    finally:
+        monitor.parar()
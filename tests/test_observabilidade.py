@@ -0,0 +1,77 @@
+import asyncio
+
+from src.endpoint import observabilidade
+from src.endpoint.executor import ExecutorRecomendacao
+from src.endpoint.observabilidade import RegistroMetricas, capturar_metricas, cronometrar
+
+
+def test_formato_do_contador():
+    registro = RegistroMetricas()
+    contador = registro.contador('teste_total', 'Eventos de teste', rotulos=('origem',))
+    contador.inc(origem='b')
+    contador.inc(2, origem='a')
+    contador.inc(origem='a"x')
+    assert registro.exportar().splitlines() == [
+        '# HELP teste_total Eventos de teste',
+        '# TYPE teste_total counter',
+        'teste_total{origem="a"} 2',
+        'teste_total{origem="a\\"x"} 1',
+        'teste_total{origem="b"} 1',
+    ]
+
+
+def test_formato_do_histograma():
+    registro = RegistroMetricas()
+    histograma = registro.histograma('teste_segundos', 'Duração', rotulos=('etapa',), buckets=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        histograma.observar(valor, etapa='x')
+    assert registro.exportar().splitlines() == [
+        '# HELP teste_segundos Duração',
+        '# TYPE teste_segundos histogram',
+        'teste_segundos_bucket{etapa="x",le="0.1"} 2',
+        'teste_segundos_bucket{etapa="x",le="1.0"} 3',
+        'teste_segundos_bucket{etapa="x",le="+Inf"} 4',
+        'teste_segundos_sum{etapa="x"} 3.65',
+        'teste_segundos_count{etapa="x"} 4',
+    ]
+
+
+def test_coletor_ignora_valores_ausentes():
+    registro = RegistroMetricas()
+    registro.coletor(lambda: [('teste_info', 'gauge', 'Info', [({'versao': 'v1'}, 1), ({'versao': 'v2'}, None)])])
+    assert registro.exportar().splitlines()[2:] == ['teste_info{versao="v1"} 1']
+
+
+def test_metricas_capturadas_reproduzidas_em_outro_registro():
+    origem, destino = RegistroMetricas(), RegistroMetricas()
+    contador, histograma = (origem.contador('teste_total', 'Eventos', rotulos=('origem',)),
+                            origem.histograma('teste_segundos', 'Duração', rotulos=('etapa',)))
+    destino.contador('teste_total', 'Eventos', rotulos=('origem',))
+    destino.histograma('teste_segundos', 'Duração', rotulos=('etapa',))
+    with capturar_metricas() as capturadas:
+        contador.inc(3, origem='cache')
+        histograma.observar(0.2, etapa='x')
+    assert observabilidade._capturadas is None
+    contador.inc(origem='fora_do_bloco')
+
+    destino.reproduzir(capturadas)
+    assert destino.exportar() == origem.exportar().replace('teste_total{origem="fora_do_bloco"} 1\n', '')
+
+
+def etapa_no_pool():
+    with cronometrar('teste_processo'):
+        return 42
+
+
+def test_etapas_medidas_no_pool_de_processos_chegam_ao_processo_principal():
+    executor = ExecutorRecomendacao(tipo='processo', workers=1, max_concorrencia=1)
+
+    async def executar():
+        try:
+            return [await executor.executar(etapa_no_pool) for _ in range(2)]
+        finally:
+            executor.encerrar()
+
+    assert asyncio.run(executar()) == [42, 42]
+    assert 'squad_etapa_duracao_segundos_count{etapa="teste_processo"} 2' in \
+        observabilidade.registro_metricas.exportar().splitlines()
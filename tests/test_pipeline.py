@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from src.endpoint import pipeline
+from tests.conftest import usuario_exemplo
+
+
+def executar(estado, usuarios, k=3):
+    return pipeline.executar(estado, usuarios, estado.preparar_entradas(usuarios), k)
+
+
+def test_pipeline_completo(estado):
+    resultado = executar(estado, [usuario_exemplo('ana'), usuario_exemplo('bia', goal='Emagrecimento')])
+    assert resultado.completo
+    assert set(resultado.etapas) == set(pipeline.GERADORES) | {'ranking'}
+    assert all(etapa['status'] == 'ok' for etapa in resultado.etapas.values())
+    for desafios, scores in zip(resultado.desafios, resultado.scores):
+        assert pipeline.MINIMO_DESAFIOS <= len(desafios) <= pipeline.TOP_N
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_estouro_do_orcamento_descarta_o_gerador(estado, monkeypatch):
+    usuarios = [usuario_exemplo('ana')]
+    gerar_vizinhos = pipeline.geradores['vizinhos']
+
+    def gerar_lento(contexto):
+        time.sleep(0.3)
+        return gerar_vizinhos(contexto)
+
+    monkeypatch.setitem(pipeline.geradores, 'vizinhos', gerar_lento)
+    monkeypatch.setitem(pipeline.ORCAMENTOS_MS, 'vizinhos', 20)
+    resultado = executar(estado, usuarios)
+
+    assert not resultado.completo
+    assert resultado.etapas['vizinhos']['status'] == 'estourou'
+    assert 20 <= resultado.etapas['vizinhos']['ms'] < 300
+    for nome in set(pipeline.GERADORES) - {'vizinhos'} | {'ranking'}:
+        assert resultado.etapas[nome]['status'] == 'ok' and resultado.etapas[nome]['ms'] >= 0
+
+    # O ranking segue só com os geradores que terminaram
+    contexto = pipeline.Contexto(estado, pipeline.obter_catalogo(estado), usuarios,
+                                 estado.preparar_entradas(usuarios), 3)
+    matrizes = {nome: pipeline.geradores[nome](contexto) for nome in pipeline.GERADORES if nome != 'vizinhos'}
+    desafios, _ = pipeline.ranquear(contexto.catalogo, matrizes)
+    assert resultado.desafios == desafios
+
+
+def test_selecionar_completa_com_os_populares(estado):
+    catalogo = pipeline.obter_catalogo(estado)
+    scores = np.full((1, len(catalogo.ids)), -np.inf, dtype=np.float32)
+    scores[0, 0] = 1.0
+    desafios, valores = pipeline.selecionar(catalogo, scores)
+    assert len(desafios[0]) == pipeline.MINIMO_DESAFIOS and desafios[0][0] == catalogo.ids[0]
+    assert valores[0][1:] == [0.0] * (pipeline.MINIMO_DESAFIOS - 1)
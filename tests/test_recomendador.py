@@ -0,0 +1,55 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from src.endpoint import modelo_softmax, recomendador
+from src.endpoint.historico_usuarios import padroes_historico
+from src.endpoint.redes_numpy import exportar_pesos, inferir_arquitetura
+from tests.conftest import raiz, usuario_exemplo
+
+
+def test_importar_recomendador_nao_carrega_pandas_nem_scipy():
+    # Histórico, interações e coocorrência só são importados no primeiro uso
+    codigo = "import sys; import src.endpoint.recomendador; print(sorted({'pandas', 'scipy'} & set(sys.modules)))"
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, capture_output=True, text=True, check=True)
+    assert saida.stdout.strip() == '[]'
+
+
+def exportar_softmax_aleatorio(caminho, ids_desafios, semente=0):
+    """``RecSys`` mínimo (fc1 -> output) com pesos aleatórios no formato de ``exportar_softmax``"""
+    rng = np.random.default_rng(semente)
+    colunas = ['ano_nascimento', 'aluno_achiever', 'aluno_player', 'user_avg_streak']
+    rotulos = ['desafio_achiever', 'desafio_disruptor', 'desafio_free_spirit', 'desafio_philanthropist',
+               'desafio_player', 'desafio_socialiser']
+    state_dict = {
+        'fc1.weight': rng.normal(0, 0.5, (8, len(colunas) + 3)), 'fc1.bias': rng.normal(0, 0.1, 8),
+        'output.weight': rng.normal(0, 0.5, (len(rotulos), 8)), 'output.bias': np.zeros(len(rotulos)),
+    }
+    metadados = {'user_feature_cols': colunas, 'numeric_cols': colunas[:1], 'labels': rotulos,
+                 'arquitetura': inferir_arquitetura(set(state_dict), '', saida='output')}
+    ids = np.asarray(sorted(ids_desafios), dtype=np.int64)
+    exportar_pesos(caminho, state_dict, metadados, scaler_media=[1990.0], scaler_escala=[10.0],
+                   item_ids=ids, item_features=rng.normal(0, 1, (len(ids), 3)))
+
+
+def test_filtro_de_tipos_completa_pelos_maiores_scores(estado, monkeypatch):
+    exportar_softmax_aleatorio(modelo_softmax.softmax_path, estado.challenges_data)
+    modelo_softmax.descartar_motor_softmax()
+    monkeypatch.setattr(recomendador, 'FILTRO_TIPOS', 2)
+    try:
+        usuario = usuario_exemplo()
+        id_hash = recomendador.gerar_id(usuario['usuario'], usuario['senha'])
+        desafios = sorted(estado.challenges_data)[:5]
+        filtrados = recomendador._filtrar_por_tipo(estado, [usuario], [id_hash], [desafios])[0]
+        assert recomendador._filtrar_por_tipo(estado, [usuario], [id_hash], [desafios])[0] == filtrados
+
+        motor = modelo_softmax.obter_motor_softmax(estado.challenges_data)
+        (tipos,), scores = motor.tipos_previstos([usuario], [padroes_historico], 2)
+        permitidos = {cid for tipo in tipos for cid in motor.ids_por_tipo[tipo]}
+        mantidos = [cid for cid in desafios if cid in permitidos]
+        restantes = sorted(permitidos - set(mantidos), key=lambda cid: (-scores[0][motor.posicao_itens[cid]], cid))
+        assert filtrados == (mantidos + restantes)[:len(desafios)]
+    finally:
+        modelo_softmax.descartar_motor_softmax()
+        modelo_softmax.softmax_path.unlink(missing_ok=True)
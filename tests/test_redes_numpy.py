@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.endpoint.redes_numpy import dobrar_batchnorm, inferir_arquitetura, montar_rede
+
+
+def pesos_aleatorios(dimensoes, seed=0):
+    """``state_dict`` de fc{i} + bn{i} (com estatísticas de inferência) e output_embedding"""
+    rng = np.random.default_rng(seed)
+    pesos = {}
+    for i, (entrada, saida) in enumerate(zip(dimensoes[:-2], dimensoes[1:-1]), 1):
+        pesos[f'fc{i}.weight'] = rng.normal(size=(saida, entrada)) / np.sqrt(entrada)
+        pesos[f'fc{i}.bias'] = rng.normal(size=saida)
+        pesos[f'bn{i}.weight'] = rng.uniform(0.5, 1.5, size=saida)
+        pesos[f'bn{i}.bias'] = rng.normal(size=saida)
+        pesos[f'bn{i}.running_mean'] = rng.normal(size=saida)
+        pesos[f'bn{i}.running_var'] = rng.uniform(0.5, 2.0, size=saida)
+    pesos['output_embedding.weight'] = rng.normal(size=(dimensoes[-1], dimensoes[-2])) / np.sqrt(dimensoes[-2])
+    pesos['output_embedding.bias'] = rng.normal(size=dimensoes[-1])
+    return pesos
+
+
+def rede_sem_dobra(pesos, x, n_blocos, eps=1e-5):
+    """Linear -> BatchNorm (inferência) -> ReLU, como no torch em ``eval()``"""
+    for i in range(1, n_blocos + 1):
+        x = x @ pesos[f'fc{i}.weight'].T + pesos[f'fc{i}.bias']
+        x = (x - pesos[f'bn{i}.running_mean']) / np.sqrt(pesos[f'bn{i}.running_var'] + eps)
+        x = np.maximum(x * pesos[f'bn{i}.weight'] + pesos[f'bn{i}.bias'], 0)
+    return x @ pesos['output_embedding.weight'].T + pesos['output_embedding.bias']
+
+
+def test_dobrar_batchnorm_igual_a_linear_mais_batchnorm():
+    pesos = pesos_aleatorios([6, 4, 3])
+    x = np.random.default_rng(1).normal(size=(10, 6))
+    peso, vies = dobrar_batchnorm(pesos['fc1.weight'], pesos['fc1.bias'], pesos['bn1.weight'], pesos['bn1.bias'],
+                                  pesos['bn1.running_mean'], pesos['bn1.running_var'])
+    esperado = (x @ pesos['fc1.weight'].T + pesos['fc1.bias'] - pesos['bn1.running_mean']) \
+        / np.sqrt(pesos['bn1.running_var'] + 1e-5) * pesos['bn1.weight'] + pesos['bn1.bias']
+    np.testing.assert_allclose(x @ peso.T + vies, esperado, rtol=1e-10)
+
+
+def test_rede_dobrada_igual_a_rede_original():
+    pesos = pesos_aleatorios([10, 32, 16, 8])
+    arquitetura = inferir_arquitetura(pesos, '')
+    assert arquitetura == [['fc1', 'bn1', True], ['fc2', 'bn2', True], ['output_embedding', None, False]]
+    rede = montar_rede(pesos, '', arquitetura)
+    x = np.random.default_rng(2).normal(size=(64, 10))
+
+    obtido = rede(x)
+    assert obtido.dtype == np.float32
+    np.testing.assert_allclose(obtido, rede_sem_dobra(pesos, x, 2), rtol=1e-4, atol=1e-4)
@@ -0,0 +1,159 @@
+import csv
+
+from src.endpoint.registro import AcompanhamentoRegistros, EscritorRegistros, IndiceUltimoRegistro, LeitorIncremental
+
+campos = ['id', 'Data_Hora', 'valor']
+
+
+def registro(i, chave=None):
+    return {'id': chave or f'u{i}', 'Data_Hora': f'2026-01-01T00:00:{i:02d}', 'valor': str(i)}
+
+
+def escritor(tmp_path, **kwargs):
+    return EscritorRegistros(tmp_path / 'log.csv', campos, intervalo_flush=0.01, **kwargs)
+
+
+def test_escritor_grava_em_lotes_e_rotaciona(tmp_path):
+    log = escritor(tmp_path, max_bytes=200)
+    for i in range(30):
+        log.registrar(registro(i))
+        log.flush()
+    log.fechar()
+
+    segmentos = log.segmentos()
+    assert len(segmentos) > 1
+    linhas = [linha for segmento in segmentos for linha in csv.DictReader(open(segmento, encoding='utf-8'))]
+    assert [linha['valor'] for linha in linhas] == [str(i) for i in range(30)]
+    assert log.estatisticas['gravados'] == 30
+
+
+def test_registrar_depois_de_fechar_grava_na_hora(tmp_path):
+    log = escritor(tmp_path)
+    log.registrar(registro(1))
+    log.fechar()
+    assert log.registrar(registro(2))
+    assert [r['valor'] for r in LeitorIncremental(log).novos()] == ['1', '2']
+
+
+def test_leitor_incremental_le_apenas_o_que_foi_anexado(tmp_path):
+    log = escritor(tmp_path, max_bytes=150)
+    leitor = LeitorIncremental(log)
+    log.gravar([registro(i) for i in range(3)])
+    assert [r['valor'] for r in leitor.novos()] == ['0', '1', '2']
+    assert leitor.novos() == []
+
+    # Rotação: o segmento renomeado mantém o inode e a posição já lida
+    for i in range(3, 10):
+        log.gravar([registro(i)])
+    assert len(log.segmentos()) > 1
+    assert [r['valor'] for r in leitor.novos()] == [str(i) for i in range(3, 10)]
+    assert leitor.lidos == 10
+
+
+def test_leitor_ignora_linha_incompleta(tmp_path):
+    log = escritor(tmp_path)
+    log.gravar([registro(0)])
+    with open(log.caminho, 'a', encoding='utf-8') as f:
+        f.write('u1,2026-01-01T00:00:01,')
+    leitor = LeitorIncremental(log)
+    assert len(leitor.novos()) == 1
+    with open(log.caminho, 'a', encoding='utf-8') as f:
+        f.write('1\n')
+    assert leitor.novos() == [registro(1)]
+
+
+def test_indice_ultimo_registro_encontra_registro_de_outro_processo(tmp_path):
+    local, outro = escritor(tmp_path), escritor(tmp_path)
+    indice = IndiceUltimoRegistro(local)
+    local.gravar([registro(1, 'ana')])
+    assert indice.obter('ana')['valor'] == '1'
+
+    outro.gravar([registro(2, 'bia'), registro(3, 'ana')])
+    assert indice.obter('bia')['valor'] == '2'
+    # Chave já conhecida: o registro mais novo chega por sincronizar
+    indice.sincronizar()
+    assert indice.obter('ana')['valor'] == '3'
+    assert indice.obter('carla', espera=0.05) is None
+
+
+def test_escritor_cria_o_diretorio_dos_registros(tmp_path):
+    log = EscritorRegistros(tmp_path / 'novo' / 'log.csv', campos)
+    assert log.gravar([registro(0)])
+    assert log.estatisticas['gravados'] == 1
+
+
+def test_acompanhamento_entrega_posicoes_em_ordem(tmp_path):
+    local, outro = escritor(tmp_path), escritor(tmp_path)
+    acompanhamento = AcompanhamentoRegistros(local, intervalo=0)
+    recebidos = []
+    acompanhamento.consumidor(lambda registros, inicio: recebidos.append((inicio, [r['valor'] for r in registros])))
+
+    local.gravar([registro(0), registro(1)])
+    acompanhamento.iniciar()
+    outro.gravar([registro(2)])
+    local.gravar([registro(3)])
+    assert acompanhamento.sincronizar() == 2
+    assert acompanhamento.sincronizar() == 0
+    assert recebidos == [(0, ['0', '1']), (2, ['2', '3'])]
+
+
+def test_consumidor_registrado_depois_de_iniciar_recebe_o_log_ja_lido(tmp_path):
+    log = escritor(tmp_path)
+    acompanhamento = AcompanhamentoRegistros(log, intervalo=0)
+    log.gravar([registro(0), registro(1)])
+    acompanhamento.iniciar()
+
+    recebidos = []
+    acompanhamento.consumidor(lambda registros, inicio: recebidos.append((inicio, [r['valor'] for r in registros])))
+    log.gravar([registro(2)])
+    acompanhamento.sincronizar()
+    assert recebidos == [(0, ['0', '1']), (2, ['2'])]
+
+
+def test_registrar_aplica_na_hora_sem_somar_de_novo(tmp_path):
+    local, outro = escritor(tmp_path), escritor(tmp_path)
+    acompanhamento = AcompanhamentoRegistros(local, intervalo=0)
+    recebidos = []
+    acompanhamento.consumidor(lambda registros, inicio: recebidos.append(
+        (inicio, [r and r['valor'] for r in registros])))
+
+    outro.gravar([registro(0)])
+    assert acompanhamento.registrar(registro(1))
+    assert recebidos == [(0, ['0']), (None, ['1'])] and acompanhamento.pendentes == 1
+
+    local.flush()
+    outro.gravar([registro(2)])
+    assert acompanhamento.sincronizar() == 2
+    # O registro local chega do log como None: só a posição avança
+    assert recebidos[-1] == (1, [None, '2']) and acompanhamento.pendentes == 0
+
+    tardios = []
+    acompanhamento.consumidor(lambda registros, inicio: tardios.append((inicio, len(registros))))
+    assert tardios == [(0, 3)]
+
+
+def test_consumidor_tardio_recebe_os_registros_locais_pendentes(tmp_path):
+    log = escritor(tmp_path)
+    acompanhamento = AcompanhamentoRegistros(log, intervalo=0)
+    acompanhamento.registrar(registro(0))
+
+    recebidos = []
+    acompanhamento.consumidor(lambda registros, inicio: recebidos.append(
+        (inicio, [r and r['valor'] for r in registros])))
+    assert recebidos == [(None, ['0'])]
+    log.flush()
+    acompanhamento.sincronizar()
+    assert recebidos[-1] == (0, [None])
+
+
+def test_registro_local_perdido_deixa_de_ser_pendente(tmp_path):
+    log = escritor(tmp_path)
+    log._gravar = lambda lote: False  # a gravação falha depois de enfileirar
+    acompanhamento = AcompanhamentoRegistros(log, intervalo=0)
+    acompanhamento.registrar(registro(0))
+    log.flush()
+
+    acompanhamento.sincronizar()
+    assert acompanhamento.pendentes == 1  # pode estar num segmento rotacionado durante a leitura
+    acompanhamento.sincronizar()
+    assert acompanhamento.pendentes == 0
@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.endpoint import serializacao
+from src.endpoint.recomendador import get_challenge_details
+from src.endpoint.serializacao import RespostaJSONRapida, serializar, serializar_lote, serializar_recomendacao
+
+
+def resultado_exemplo(estado, desafios, **campos):
+    return {'desafios': desafios, 'total_desafios': len(desafios), 'versao_modelo': estado.versao, **campos}
+
+
+def test_fragmentos_do_catalogo_iguais_a_json_dumps(estado):
+    desafios = get_challenge_details(sorted(estado.challenges_data)[:5], estado)
+    resultado = resultado_exemplo(estado, desafios, id='abc', scores=[0.5, 0.25, 0.0, 1.0, 0.125], motor='conteudo')
+    assert json.loads(serializar_recomendacao(resultado, estado)) == json.loads(json.dumps(resultado))
+
+
+def test_desafio_fora_do_catalogo_e_serializado_na_hora(estado):
+    # Cópia (ex.: vinda de outro processo): mesmo id, mas não é o objeto do catálogo
+    copia = dict(get_challenge_details([sorted(estado.challenges_data)[0]], estado)[0], title="Alterado")
+    corpo = json.loads(serializar_recomendacao({'desafios': [copia]}, estado))
+    assert corpo == {'desafios': [copia]}
+
+
+def test_lote_igual_a_json_dumps(estado):
+    ids = sorted(estado.challenges_data)
+    resposta = {'resultados': [resultado_exemplo(estado, get_challenge_details(ids[i:i + 3], estado), id=str(i))
+                               for i in range(3)], 'total_usuarios': 3}
+    assert json.loads(serializar_lote(resposta, estado)) == json.loads(json.dumps(resposta))
+    assert json.loads(serializar_lote({'resultados': []}, estado)) == {'resultados': []}
+
+
+@pytest.mark.parametrize('usar_orjson', [True, False])
+def test_serializar_utf8_e_numpy(monkeypatch, usar_orjson):
+    if usar_orjson and serializacao.orjson is None:
+        pytest.skip("orjson não instalado")
+    if not usar_orjson:
+        monkeypatch.setattr(serializacao, 'orjson', None)
+    conteudo = {'titulo': 'Desafio de força', 'n': 3}
+    assert json.loads(serializar(conteudo).decode('utf-8')) == conteudo
+    assert 'força'.encode('utf-8') in serializar(conteudo)
+    if usar_orjson:
+        assert json.loads(serializar({'v': np.float32(0.5)})) == {'v': 0.5}
+
+
+def test_resposta_aceita_bytes_prontos():
+    assert RespostaJSONRapida(b'{"a":1}').body == b'{"a":1}'
+    assert json.loads(RespostaJSONRapida({'a': 1}).body) == {'a': 1}